@@ -13,8 +13,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from dottify import sqlite_tuning
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -50,6 +53,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'dottify.db_router.ReplicaPinningMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -60,34 +64,95 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'MusicDBInc.urls'
 
+# Templates are compiled once per process by the cached loader rather
+# than re-read and re-parsed on every render. APP_DIRS is replaced by the
+# explicit app_directories loader because the two cannot be combined.
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
         },
     },
 ]
 
+# Cache used for template fragments (per-row list items keyed by the
+# row's updated_at) and the homepage shells. DOTTIFY_CACHE_URL names a
+# Redis server (needs the redis package) shared by the web workers and
+# the job worker; without it each process has its own LocMemCache, and
+# pages can only be pre-warmed over HTTP (see dottify/warming.py).
+# MAX_ENTRIES is sized for the large list pages.
+if os.environ.get('DOTTIFY_CACHE_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['DOTTIFY_CACHE_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'dottify',
+            'OPTIONS': {'MAX_ENTRIES': 50000},
+        }
+    }
+
 WSGI_APPLICATION = 'MusicDBInc.wsgi.application'
 
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# The production SQLite profile (WAL, pragmas, BEGIN IMMEDIATE, busy
+# timeout) lives in dottify/sqlite_tuning.py; see its docstring.
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'CONN_MAX_AGE': sqlite_tuning.CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': sqlite_tuning.production_options(),
+    },
+    # Local stand-in read replica: a read-only copy of db.sqlite3 kept in
+    # sync by `python manage.py sync_replica`. Tests mirror `default`.
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f"file:{BASE_DIR / 'db.replica.sqlite3'}?mode=ro",
+        'CONN_MAX_AGE': sqlite_tuning.CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': sqlite_tuning.replica_options(),
+        'TEST': {'MIRROR': 'default'},
+    },
 }
 
+# Catalogue reads from the list/detail views and API list/retrieve go to
+# these aliases (see dottify/db_router.py). Off unless enabled, e.g.
+# DOTTIFY_READ_REPLICAS=replica once sync_replica has created the copy.
+DATABASE_ROUTERS = ['dottify.db_router.ReplicaRouter']
+DOTTIFY_READ_REPLICAS = [alias for alias in os.environ.get('DOTTIFY_READ_REPLICAS', '').split(',') if alias]
+DOTTIFY_REPLICA_PIN_SECONDS = 10
+
+# Directory written by the snapshot_catalogue command. When set, the
+# read-only album API is served from it rather than the database (see
+# dottify/snapshot.py), e.g. on a node booted without one.
+DOTTIFY_SNAPSHOT = os.environ.get('DOTTIFY_SNAPSHOT') or None
+
+# Play event segments written by POST /api/plays/ and read by the
+# roll_up_plays command (see dottify/plays.py); one directory per day.
+DOTTIFY_PLAYS_DIR = os.environ.get('DOTTIFY_PLAYS_DIR') or BASE_DIR / 'plays'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -143,6 +208,12 @@ STATIC_URL = 'static/'
 MEDIA_ROOT = BASE_DIR / 'media/'
 MEDIA_URL = 'media/'
 
+# Support mail from help_view is sent by the run_jobs worker. Printed to
+# the worker's console until a real mail server is configured.
+EMAIL_BACKEND = os.environ.get('DJANGO_EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+DEFAULT_FROM_EMAIL = 'no-reply@dottify.example'
+DOTTIFY_SUPPORT_EMAIL = 'support@dottify.example'
+
 # Set up for simple Bootstrap theming
 CRISPY_ALLOWED_TEMPLATE_PACKS = 'bootstrap5'
 CRISPY_TEMPLATE_PACK = 'bootstrap5'
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Album, Song, Playlist, DottifyUser, Comment, Rating
+from .models import Album, Artist, Song, Playlist, DottifyUser, Comment, Rating
 
 
 @admin.register(Album)
@@ -12,6 +12,17 @@ class AlbumAdmin(admin.ModelAdmin):
     """
     list_display = ('title', 'artist_name', 'format', 'release_date', 'retail_price')
     search_fields = ('title', 'artist_name')
+    raw_id_fields = ('artist',)
+
+
+@admin.register(Artist)
+class ArtistAdmin(admin.ModelAdmin):
+    """
+    Admin configuration for Artist.
+    """
+    list_display = ('name', 'user')
+    search_fields = ('name',)
+    raw_id_fields = ('user',)
 
 
 @admin.register(Song)
@@ -48,8 +59,9 @@ class CommentAdmin(admin.ModelAdmin):
     """
     Admin configuration for Comment objects.
     """
-    list_display = ('user', 'song', 'text')
+    list_display = ('user', 'playlist', 'song', 'text', 'created_at')
     search_fields = ('text', 'user__display_name', 'song__title')
+    raw_id_fields = ('parent',)
 
 
 @admin.register(Rating)
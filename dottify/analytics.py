@@ -0,0 +1,157 @@
+"""
+Catalogue-wide aggregates for /api/analytics/.
+
+Every report is a handful of GROUP BY queries computed by the database
+(several of them straight off a covering index, see the Album, Song and
+Rating indexes); only grouped rows reach Python. Results are cached under
+a key that includes the data versions of the models they read (see
+dottify/versions.py), so a repeated request costs the one version lookup
+until the catalogue changes, then exactly one recomputation.
+"""
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import Avg, Count, F, Max, Min, Value
+from django.db.models.functions import Floor
+
+from .models import Album, Rating, Song
+from .versions import current
+
+# Keys change with the data versions, so this only bounds how long
+# superseded results linger.
+ANALYTICS_TIMEOUT = 60 * 60 * 24
+
+# Default page size for per-album results, and the largest allowed.
+ANALYTICS_PAGE_SIZE = 100
+ANALYTICS_MAX_PAGE_SIZE = 1000
+
+CENTS = Decimal('0.01')
+
+
+def cached_report(name, depends_on, compute, **params):
+    """
+    compute(**params), cached until one of the `depends_on` models changes.
+    """
+    versions = current(*depends_on)
+    key = ':'.join([
+        'analytics', name,
+        *(f'{k}={params[k]}' for k in sorted(params)),
+        *(str(versions[model]) for model in depends_on),
+    ])
+    result = cache.get(key)
+    if result is None:
+        result = compute(**params)
+        cache.set(key, result, ANALYTICS_TIMEOUT)
+    return result
+
+
+def _money(value):
+    return None if value is None else str(Decimal(value).quantize(CENTS))
+
+
+def _round(value):
+    return None if value is None else round(value, 2)
+
+
+def song_length_by_format():
+    rows = (
+        Song.objects.values(format=F('album__format'))
+        .annotate(songs=Count('id'), avg_length=Avg('length'),
+                  min_length=Min('length'), max_length=Max('length'))
+        .order_by('format')
+    )
+    return [{**row, 'avg_length': _round(row['avg_length'])} for row in rows]
+
+
+def song_length_by_album(after=0, limit=ANALYTICS_PAGE_SIZE):
+    """
+    Per-album length statistics for the `limit` albums after id `after`;
+    a range scan of song_album_length_idx that stops after `limit` groups.
+    """
+    rows = (
+        Song.objects.filter(album_id__gt=after)
+        .values('album_id')
+        .annotate(songs=Count('id'), avg_length=Avg('length'),
+                  min_length=Min('length'), max_length=Max('length'))
+        .order_by('album_id')[:limit]
+    )
+    results = [{**row, 'avg_length': _round(row['avg_length'])} for row in rows]
+    return {
+        'results': results,
+        'next_after': results[-1]['album_id'] if len(results) == limit else None,
+    }
+
+
+def price_distribution(bucket=Decimal('5.00')):
+    """
+    Price summary per format, plus a histogram of prices in `bucket`-wide
+    bins per format. Unpriced albums are counted but not binned.
+    """
+    formats = (
+        Album.objects.values('format')
+        .annotate(albums=Count('id'), priced=Count('retail_price'),
+                  min_price=Min('retail_price'), max_price=Max('retail_price'),
+                  avg_price=Avg('retail_price'))
+        .order_by('format')
+    )
+    bins = (
+        Album.objects.exclude(retail_price=None)
+        .values('format', bin=Floor(F('retail_price') / Value(bucket)))
+        .annotate(albums=Count('id'))
+        .order_by('format', 'bin')
+    )
+    return {
+        'bucket': _money(bucket),
+        'formats': [
+            {
+                **row,
+                'min_price': _money(row['min_price']),
+                'max_price': _money(row['max_price']),
+                'avg_price': _money(row['avg_price']),
+            }
+            for row in formats
+        ],
+        'histogram': [
+            {'format': row['format'], 'from': _money(int(row['bin']) * bucket), 'albums': row['albums']}
+            for row in bins
+        ],
+    }
+
+
+def release_years():
+    """
+    Albums per release year. Grouping by the raw date walks
+    album_release_date_idx in order; the far fewer distinct dates are
+    then folded into years here, which beats extracting the year from
+    every row in SQL.
+    """
+    years = {}
+    dates = (
+        Album.objects.exclude(release_date=None)
+        .values_list('release_date')
+        .annotate(albums=Count('id'))
+        .order_by('release_date')
+    )
+    for release_date, albums in dates:
+        years[release_date.year] = years.get(release_date.year, 0) + albums
+    return {
+        'years': [{'year': year, 'albums': albums} for year, albums in years.items()],
+        'undated': Album.objects.filter(release_date=None).count(),
+    }
+
+
+def rating_distribution(album=None):
+    """
+    How many ratings have each value, overall or for one album.
+    """
+    ratings = Rating.objects.exclude(value=None)
+    if album is not None:
+        ratings = ratings.filter(album_id=album)
+    counts = list(ratings.values('value').annotate(ratings=Count('id')).order_by('value'))
+    total = sum(row['ratings'] for row in counts)
+    return {
+        'album': album,
+        'ratings': total,
+        'average': _round(sum(row['value'] * row['ratings'] for row in counts) / total) if total else None,
+        'values': counts,
+    }
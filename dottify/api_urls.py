@@ -0,0 +1,47 @@
+"""
+REST API routes for the dottify sub-app.
+
+Mounted under api/ by dottify.urls through lazy_include(), so the DRF
+router, viewsets and serialisers are only imported once an API URL is
+resolved or reversed rather than when a worker starts.
+"""
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
+
+from .api_views import (
+    AlbumViewSet,
+    PlaylistViewSet,
+    SongViewSet,
+    analytics_index,
+    analytics_prices,
+    analytics_ratings,
+    analytics_release_years,
+    analytics_song_length,
+    autocomplete_view,
+    chart_albums_view,
+    chart_songs_view,
+    plays_view,
+    search_view,
+    statistics_view,
+)
+
+# Single router for all REST API endpoints within this sub-app.
+router = DefaultRouter()
+router.register(r'albums', AlbumViewSet, basename='album')
+router.register(r'songs', SongViewSet, basename='song')
+router.register(r'playlists', PlaylistViewSet, basename='playlist')
+
+urlpatterns = [
+    path('', include(router.urls)),
+    path('statistics/', statistics_view, name='api-statistics'),
+    path('analytics/', analytics_index, name='api-analytics'),
+    path('analytics/song-length/', analytics_song_length, name='api-analytics-song-length'),
+    path('analytics/prices/', analytics_prices, name='api-analytics-prices'),
+    path('analytics/release-years/', analytics_release_years, name='api-analytics-release-years'),
+    path('analytics/ratings/', analytics_ratings, name='api-analytics-ratings'),
+    path('autocomplete/', autocomplete_view, name='api-autocomplete'),
+    path('search/', search_view, name='api-search'),
+    path('plays/', plays_view, name='api-plays'),
+    path('charts/songs/', chart_songs_view, name='api-chart-songs'),
+    path('charts/albums/', chart_albums_view, name='api-chart-albums'),
+]
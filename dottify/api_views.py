@@ -1,21 +1,224 @@
+from decimal import Decimal, InvalidOperation
+
 from rest_framework import viewsets, status
-from rest_framework.decorators import action, api_view
+from rest_framework.decorators import action, api_view, parser_classes
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.permissions import BasePermission
+from rest_framework.reverse import reverse
+from rest_framework.settings import api_settings
 from rest_framework.response import Response
+from django.conf import settings
+from django.db.models import Count, Max, Prefetch
+from django.http import Http404, HttpResponse
 from django.shortcuts import get_object_or_404
+from django.views.decorators.http import condition
+
+from . import analytics, audience, autocomplete, charts, plays, search
+from .comments import (
+    ReplyCursorPagination,
+    comment_replies,
+    comment_threads,
+    paginate_comments,
+)
+from .conditional import ConditionalReadMixin, make_etag, not_modified, versions_etag
+from .db_router import ReplicaReadMixin
+from .fastserializers import RowMapper, dumps
+from .filters import (
+    ALBUM_FILTERS,
+    ALBUM_ORDERINGS,
+    SONG_FILTERS,
+    SONG_ORDERINGS,
+    CatalogueFilterBackend,
+    album_facets,
+    has_catalogue_params,
+)
+from .models import Album, AlbumNeighbour, Song, Playlist, Comment
+from .renderers import MessagePackParser, MessagePackRenderer
+from .serializers import (
+    AlbumSerializer,
+    CommentSerializer,
+    PlaylistSerializer,
+    SimilarAlbumSerializer,
+    SongSerializer,
+)
+from .snapshot import album_representation, catalogue_snapshot
+from .sqlite_tuning import retry_on_locked
+from .versions import current
+from .views import get_dottify_user_or_none
+
+
+class RetryOnLockMixin:
+    """
+    Wrap ModelViewSet writes in retry_on_locked() so that concurrent
+    writers back off and retry instead of returning a 500 when SQLite
+    reports "database is locked".
+    """
+    @retry_on_locked
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+
+    @retry_on_locked
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+
+    @retry_on_locked
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+
+
+class MessagePackMixin:
+    """
+    Offer application/msgpack (see dottify/renderers.py) alongside the
+    default renderers and parsers; JSON stays the default.
+    """
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, MessagePackRenderer]
+    parser_classes = [*api_settings.DEFAULT_PARSER_CLASSES, MessagePackParser]
+
+
+class FastReadMixin:
+    """
+    Answer list/retrieve through fastserializers.RowMapper instead of the
+    serializer when the client accepts plain JSON or MessagePack, nothing
+    paginates, no permission checks individual objects and the
+    serializer compiles; the response bytes are the same either way.
+    """
+    def fast_encoder(self, request):
+        renderer = request.accepted_renderer
+        if renderer.format == 'json' and 'indent' not in request.accepted_media_type:
+            encode = dumps
+        elif renderer.format == 'msgpack':
+            def encode(data):
+                return renderer.render(data, request.accepted_media_type)
+        else:
+            return None
+        if self.paginator is not None:
+            return None
+        if any(type(p).has_object_permission is not BasePermission.has_object_permission
+               for p in self.get_permissions()):
+            return None
+        mapper = RowMapper.compile(self.get_serializer_class())
+        if mapper is None:
+            return None
+        return mapper, encode
+
+    def list(self, request, *args, **kwargs):
+        fast = self.fast_encoder(request)
+        if fast is None:
+            return super().list(request, *args, **kwargs)
+        mapper, encode = fast
+        data = mapper.represent(self.filter_queryset(self.get_queryset()), request)
+        return HttpResponse(encode(data), content_type=request.accepted_renderer.media_type)
+
+    def retrieve(self, request, *args, **kwargs):
+        fast = self.fast_encoder(request)
+        if fast is None:
+            return super().retrieve(request, *args, **kwargs)
+        mapper, encode = fast
+        lookup = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset())
+        try:
+            data = mapper.represent(queryset.filter(**{self.lookup_field: kwargs[lookup]}), request)
+        except (TypeError, ValueError):
+            data = None
+        if not data:
+            raise Http404
+        return HttpResponse(encode(data[0]), content_type=request.accepted_renderer.media_type)
+
+
+class ServiceUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'This node only serves the album list and detail from a catalogue snapshot.'
+    default_code = 'read_only_snapshot'
+
+
+class SnapshotReadMixin:
+    """
+    Serve album list/retrieve from the catalogue snapshot when
+    settings.DOTTIFY_SNAPSHOT is set, without touching the database, and
+    answer every other action with 503: writes, and the nested routes
+    that still need the database.
+    """
+    def list(self, request, *args, **kwargs):
+        snapshot = catalogue_snapshot()
+        if snapshot is None:
+            return super().list(request, *args, **kwargs)
+        if has_catalogue_params(request, self):
+            raise ServiceUnavailable('Filters and sort orders need the database; this node serves a snapshot.')
+        return Response([
+            album_representation(snapshot, i, request) for i in range(len(snapshot['album']))
+        ])
+
+    def retrieve(self, request, *args, **kwargs):
+        snapshot = catalogue_snapshot()
+        if snapshot is None:
+            return super().retrieve(request, *args, **kwargs)
+        pk = kwargs[self.lookup_field]
+        i = snapshot.find('album', int(pk)) if pk.isdigit() else None
+        if i is None:
+            raise Http404
+        return Response(album_representation(snapshot, i, request))
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if settings.DOTTIFY_SNAPSHOT and self.action not in ('list', 'retrieve'):
+            raise ServiceUnavailable()
+
+
+def _comment_page_response(request, **filters):
+    """
+    Shared body of the /comments/ actions.
 
-from .models import Album, Song, Playlist
-from .serializers import AlbumSerializer, SongSerializer, PlaylistSerializer
+    Without parameters this returns the newest top-level comments;
+    ?parent=<id> pages through the replies to one comment instead.
+    Both use cursor pagination (?cursor=...) so deep pages stay cheap.
+    """
+    parent_id = request.query_params.get('parent')
+    if parent_id:
+        if not parent_id.isdigit():
+            return Response({'detail': 'Invalid parent.'}, status=status.HTTP_400_BAD_REQUEST)
+        parent = get_object_or_404(Comment, pk=parent_id, **filters)
+        page, paginator = paginate_comments(
+            request, comment_replies(parent.id), ReplyCursorPagination
+        )
+    else:
+        page, paginator = paginate_comments(request, comment_threads(**filters))
+    data = CommentSerializer(page, many=True).data
+    return paginator.get_paginated_response(data)
 
 
-class AlbumViewSet(viewsets.ModelViewSet):
+class AlbumViewSet(SnapshotReadMixin, ReplicaReadMixin, ConditionalReadMixin, FastReadMixin,
+                   MessagePackMixin, RetryOnLockMixin, viewsets.ModelViewSet):
     """
     Full CRUD API for albums.
 
     Using ModelViewSet automatically wires up list/create/retrieve/
-    update/delete for the /api/albums/ endpoints.
+    update/delete for the /api/albums/ endpoints. The nested song_set is
+    part of an album's ETag.
     """
-    queryset = Album.objects.all().order_by('id')
+    queryset = Album.objects.prefetch_related(
+        Prefetch('song_set', queryset=Song.objects.order_by('id'))
+    ).order_by('id')
     serializer_class = AlbumSerializer
+    collection_versions = ('album', 'song')
+    revision_annotations = {'songs': Count('song'), 'songs_updated_at': Max('song__updated_at')}
+    filter_backends = [CatalogueFilterBackend]
+    catalogue_filters = ALBUM_FILTERS
+    catalogue_orderings = ALBUM_ORDERINGS
+
+    @action(detail=False, methods=['get'], url_path='facets')
+    def facets(self, request):
+        """
+        /api/albums/facets/?<filters>
+
+        Album counts per format and per decade for the same filters as
+        the list, each facet ignoring its own filter.
+        """
+        etag = make_etag(request, request.get_full_path(), current('album')['album'])
+        response = not_modified(request, etag)
+        if response is None:
+            response = Response(album_facets(request.query_params, self.get_queryset()))
+        response.headers['ETag'] = etag
+        return response
 
     @action(detail=True, methods=['get'], url_path='songs')
     def songs(self, request, pk=None):
@@ -41,32 +244,113 @@ class AlbumViewSet(viewsets.ModelViewSet):
         data = SongSerializer(song, context={'request': request}).data
         return Response(data)
 
+    @action(detail=True, methods=['get'], url_path='similar')
+    def similar(self, request, pk=None):
+        """
+        Nested route: /api/albums/<pk>/similar/
+
+        Albums that share playlists with this one, best first, as
+        precomputed by the build_recommendations command. The list is
+        one range scan on the (album, rank) index; the album itself is
+        only looked up when it has no neighbours, to tell an unknown
+        album (404) from one with no recommendations yet ([]).
+        """
+        try:
+            neighbours = list(
+                AlbumNeighbour.objects.filter(album_id=pk).select_related('neighbour').order_by('rank')
+            )
+        except (TypeError, ValueError):
+            raise Http404
+        if not neighbours:
+            self.get_object()
+        return Response(SimilarAlbumSerializer(neighbours, many=True).data)
 
-class SongViewSet(viewsets.ModelViewSet):
+    @action(detail=True, methods=['get'], url_path='audience')
+    def audience(self, request, pk=None):
+        """
+        Nested route: /api/albums/<pk>/audience/
+
+        Approximate unique listeners (all time and the last recent_days
+        days) and raters, read from HyperLogLog sketches rather than
+        counted; relative_error is the standard error of each figure.
+        """
+        album = self.get_object()
+        return Response(audience.album_audience(album.id))
+
+
+class SongViewSet(ReplicaReadMixin, ConditionalReadMixin, FastReadMixin, MessagePackMixin,
+                  RetryOnLockMixin, viewsets.ModelViewSet):
     """
     Full CRUD API for songs.
     """
     queryset = Song.objects.all().order_by('id')
     serializer_class = SongSerializer
+    collection_versions = ('song',)
+    filter_backends = [CatalogueFilterBackend]
+    catalogue_filters = SONG_FILTERS
+    catalogue_orderings = SONG_ORDERINGS
 
+    @action(detail=True, methods=['get'], url_path='comments')
+    def comments(self, request, pk=None):
+        """
+        Nested route: /api/songs/<pk>/comments/
 
-class PlaylistViewSet(viewsets.ModelViewSet):
+        Cursor-paginated comment threads for the song.
+        """
+        song = self.get_object()
+        return _comment_page_response(request, song=song)
+
+    @action(detail=True, methods=['get'], url_path='audience')
+    def audience(self, request, pk=None):
+        """
+        Nested route: /api/songs/<pk>/audience/
+
+        The song's approximate unique listeners and raters, as for albums.
+        """
+        song = self.get_object()
+        return Response(audience.song_audience(song.id))
+
+
+class PlaylistViewSet(ReplicaReadMixin, ConditionalReadMixin, MessagePackMixin, RetryOnLockMixin,
+                      viewsets.ModelViewSet):
     """
     Full CRUD API for playlists.
 
     Visibility and permissions for playlists are handled at the view /
-    template level for the HTML part of the app.
+    template level for the HTML part of the app. The song count is part
+    of the ETag, since deleting a song removes it from playlists without
+    touching them.
     """
     queryset = Playlist.objects.all().order_by('id')
     serializer_class = PlaylistSerializer
+    collection_versions = ('playlist', 'song')
+    revision_annotations = {'songs_count': Count('songs')}
+
+    @action(detail=True, methods=['get'], url_path='comments')
+    def comments(self, request, pk=None):
+        """
+        Nested route: /api/playlists/<pk>/comments/
+
+        Cursor-paginated comment threads for the playlist. Comments on a
+        private playlist are only readable by its owner, matching the
+        HTML detail page.
+        """
+        playlist = self.get_object()
+        if playlist.visibility == 0:
+            duser = get_dottify_user_or_none(request.user)
+            if not duser or playlist.owner_id != duser.id:
+                return Response({'detail': 'Forbidden'}, status=status.HTTP_403_FORBIDDEN)
+        return _comment_page_response(request, playlist=playlist)
 
 
 @api_view(['GET'])
+@condition(etag_func=lambda request: versions_etag(request, 'album', 'song', 'playlist'))
 def statistics_view(request):
     """
     Simple statistics endpoint (Sheet B requirement):
 
-    Returns the total counts of albums, songs and playlists.
+    Returns the total counts of albums, songs and playlists. Revalidation
+    with If-None-Match costs one version lookup instead of three counts.
     """
     data = {
         'album_count': Album.objects.count(),
@@ -74,3 +358,177 @@ def statistics_view(request):
         'playlist_count': Playlist.objects.count(),
     }
     return Response(data, status=status.HTTP_200_OK)
+
+
+def _int_param(request, name, default, minimum=0, maximum=None):
+    raw = request.query_params.get(name)
+    if raw is None:
+        return default
+    if not raw.isdigit() or int(raw) < minimum or (maximum is not None and int(raw) > maximum):
+        bounds = f"between {minimum} and {maximum}" if maximum is not None else f"at least {minimum}"
+        raise ValidationError({name: f"Must be an integer {bounds}."})
+    return int(raw)
+
+
+@api_view(['GET'])
+def analytics_index(request):
+    """
+    /api/analytics/: links to the aggregate reports.
+    """
+    return Response({
+        name: reverse(f'api-analytics-{name}', request=request)
+        for name in ('song-length', 'prices', 'release-years', 'ratings')
+    })
+
+
+@api_view(['GET'])
+def analytics_song_length(request):
+    """
+    /api/analytics/song-length/?by=format (default) or ?by=album
+
+    Song count and average/min/max length per album format, or per album
+    in pages of ?limit= albums continuing ?after=<album id>.
+    """
+    by = request.query_params.get('by', 'format')
+    if by == 'format':
+        data = analytics.cached_report('song-length-format', ('album', 'song'),
+                                       analytics.song_length_by_format)
+    elif by == 'album':
+        data = analytics.cached_report(
+            'song-length-album', ('song',), analytics.song_length_by_album,
+            after=_int_param(request, 'after', 0),
+            limit=_int_param(request, 'limit', analytics.ANALYTICS_PAGE_SIZE,
+                             minimum=1, maximum=analytics.ANALYTICS_MAX_PAGE_SIZE),
+        )
+    else:
+        raise ValidationError({'by': "Must be 'format' or 'album'."})
+    return Response(data)
+
+
+@api_view(['GET'])
+def analytics_prices(request):
+    """
+    /api/analytics/prices/?bucket=5.00
+
+    Price summary and histogram per album format.
+    """
+    try:
+        bucket = Decimal(request.query_params.get('bucket', '5.00')).quantize(analytics.CENTS)
+    except InvalidOperation:
+        bucket = None
+    if bucket is None or not bucket > 0:
+        raise ValidationError({'bucket': 'Must be a positive amount.'})
+    return Response(analytics.cached_report('prices', ('album',), analytics.price_distribution,
+                                            bucket=bucket))
+
+
+@api_view(['GET'])
+def analytics_release_years(request):
+    """
+    /api/analytics/release-years/: albums released per year.
+    """
+    return Response(analytics.cached_report('release-years', ('album',), analytics.release_years))
+
+
+@api_view(['GET'])
+def analytics_ratings(request):
+    """
+    /api/analytics/ratings/?album=<id>
+
+    Distribution of rating values, catalogue-wide or for one album.
+    """
+    album = request.query_params.get('album')
+    if album is not None:
+        album = _int_param(request, 'album', None, minimum=1)
+    return Response(analytics.cached_report('ratings', ('rating',), analytics.rating_distribution,
+                                            album=album))
+
+
+@api_view(['GET'])
+def autocomplete_view(request):
+    """
+    /api/autocomplete/?q=<prefix>&limit=10
+
+    Albums, artists and songs with a word starting with ?q=, most popular
+    first, answered from the in-process index in dottify/autocomplete.py.
+    """
+    limit = _int_param(request, 'limit', autocomplete.AUTOCOMPLETE_LIMIT,
+                       minimum=1, maximum=autocomplete.AUTOCOMPLETE_MAX_LIMIT)
+    suggestions = autocomplete.service.search(request.query_params.get('q', ''), limit)
+    return Response([{'type': s.type, 'id': s.id, 'label': s.label} for s in suggestions])
+
+
+@api_view(['GET'])
+def search_view(request):
+    """
+    /api/search/?q=<text>&limit=20
+
+    Album titles, album artists and song titles matching ?q= despite
+    typos (dottify/search.py). `score` is the share of the query found.
+    """
+    limit = _int_param(request, 'limit', search.SEARCH_LIMIT, minimum=1, maximum=100)
+    matches = search.search(request.query_params.get('q', ''), limit=limit)
+    return Response([
+        {'field': search.FIELDS[m.field][2], 'id': m.object_id, 'text': m.text, 'score': m.score}
+        for m in matches
+    ])
+
+
+@api_view(['POST'])
+@parser_classes([*api_settings.DEFAULT_PARSER_CLASSES, MessagePackParser])
+def plays_view(request):
+    """
+    /api/plays/  {"events": [{"user": 1, "song": 2, "timestamp":
+    "2026-10-19T20:15:00Z", "duration": 181.5}, ...]}
+
+    Accepts a batch of play events, all or nothing, into the buffered
+    segment writer (dottify/plays.py). `user` is a DottifyUser id or
+    null; `duration` is the seconds listened.
+    """
+    events = request.data.get('events') if isinstance(request.data, dict) else None
+    count, by_day = plays.parse_events(events)
+    plays.writer.append(by_day)
+    return Response({'accepted': count}, status=status.HTTP_202_ACCEPTED)
+
+
+def _chart_response(request, kind, represent):
+    album_format = request.query_params.get('album_format') or None
+    if album_format is not None and album_format not in dict(Album.FORMAT_CHOICES):
+        raise ValidationError({'album_format': f"Must be one of {', '.join(dict(Album.FORMAT_CHOICES))}."})
+    limit = _int_param(request, 'limit', charts.CHART_LIMIT, minimum=1, maximum=charts.CHART_MAX_LIMIT)
+    entries, updated_at = charts.chart(kind, album_format, limit)
+    etag = make_etag(request, request.get_full_path(), updated_at)
+    response = not_modified(request, etag)
+    if response is None:
+        response = Response([
+            {'rank': rank, **represent(item), 'score': score}
+            for rank, (item, score) in enumerate(entries, 1)
+        ])
+    response.headers['ETag'] = etag
+    return response
+
+
+@api_view(['GET'])
+def chart_songs_view(request):
+    """
+    /api/charts/songs/?album_format=LIVE&limit=20
+
+    The most played and best rated songs of late, overall or from albums
+    of one format, as last checkpointed by update_charts
+    (dottify/charts.py). `score` is in decayed plays.
+    """
+    return _chart_response(request, 'songs', lambda song: {
+        'id': song.id, 'title': song.title, 'album': song.album_id,
+    })
+
+
+@api_view(['GET'])
+def chart_albums_view(request):
+    """
+    /api/charts/albums/?album_format=LIVE&limit=20
+
+    As /api/charts/songs/, for albums.
+    """
+    return _chart_response(request, 'albums', lambda album: {
+        'id': album.id, 'title': album.title, 'artist_name': album.artist_name,
+    })
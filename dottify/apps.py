@@ -6,9 +6,25 @@ class DottifyConfig(AppConfig):
     """
     Application configuration for the dottify sub-app.
 
-    If we needed to hook into Django's startup (e.g. to create default
-    groups or permissions) we would wire post_migrate signals from here.
-    For the coursework, the default behaviour is sufficient.
+    ready() connects the change-event outbox (dottify/outbox.py),
+    data-version (dottify/versions.py), playlist revision
+    (dottify/conditional.py), autocomplete (dottify/autocomplete.py),
+    fuzzy search (dottify/search.py), smart playlist
+    (dottify/smart_playlists.py) and unique rater (dottify/audience.py)
+    signals, and registers the
+    background jobs in dottify/tasks.py so that job workers know them
+    without importing the views.
     """
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'dottify'
+
+    def ready(self):
+        from . import tasks  # noqa: F401
+        from . import audience, autocomplete, conditional, outbox, search, smart_playlists, versions
+        outbox.connect_signals()
+        versions.connect_signals()
+        conditional.connect_signals()
+        autocomplete.connect_signals()
+        search.connect_signals()
+        smart_playlists.connect_signals()
+        audience.connect_signals()
@@ -0,0 +1,260 @@
+"""
+Approximate unique listener and rater counts.
+
+Each album and song has a HyperLogLog sketch of the users who played it
+and of those who rated it, per UTC day and over all time
+(AudienceSketch rows). A sketch has REGISTERS one-byte registers and
+estimates a distinct count with a standard error of RELATIVE_ERROR
+(1.04 / sqrt(REGISTERS), about 1.6%); counts up to a few hundred are
+close to exact. Sketches of different days or songs merge by taking
+each register's maximum, so "last 30 days" is the union of 30 day rows
+and an album's listeners are the union of its songs'. Small sketches
+are stored as (register, value) pairs, so a rarely played song costs a
+few bytes rather than REGISTERS.
+
+The play roll-up (dottify/plays.py) rewrites the listener sketches of
+the day it rolls up and merges them into the all-time ones; a merge is
+idempotent, so rolling a day up again is harmless. Ratings update the
+rater sketches as they are created. Neither can be taken back: a
+deleted rating still counts its user.
+"""
+import math
+import struct
+from datetime import timedelta, timezone as dt_timezone
+from functools import lru_cache
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+from .models import Album, AudienceSketch, Rating, Song
+
+PRECISION = 12
+REGISTERS = 1 << PRECISION
+RELATIVE_ERROR = 1.04 / math.sqrt(REGISTERS)
+# Sketches with more registers set than this are held as a bytearray.
+SPARSE_LIMIT = 64
+# Windows shown on album pages, in days.
+AUDIENCE_RECENT_DAYS = 30
+# Day sketches older than this are deleted by the roll-up.
+AUDIENCE_KEEP_DAYS = 90
+AUDIENCE_CHUNK_SIZE = 500
+
+_MASK = (1 << 64) - 1
+_RANK_BITS = 64 - PRECISION
+_ALPHA = 0.7213 / (1 + 1.079 / REGISTERS)
+_POWERS = [2.0 ** -rank for rank in range(_RANK_BITS + 2)]
+_PAIR = struct.Struct('<HB')
+SPARSE = b'S'
+DENSE = b'D'
+
+
+@lru_cache(maxsize=1 << 16)
+def register(value):
+    """
+    (register, rank) for an integer id: the top PRECISION bits of its
+    64-bit splitmix hash pick the register, the rest give the rank.
+    """
+    z = (value + 0x9E3779B97F4A7C15) & _MASK
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK
+    z ^= z >> 31
+    rest = z & ((1 << _RANK_BITS) - 1)
+    return z >> _RANK_BITS, _RANK_BITS - rest.bit_length() + 1
+
+
+class HyperLogLog:
+    """
+    A distinct-count sketch over integer ids, sparse (a dict of set
+    registers) until more than SPARSE_LIMIT are set.
+    """
+    __slots__ = ('sparse', 'dense')
+
+    def __init__(self):
+        self.sparse = {}
+        self.dense = None
+
+    def add(self, value):
+        self.add_register(*register(value))
+
+    def add_register(self, index, rank):
+        if self.dense is not None:
+            if self.dense[index] < rank:
+                self.dense[index] = rank
+        elif self.sparse.get(index, 0) < rank:
+            self.sparse[index] = rank
+            if len(self.sparse) > SPARSE_LIMIT:
+                self._densify()
+
+    def _densify(self):
+        dense = bytearray(REGISTERS)
+        for index, rank in self.sparse.items():
+            dense[index] = rank
+        self.dense, self.sparse = dense, None
+
+    def update(self, other):
+        """
+        Merge `other` in: the sketch of the union of both sets.
+        """
+        if other.dense is None:
+            for index, rank in other.sparse.items():
+                self.add_register(index, rank)
+            return
+        if self.dense is None:
+            self._densify()
+        self.dense = bytearray(map(max, self.dense, other.dense))
+
+    def count(self):
+        if self.dense is not None:
+            zeros = self.dense.count(0)
+            total = sum(map(_POWERS.__getitem__, self.dense))
+        else:
+            zeros = REGISTERS - len(self.sparse)
+            total = zeros + sum(map(_POWERS.__getitem__, self.sparse.values()))
+        estimate = _ALPHA * REGISTERS * REGISTERS / total
+        if estimate <= 2.5 * REGISTERS and zeros:
+            # Linear counting, far more accurate while registers are empty.
+            estimate = REGISTERS * math.log(REGISTERS / zeros)
+        return round(estimate)
+
+    def to_bytes(self):
+        pairs = self.sparse if self.dense is None else {i: r for i, r in enumerate(self.dense) if r}
+        if len(pairs) * _PAIR.size < REGISTERS:
+            return SPARSE + b''.join(_PAIR.pack(index, rank) for index, rank in sorted(pairs.items()))
+        return DENSE + bytes(self.dense)
+
+    @classmethod
+    def from_bytes(cls, data):
+        data = bytes(data)
+        sketch = cls()
+        if data[:1] == DENSE:
+            sketch.dense, sketch.sparse = bytearray(data[1:]), None
+        else:
+            for index, rank in _PAIR.iter_unpack(data[1:]):
+                sketch.add_register(index, rank)
+        return sketch
+
+
+def merge_into(target, metric, day, sketches):
+    """
+    Merge {object_id: HyperLogLog} into the stored sketches of `day`
+    (None for all time), creating the missing ones.
+    """
+    ids = sorted(sketches)
+    for start in range(0, len(ids), AUDIENCE_CHUNK_SIZE):
+        chunk = ids[start:start + AUDIENCE_CHUNK_SIZE]
+        rows = AudienceSketch.objects.filter(target=target, metric=metric, object_id__in=chunk)
+        rows = rows.filter(day__isnull=True) if day is None else rows.filter(day=day)
+        merged = {object_id: sketches[object_id] for object_id in chunk}
+        # Read, delete and re-insert in one transaction, so a concurrent
+        # merge waits for this one instead of overwriting it: on SQLite
+        # the transaction takes the write lock up front (BEGIN IMMEDIATE,
+        # see dottify/sqlite_tuning.py), elsewhere select_for_update()
+        # locks the rows.
+        with transaction.atomic():
+            for object_id, registers in rows.select_for_update().values_list('object_id', 'registers'):
+                stored = HyperLogLog.from_bytes(registers)
+                stored.update(merged[object_id])
+                merged[object_id] = stored
+            rows.delete()
+            AudienceSketch.objects.bulk_create([
+                AudienceSketch(target=target, object_id=object_id, metric=metric, day=day,
+                               registers=sketch.to_bytes())
+                for object_id, sketch in merged.items()
+            ])
+
+
+def record_listeners(day, songs, albums):
+    """
+    Replace the listener sketches of `day` with `songs` ({song id:
+    HyperLogLog}) and their albums' unions (`albums` maps song to album),
+    and merge both into the all-time sketches.
+    """
+    by_album = {}
+    for song, sketch in songs.items():
+        album = albums[song]
+        if album not in by_album:
+            by_album[album] = HyperLogLog()
+        by_album[album].update(sketch)
+    with transaction.atomic():
+        AudienceSketch.objects.filter(metric=AudienceSketch.LISTENERS, day=day).delete()
+        for target, sketches in ((AudienceSketch.SONG, songs), (AudienceSketch.ALBUM, by_album)):
+            merge_into(target, AudienceSketch.LISTENERS, day, sketches)
+            merge_into(target, AudienceSketch.LISTENERS, None, sketches)
+
+
+def prune(today=None):
+    """
+    Delete day sketches older than AUDIENCE_KEEP_DAYS; the all-time ones
+    already include them.
+    """
+    today = today or timezone.now().date()
+    return AudienceSketch.objects.filter(day__lt=today - timedelta(days=AUDIENCE_KEEP_DAYS)).delete()[0]
+
+
+def distinct_count(target, object_id, metric, days=None, today=None):
+    """
+    Approximate distinct users for all time, or for the last `days` days
+    including today.
+    """
+    rows = AudienceSketch.objects.filter(target=target, object_id=object_id, metric=metric)
+    if days is None:
+        rows = rows.filter(day__isnull=True)
+    else:
+        today = today or timezone.now().date()
+        rows = rows.filter(day__gt=today - timedelta(days=days), day__lte=today)
+    sketch = HyperLogLog()
+    for registers in rows.values_list('registers', flat=True):
+        sketch.update(HyperLogLog.from_bytes(registers))
+    return sketch.count()
+
+
+def audience(target, object_id):
+    """
+    Unique listeners (all time and recent) and raters of an album or
+    song, with the relative standard error of each figure.
+    """
+    return {
+        'listeners': distinct_count(target, object_id, AudienceSketch.LISTENERS),
+        'recent_listeners': distinct_count(target, object_id, AudienceSketch.LISTENERS, AUDIENCE_RECENT_DAYS),
+        'recent_days': AUDIENCE_RECENT_DAYS,
+        'raters': distinct_count(target, object_id, AudienceSketch.RATERS),
+        'relative_error': round(RELATIVE_ERROR, 4),
+    }
+
+
+def album_audience(album_id):
+    return audience(AudienceSketch.ALBUM, album_id)
+
+
+def song_audience(song_id):
+    return audience(AudienceSketch.SONG, song_id)
+
+
+def _rating_saved(sender, instance, created, **kwargs):
+    if not created or instance.user_id is None:
+        return
+    album_id = instance.album_id
+    if album_id is None and instance.song_id is not None:
+        album_id = Song.objects.filter(pk=instance.song_id).values_list('album_id', flat=True).first()
+    sketch = HyperLogLog()
+    sketch.add(instance.user_id)
+    day = instance.created_at.astimezone(dt_timezone.utc).date()
+    for target, object_id in ((AudienceSketch.ALBUM, album_id), (AudienceSketch.SONG, instance.song_id)):
+        if object_id is not None:
+            for bucket in (day, None):
+                merge_into(target, AudienceSketch.RATERS, bucket, {object_id: sketch})
+
+
+def _deleted(sender, instance, **kwargs):
+    target = AudienceSketch.ALBUM if sender is Album else AudienceSketch.SONG
+    AudienceSketch.objects.filter(target=target, object_id=instance.pk).delete()
+
+
+def connect_signals():
+    """
+    Called from DottifyConfig.ready().
+    """
+    post_save.connect(_rating_saved, sender=Rating, dispatch_uid='audience_rating_saved')
+    post_delete.connect(_deleted, sender=Album, dispatch_uid='audience_album_deleted')
+    post_delete.connect(_deleted, sender=Song, dispatch_uid='audience_song_deleted')
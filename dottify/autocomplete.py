@@ -0,0 +1,292 @@
+"""
+As-you-type suggestions for /api/autocomplete/.
+
+Each process keeps a PrefixIndex over normalized album titles, artist
+names and song titles: one sorted array of keys searched with bisect,
+where an item is keyed by its whole name and by the name from each of
+its first few later words, so "moon" finds "The Dark Side of the Moon".
+A query takes the keys starting with it and returns the most popular
+items: albums by the playlists they appear in (AlbumStats), songs by
+their playlists, artists by their albums' total. Prefixes matching too
+many keys to rank per request keep their top items, so every lookup
+touches a bounded number of keys.
+
+The index is bounded to AUTOCOMPLETE_MAX_ITEMS items, the most popular.
+Saves and deletes of albums, songs and artists update it in place once
+their transaction commits. Signals only reach the process that made the
+change, so an index older than AUTOCOMPLETE_MAX_AGE is rebuilt in a
+background thread while the old one keeps answering; that also refreshes
+popularity.
+"""
+import heapq
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from collections import namedtuple
+
+from django.db import connection, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.signals import post_delete, post_save
+
+from .models import Album, Artist, Song
+
+AUTOCOMPLETE_MAX_ITEMS = 200_000
+AUTOCOMPLETE_MAX_AGE = 15 * 60
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 20
+
+# Words after the first that also start a key.
+WORD_KEYS = 5
+# Prefixes matching more keys than this keep their top items.
+SCAN_ENTRIES = 256
+
+Suggestion = namedtuple('Suggestion', 'type id label score')
+
+_NON_WORD = re.compile(r'[\W_]+')
+
+
+def normalize(text):
+    """
+    Lower-case, accent-free, punctuation-free form used for matching:
+    "Björk: Début!" -> "bjork debut".
+    """
+    decomposed = unicodedata.normalize('NFKD', text)
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return _NON_WORD.sub(' ', stripped.casefold()).strip()
+
+
+def index_keys(label):
+    name = normalize(label)
+    if not name:
+        return []
+    keys = [name]
+    start = 0
+    for _ in range(WORD_KEYS):
+        start = name.find(' ', start) + 1
+        if not start:
+            break
+        keys.append(name[start:])
+    return keys
+
+
+def _rank(suggestion):
+    return (-suggestion.score, len(suggestion.label), suggestion.label, suggestion.type, suggestion.id)
+
+
+class PrefixIndex:
+    """
+    A sorted array of (key, type, id) with the suggestions they point to.
+
+    A prefix matching at most SCAN_ENTRIES keys is answered by ranking
+    those keys' items. Broader prefixes have their top
+    AUTOCOMPLETE_MAX_LIMIT items stored in `tops`, each merged from the
+    tops of (or a scan over) the prefix one character longer, so
+    building them reads every key once. Adding or removing a key drops
+    the stored tops along its path; they are merged again on next use.
+
+    Not thread-safe by itself; see AutocompleteService.
+    """
+    def __init__(self, suggestions=()):
+        self.items = {(s.type, s.id): s for s in suggestions}
+        self.entries = sorted(
+            (key, s.type, s.id) for s in self.items.values() for key in index_keys(s.label)
+        )
+        self.tops = {}
+        self._top('', 0, len(self.entries))
+
+    def __len__(self):
+        return len(self.items)
+
+    def add(self, suggestion):
+        self.remove(suggestion.type, suggestion.id)
+        self.items[(suggestion.type, suggestion.id)] = suggestion
+        for key in index_keys(suggestion.label):
+            insort(self.entries, (key, suggestion.type, suggestion.id))
+            self._forget(key)
+
+    def remove(self, type, id):
+        old = self.items.pop((type, id), None)
+        if old is None:
+            return
+        for key in index_keys(old.label):
+            i = bisect_left(self.entries, (key, type, id))
+            if i < len(self.entries) and self.entries[i] == (key, type, id):
+                del self.entries[i]
+            self._forget(key)
+
+    def _forget(self, key):
+        for n in range(len(key) + 1):
+            self.tops.pop(key[:n], None)
+
+    def _range(self, prefix, lo=0, hi=None):
+        hi = len(self.entries) if hi is None else hi
+        start = bisect_left(self.entries, (prefix,), lo, hi)
+        if not prefix:
+            return start, hi
+        return start, bisect_left(self.entries, (prefix[:-1] + chr(ord(prefix[-1]) + 1),), start, hi)
+
+    def _ranked(self, refs, limit):
+        return heapq.nsmallest(limit, [self.items[ref] for ref in set(refs)], key=_rank)
+
+    def _top(self, prefix, start, end):
+        """
+        The best AUTOCOMPLETE_MAX_LIMIT distinct items keyed under
+        `prefix`, whose keys are entries[start:end].
+        """
+        if end - start <= SCAN_ENTRIES:
+            return self._ranked([(type, id) for _, type, id in self.entries[start:end]],
+                                AUTOCOMPLETE_MAX_LIMIT)
+        top = self.tops.get(prefix)
+        if top is not None:
+            return top
+        depth = len(prefix)
+        refs = []
+        i = start
+        while i < end and len(self.entries[i][0]) == depth:
+            refs.append(self.entries[i][1:])
+            i += 1
+        while i < end:
+            child = prefix + self.entries[i][0][depth]
+            _, j = self._range(child, i, end)
+            refs.extend((s.type, s.id) for s in self._top(child, i, j))
+            i = j
+        top = self.tops[prefix] = self._ranked(refs, AUTOCOMPLETE_MAX_LIMIT)
+        return top
+
+    def search(self, query, limit=AUTOCOMPLETE_LIMIT):
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        start, end = self._range(prefix)
+        return self._top(prefix, start, end)[:limit]
+
+
+def load_suggestions(max_items=AUTOCOMPLETE_MAX_ITEMS):
+    """
+    The `max_items` most popular albums, artists and songs.
+    """
+    albums = (
+        Album.objects.annotate(score=F('stats__playlist_count'))
+        .order_by(F('score').desc(nulls_last=True), 'id')
+        .values_list('id', 'title', 'score')[:max_items]
+    )
+    artists = (
+        Artist.objects.annotate(score=Sum('albums__stats__playlist_count'))
+        .order_by(F('score').desc(nulls_last=True), 'id')
+        .values_list('id', 'name', 'score')[:max_items]
+    )
+    songs = (
+        Song.objects.annotate(score=Count('playlists'))
+        .order_by('-score', 'id')
+        .values_list('id', 'title', 'score')[:max_items]
+    )
+    suggestions = (
+        Suggestion(type, id, label, score or 0)
+        for type, rows in (('album', albums), ('artist', artists), ('song', songs))
+        for id, label, score in rows.iterator()
+    )
+    return heapq.nsmallest(max_items, suggestions, key=_rank)
+
+
+class AutocompleteService:
+    """
+    The per-process index plus its locking, updates and rebuilds.
+    """
+    def __init__(self, max_items=AUTOCOMPLETE_MAX_ITEMS, max_age=AUTOCOMPLETE_MAX_AGE):
+        self.max_items = max_items
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        # Held for the whole first build, so concurrent first requests
+        # wait for one build instead of each running their own.
+        self.build_lock = threading.Lock()
+        self.index = None
+        self.built_at = 0
+        self.rebuilding = None   # changes seen while a rebuild runs
+        self.floor = 0
+
+    def _install(self, suggestions):
+        index = PrefixIndex(suggestions)
+        with self.lock:
+            for apply in self.rebuilding or ():
+                apply(index)
+            self.index = index
+            self.built_at = time.monotonic()
+            self.rebuilding = None
+            self.floor = suggestions[-1].score if len(suggestions) >= self.max_items else 0
+
+    def rebuild(self):
+        with self.lock:
+            self.rebuilding = []
+        self._install(load_suggestions(self.max_items))
+
+    def _rebuild_in_background(self):
+        def run():
+            try:
+                self.rebuild()
+            finally:
+                connection.close()
+        with self.lock:
+            if self.rebuilding is not None:
+                return
+            self.rebuilding = []
+        threading.Thread(target=run, name='autocomplete-rebuild', daemon=True).start()
+
+    def search(self, query, limit=AUTOCOMPLETE_LIMIT):
+        if self.index is None:
+            with self.build_lock:
+                if self.index is None:
+                    self.rebuild()
+        elif time.monotonic() - self.built_at > self.max_age or len(self.index) > self.max_items * 1.1:
+            self._rebuild_in_background()
+        with self.lock:
+            return self.index.search(query, limit)
+
+    def _apply(self, change):
+        # Before the first build there is nothing to update, but changes
+        # made while it runs may be missing from what it read.
+        with self.lock:
+            if self.index is not None:
+                change(self.index)
+            if self.rebuilding is not None:
+                self.rebuilding.append(change)
+
+    def saved(self, type, id, label):
+        def change(index):
+            old = index.items.get((type, id))
+            score = old.score if old else 0
+            if old is None and len(index) >= self.max_items and score < self.floor:
+                return
+            index.add(Suggestion(type, id, label, score))
+        self._apply(change)
+
+    def deleted(self, type, id):
+        self._apply(lambda index: index.remove(type, id))
+
+
+service = AutocompleteService()
+
+# model -> (suggestion type, label field)
+INDEXED = {Album: ('album', 'title'), Artist: ('artist', 'name'), Song: ('song', 'title')}
+
+
+def _saved(sender, instance, **kwargs):
+    type, field = INDEXED[sender]
+    label = getattr(instance, field)
+    transaction.on_commit(lambda: service.saved(type, instance.pk, label))
+
+
+def _deleted(sender, instance, **kwargs):
+    type, _ = INDEXED[sender]
+    pk = instance.pk
+    transaction.on_commit(lambda: service.deleted(type, pk))
+
+
+def connect_signals():
+    """
+    Called from DottifyConfig.ready().
+    """
+    for model, (type, _) in INDEXED.items():
+        post_save.connect(_saved, sender=model, dispatch_uid=f'autocomplete_{type}_saved')
+        post_delete.connect(_deleted, sender=model, dispatch_uid=f'autocomplete_{type}_deleted')
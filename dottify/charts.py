@@ -0,0 +1,279 @@
+"""
+Song and album charts ranked by recent plays and ratings.
+
+Every play adds PLAY_WEIGHT and every rating RATING_WEIGHT per star to
+its song and album, decayed by half every CHART_HALF_LIFE. Decay uses
+forward decay: an event at time t adds weight * 2 ** ((t - landmark) /
+half-life), so older counts never need touching, ranks are the same at
+any later time, and a count is brought to "now" only when a chart is
+written. When the factors grow too large the landmark moves forward and
+every count is scaled down once.
+
+Counts live in one SpaceSaving sketch per chart, global and per album
+format, each holding at most CHART_CAPACITY items whatever the size of
+the catalogue. ChartBuilder tails the play segments (dottify/plays.py)
+and the Rating table, and the update_charts command saves its sketches,
+read positions and resulting top CHART_SIZE lists to a ChartCheckpoint
+row after every pass. /api/charts/ reads those lists, so a chart is
+answered in O(K) without ranking any songs; a restarted builder carries
+on from the checkpoint.
+"""
+import heapq
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .models import Album, ChartCheckpoint, Rating, Song
+from .packing import packb, unpackb
+from .plays import EPOCH, PLAY_MAX_AGE, day_of, tail
+
+CHART_NAME = 'charts'
+CHART_HALF_LIFE = timedelta(days=7)
+CHART_CAPACITY = 2000
+CHART_SIZE = 100
+CHART_LIMIT = 20
+CHART_MAX_LIMIT = 50
+PLAY_WEIGHT = 1.0
+RATING_WEIGHT = 1.0
+# The landmark moves once decay factors pass 2 ** RENORMALIZE_HALF_LIVES.
+RENORMALIZE_HALF_LIVES = 64
+# Plays and ratings handled per catalogue lookup.
+CHART_BATCH_SIZE = 10_000
+SONG_CACHE_SIZE = 200_000
+
+HALF_LIFE_MICROS = CHART_HALF_LIFE // timedelta(microseconds=1)
+GLOBAL = ''
+KINDS = ('songs', 'albums')
+
+
+def _micros(moment):
+    return (moment - EPOCH) // timedelta(microseconds=1)
+
+
+class SpaceSaving:
+    """
+    Weighted Space-Saving: at most `capacity` counters. An item without
+    one takes over the smallest, inheriting its count as the item's
+    error, so a count overestimates the item's true weight by at most its
+    error, and every item with more than total / capacity of the weight
+    is counted. The smallest counter is found with a heap whose stale
+    entries are skipped and, once they pile up, rebuilt away.
+    """
+    def __init__(self, capacity=CHART_CAPACITY, counters=()):
+        self.capacity = capacity
+        self.counters = {item: [count, error] for item, count, error in counters}
+        self._heapify()
+
+    def _heapify(self):
+        self.heap = [(counter[0], item) for item, counter in self.counters.items()]
+        heapq.heapify(self.heap)
+
+    def __len__(self):
+        return len(self.counters)
+
+    def add(self, item, weight):
+        counter = self.counters.get(item)
+        if counter is None:
+            if len(self.counters) < self.capacity:
+                counter = self.counters[item] = [0.0, 0.0]
+            else:
+                while True:
+                    count, victim = heapq.heappop(self.heap)
+                    smallest = self.counters.get(victim)
+                    if smallest is not None and smallest[0] == count:
+                        break
+                del self.counters[victim]
+                counter = self.counters[item] = [count, count]
+        counter[0] += weight
+        heapq.heappush(self.heap, (counter[0], item))
+        if len(self.heap) > 4 * self.capacity:
+            self._heapify()
+
+    def scale(self, factor):
+        for counter in self.counters.values():
+            counter[0] *= factor
+            counter[1] *= factor
+        self._heapify()
+
+    def top(self, k):
+        """
+        The `k` largest (item, count, error), largest first.
+        """
+        return [(item, count, error) for count, error, item in heapq.nlargest(
+            k, ((count, error, item) for item, (count, error) in self.counters.items())
+        )]
+
+    def state(self):
+        return [[item, count, error] for item, (count, error) in self.counters.items()]
+
+
+class ChartBuilder:
+    """
+    The sketches of every chart plus the positions read up to in the play
+    segments and the Rating table.
+    """
+    def __init__(self, state=None, capacity=CHART_CAPACITY):
+        state = state or {}
+        self.capacity = capacity
+        self.landmark = state.get('landmark', _micros(timezone.now()))
+        self.offsets = state.get('offsets', {})
+        self.last_rating = state.get('last_rating', 0)
+        self.sketches = {
+            key: SpaceSaving(capacity, counters) for key, counters in state.get('sketches', {}).items()
+        }
+        self.songs = {}   # song id -> (album id, format), or None if gone
+
+    def state(self):
+        return {
+            'landmark': self.landmark,
+            'offsets': self.offsets,
+            'last_rating': self.last_rating,
+            'sketches': {key: sketch.state() for key, sketch in self.sketches.items()},
+        }
+
+    def _sketch(self, kind, format):
+        key = f'{kind}:{format}'
+        sketch = self.sketches.get(key)
+        if sketch is None:
+            sketch = self.sketches[key] = SpaceSaving(self.capacity)
+        return sketch
+
+    def _weight(self, weight, micros):
+        exponent = (micros - self.landmark) / HALF_LIFE_MICROS
+        if exponent > RENORMALIZE_HALF_LIVES:
+            factor = 2.0 ** -exponent
+            for sketch in self.sketches.values():
+                sketch.scale(factor)
+            self.landmark = micros
+            exponent = 0.0
+        return weight * 2.0 ** exponent
+
+    def add(self, song, album, format, weight, micros):
+        """
+        Count `weight` at time `micros` for `song` (if any) and `album`.
+        """
+        weight = self._weight(weight, micros)
+        for chart in (GLOBAL, format) if format else (GLOBAL,):
+            if song is not None:
+                self._sketch('songs', chart).add(song, weight)
+            self._sketch('albums', chart).add(album, weight)
+
+    def _load_songs(self, song_ids):
+        missing = [song for song in set(song_ids) if song not in self.songs]
+        if len(self.songs) + len(missing) > SONG_CACHE_SIZE:
+            self.songs = {}
+            missing = list(set(song_ids))
+        for start in range(0, len(missing), 500):
+            chunk = missing[start:start + 500]
+            self.songs.update((song, None) for song in chunk)
+            self.songs.update(
+                (song, (album, format)) for song, album, format
+                in Song.objects.filter(id__in=chunk).values_list('id', 'album_id', 'album__format')
+            )
+
+    def add_plays(self, records):
+        """
+        Count (user, song, micros, duration) play records; plays of songs
+        that no longer exist are dropped. Returns the number read.
+        """
+        read = 0
+        batch = []
+        for record in records:
+            batch.append(record)
+            if len(batch) == CHART_BATCH_SIZE:
+                read += self._add_play_batch(batch)
+                batch = []
+        return read + self._add_play_batch(batch)
+
+    def _add_play_batch(self, batch):
+        self._load_songs([song for _, song, _, _ in batch])
+        for _, song, micros, _ in batch:
+            found = self.songs.get(song)
+            if found is not None:
+                self.add(song, *found, PLAY_WEIGHT, micros)
+        return len(batch)
+
+    def consume_plays(self, now=None):
+        """
+        Count the plays appended since the last call. Plays are accepted
+        up to PLAY_MAX_AGE late, so older days are not read again.
+        """
+        now = now or timezone.now()
+        since = day_of(_micros(now - PLAY_MAX_AGE - timedelta(days=1)))
+        return self.add_plays(tail(self.offsets, since))
+
+    def consume_ratings(self):
+        """
+        Count the ratings created since the last call. Edits and deletes
+        of counted ratings are not taken back.
+        """
+        read = 0
+        while True:
+            rows = list(
+                Rating.objects.filter(id__gt=self.last_rating, value__gt=0).order_by('id')
+                .values_list('id', 'song_id', 'album_id', 'value', 'created_at')[:CHART_BATCH_SIZE]
+            )
+            if not rows:
+                return read
+            self._load_songs([song for _, song, _, _, _ in rows if song is not None])
+            formats = dict(Album.objects.filter(
+                id__in={album for _, _, album, _, _ in rows if album is not None}
+            ).values_list('id', 'format'))
+            for _, song, album, value, created_at in rows:
+                found = self.songs.get(song) if song is not None else None
+                if found is not None:
+                    self.add(song, *found, RATING_WEIGHT * value, _micros(created_at))
+                elif album in formats:
+                    self.add(None, album, formats[album], RATING_WEIGHT * value, _micros(created_at))
+            self.last_rating = rows[-1][0]
+            read += len(rows)
+
+    def charts(self, size=CHART_SIZE, now=None):
+        """
+        {'songs': {format: [[id, score], ...]}, 'albums': {...}} with the
+        global chart under ''. Scores are decayed weights as of `now`.
+        """
+        decay = 2.0 ** -((_micros(now or timezone.now()) - self.landmark) / HALF_LIFE_MICROS)
+        charts = {kind: {} for kind in KINDS}
+        for key, sketch in self.sketches.items():
+            kind, format = key.split(':')
+            charts[kind][format] = [[item, round(count * decay, 3)] for item, count, _ in sketch.top(size)]
+        return charts
+
+
+def load(name=CHART_NAME):
+    checkpoint = ChartCheckpoint.objects.filter(name=name).first()
+    return ChartBuilder(unpackb(bytes(checkpoint.state)) if checkpoint else None)
+
+
+def save(builder, name=CHART_NAME, now=None):
+    ChartCheckpoint.objects.update_or_create(
+        name=name, defaults={'state': packb(builder.state()), 'charts': builder.charts(now=now)},
+    )
+
+
+def update(builder=None, name=CHART_NAME, now=None):
+    """
+    Read new plays and ratings into `builder` (by default the one saved
+    under `name`) and checkpoint it. Returns (plays, ratings) read.
+    """
+    builder = builder or load(name)
+    counted = builder.consume_plays(now), builder.consume_ratings()
+    save(builder, name, now)
+    return counted
+
+
+def chart(kind, format=None, limit=CHART_LIMIT, name=CHART_NAME):
+    """
+    (entries, updated_at) for the chart of `kind` ('songs' or 'albums'),
+    global or for one album format, as [(object, score), ...] with
+    objects deleted since the checkpoint left out.
+    """
+    row = ChartCheckpoint.objects.filter(name=name).values_list('charts', 'updated_at').first()
+    if row is None:
+        return [], None
+    charts, updated_at = row
+    entries = charts.get(kind, {}).get(format or GLOBAL, [])[:limit * 2]
+    model = Song if kind == 'songs' else Album
+    objects = model.objects.in_bulk([item for item, _ in entries])
+    return [(objects[item], score) for item, score in entries if item in objects][:limit], updated_at
@@ -0,0 +1,101 @@
+from django.db.models import Count, IntegerField, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
+from django.http import Http404
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.request import Request
+
+from .models import Comment
+
+# Number of top-level comments shown per page (HTML and JSON).
+COMMENT_PAGE_SIZE = 20
+
+# Number of replies rendered under each comment on the detail pages.
+# The rest of a thread is loaded from the JSON endpoint with ?parent=<id>.
+COMMENT_REPLY_PREVIEW = 3
+
+
+class CommentCursorPagination(CursorPagination):
+    """
+    Cursor pagination for top-level comments, newest first.
+
+    The cursor is a created_at position, so each page is an index range
+    scan on (playlist, created_at) / (song, created_at) no matter how deep
+    into the discussion the client is.
+    """
+    page_size = COMMENT_PAGE_SIZE
+    ordering = ('-created_at', '-id')
+
+
+class ReplyCursorPagination(CommentCursorPagination):
+    """
+    Replies read top to bottom, so they are paged oldest first.
+    """
+    ordering = ('created_at', 'id')
+
+
+def _reply_count():
+    """
+    Correlated subquery counting direct replies.
+
+    Used instead of Count('replies') so SQLite only evaluates it for the
+    rows on the requested page rather than grouping the whole thread.
+    """
+    counts = (
+        Comment.objects.filter(parent=OuterRef('pk'))
+        .order_by()
+        .values('parent')
+        .annotate(n=Count('id'))
+        .values('n')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def comment_threads(**filters):
+    """
+    Top-level comments matching `filters` (e.g. playlist=..., song=...),
+    with authors joined in and the first few replies prefetched into
+    `reply_preview` (sliced prefetches need a to_attr).
+    """
+    replies = (
+        Comment.objects.select_related('user')
+        .order_by('created_at', 'id')[:COMMENT_REPLY_PREVIEW]
+    )
+    return (
+        Comment.objects.filter(parent__isnull=True, **filters)
+        .select_related('user')
+        .annotate(reply_count=_reply_count())
+        .prefetch_related(Prefetch('replies', queryset=replies, to_attr='reply_preview'))
+    )
+
+
+def comment_replies(parent_id):
+    """
+    Direct replies to one comment, for paging through a long thread.
+    """
+    return (
+        Comment.objects.filter(parent_id=parent_id)
+        .select_related('user')
+        .annotate(reply_count=_reply_count())
+    )
+
+
+def paginate_comments(request, queryset, paginator_class=CommentCursorPagination):
+    """
+    Return (page, paginator) for one page of `queryset`.
+
+    Works for both plain Django requests (HTML pages) and DRF requests.
+    A malformed ?cursor= is reported as a 404 on HTML pages, matching
+    what DRF does for the JSON endpoint.
+    """
+    is_html = not isinstance(request, Request)
+    paginator = paginator_class()
+    try:
+        page = paginator.paginate_queryset(
+            queryset, Request(request) if is_html else request
+        )
+    except NotFound:
+        if is_html:
+            raise Http404("Invalid cursor")
+        raise
+    return page, paginator
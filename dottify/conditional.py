@@ -0,0 +1,113 @@
+"""
+ETags and conditional GETs for the API.
+
+A resource's ETag is derived from a revision stamp that costs one small
+query, never from the response body, so a client revalidating with
+If-None-Match gets a 304 without the object being loaded or serialized:
+
+- a single album, song or playlist: its updated_at, plus for albums and
+  playlists the count and (for albums) the newest updated_at of the
+  songs nested in the response;
+- a collection (list endpoints, /api/statistics/): the data versions of
+  the models it shows (see dottify/versions.py).
+
+The accepted media type is part of every ETag, as the same resource has
+a different body per media type (and per msgpack layout).
+"""
+import hashlib
+
+from django.db.models.signals import m2m_changed
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+
+from .models import Playlist
+from .versions import current
+
+
+def make_etag(request, *parts):
+    parts = (getattr(request, 'accepted_media_type', ''), *parts)
+    digest = hashlib.md5(repr(parts).encode(), usedforsecurity=False).hexdigest()
+    return quote_etag(digest)
+
+
+def versions_etag(request, *names):
+    versions = current(*names)
+    return make_etag(request, *(versions[name] for name in names))
+
+
+def not_modified(request, etag):
+    """
+    A 304 response if `request` already has `etag`, else None.
+    """
+    return get_conditional_response(request, etag=etag)
+
+
+class ConditionalReadMixin:
+    """
+    ETag / If-None-Match handling for ModelViewSet list and retrieve.
+
+    collection_versions names the data versions the list depends on;
+    revision_annotations adds aggregates over nested rows to the object's
+    updated_at when computing a detail ETag.
+    """
+    collection_versions = ()
+    revision_annotations = {}
+
+    def object_revision(self, pk):
+        try:
+            return (
+                self.get_queryset().prefetch_related(None).filter(pk=pk)
+                .annotate(**self.revision_annotations)
+                .values_list('updated_at', *self.revision_annotations)
+                .first()
+            )
+        except (TypeError, ValueError):
+            return None
+
+    def list(self, request, *args, **kwargs):
+        etag = versions_etag(request, *self.collection_versions)
+        response = not_modified(request, etag)
+        if response is None:
+            response = super().list(request, *args, **kwargs)
+        response.headers['ETag'] = etag
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        revision = self.object_revision(kwargs[self.lookup_field])
+        if revision is None:
+            return super().retrieve(request, *args, **kwargs)
+        etag = make_etag(request, self.basename, kwargs[self.lookup_field], *revision)
+        response = not_modified(request, etag)
+        if response is None:
+            response = super().retrieve(request, *args, **kwargs)
+        response.headers['ETag'] = etag
+        return response
+
+
+def _touch_playlists(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Playlist.songs is part of a playlist's representation but changing
+    it does not save the playlist, so bump updated_at here.
+    """
+    if action == 'pre_clear' and reverse:
+        instance._touch_playlists = list(instance.playlists.values_list('id', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        playlist_ids = [instance.pk]
+    elif action == 'post_clear':
+        playlist_ids = getattr(instance, '_touch_playlists', [])
+    else:
+        playlist_ids = list(pk_set or ())
+    if playlist_ids:
+        Playlist.objects.filter(pk__in=playlist_ids).update(updated_at=timezone.now())
+
+
+def connect_signals():
+    """
+    Called from DottifyConfig.ready().
+    """
+    m2m_changed.connect(_touch_playlists, sender=Playlist.songs.through,
+                        dispatch_uid='conditional_touch_playlists')
@@ -0,0 +1,134 @@
+"""
+Primary/replica routing for the dottify app.
+
+Reads are only sent to a replica inside an explicit replica_reads()
+scope: the catalogue list/detail views (@read_from_replica) and the DRF
+list/retrieve actions (ReplicaReadMixin). Everything else, and every
+write, uses the primary `default` database.
+
+Read-your-writes: as soon as a request writes, the rest of that request
+is pinned to the primary, and ReplicaPinningMiddleware sets a short-lived
+cookie so that the same client's next requests also read from the
+primary until the replicas have caught up.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+PIN_COOKIE = 'dottify_primary_pin'
+
+_replica_reads = ContextVar('dottify_replica_reads', default=False)
+_pinned = ContextVar('dottify_pinned_to_primary', default=False)
+# None outside a request: writes are only tracked while the middleware is
+# scoping a request, so shells and commands never pin themselves.
+_wrote = ContextVar('dottify_wrote', default=None)
+
+
+def read_replicas():
+    return list(getattr(settings, 'DOTTIFY_READ_REPLICAS', []))
+
+
+def pin_seconds():
+    return getattr(settings, 'DOTTIFY_REPLICA_PIN_SECONDS', 10)
+
+
+def is_pinned():
+    return bool(_pinned.get() or _wrote.get())
+
+
+@contextmanager
+def replica_reads():
+    """
+    Allow dottify reads in this block to be served by a replica.
+    """
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def read_from_replica(view):
+    """
+    Decorator for read-only HTML views whose queries may use a replica.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        with replica_reads():
+            return view(*args, **kwargs)
+    return wrapper
+
+
+class ReplicaReadMixin:
+    """
+    Serve DRF list/retrieve actions from a replica.
+    """
+    def list(self, request, *args, **kwargs):
+        with replica_reads():
+            return super().list(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        with replica_reads():
+            return super().retrieve(request, *args, **kwargs)
+
+
+class ReplicaRouter:
+    """
+    DATABASE_ROUTERS entry; routes to `default` unless a dottify read
+    happens inside replica_reads() on an unpinned request. Writes, and
+    dottify reads outside that scope, name `default` explicitly: left to
+    Django, saving an instance loaded from a replica (or following its
+    foreign keys later) would go back to that replica.
+    """
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label != 'dottify':
+            return None
+        if not _replica_reads.get() or is_pinned():
+            return DEFAULT_DB_ALIAS
+        replicas = read_replicas()
+        return random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        if _wrote.get() is not None:
+            _wrote.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas are copies of the primary made by sync_replica, whether
+        # or not DOTTIFY_READ_REPLICAS currently enables them.
+        if db != DEFAULT_DB_ALIAS:
+            return False
+        return None
+
+
+class ReplicaPinningMiddleware:
+    """
+    Scope the routing state to one request and carry read-your-writes
+    pinning across requests with a cookie.
+
+    Unsafe methods are pinned from the start, since they are about to
+    write and may read back what they wrote.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        pinned = request.method not in ('GET', 'HEAD', 'OPTIONS') or PIN_COOKIE in request.COOKIES
+        pinned_token = _pinned.set(pinned)
+        wrote_token = _wrote.set(False)
+        try:
+            response = self.get_response(request)
+            if _wrote.get():
+                response.set_cookie(PIN_COOKIE, '1', max_age=pin_seconds(), httponly=True, samesite='Lax')
+            return response
+        finally:
+            _pinned.reset(pinned_token)
+            _wrote.reset(wrote_token)
@@ -0,0 +1,171 @@
+"""
+Read-only fast path for API list/retrieve responses.
+
+DRF serializes a row by calling get_attribute() and to_representation()
+on every field of every model instance. For read-only JSON responses the
+same output can be built from .values_list() tuples: RowMapper compiles
+a ModelSerializer's fields once into column paths plus a converter for
+the few field types whose representation differs from the database
+value (decimals, dates, files), and fetches nested many=True serializers
+of reverse foreign keys with one extra query for the whole page.
+
+dumps() then renders with orjson when it is installed, else with the
+standard library, and reproduces JSONRenderer's compact UTF-8 output
+byte for byte, so clients cannot tell which path answered. Serializers
+with fields RowMapper does not understand are simply left to DRF.
+"""
+import json
+from collections import defaultdict
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+try:
+    import orjson
+except ImportError:  # optional; the json fallback gives identical bytes
+    orjson = None
+
+# Field types whose representation of a non-null value is the value.
+# FloatField is left out: orjson and json spell some floats differently.
+PLAIN_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.ChoiceField,
+    serializers.IntegerField,
+)
+
+# Field types whose to_representation() works on the raw column value.
+CONVERTED_FIELDS = (
+    serializers.DateField,
+    serializers.DateTimeField,
+    serializers.DecimalField,
+)
+
+
+def dumps(data):
+    """
+    `data` as JSONRenderer would render it with the default settings:
+    compact separators, unescaped UTF-8, and U+2028/U+2029 escaped.
+    """
+    content = None
+    if orjson is not None:
+        try:
+            content = orjson.dumps(data)
+        except orjson.JSONEncodeError:
+            # e.g. lone surrogates, which the json module passes through.
+            pass
+    if content is None:
+        content = json.dumps(data, ensure_ascii=False, allow_nan=False, separators=(',', ':')).encode()
+    return content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+def _file_url(field):
+    storage = field.parent.Meta.model._meta.get_field(field.source).storage
+
+    def convert(name, request):
+        url = storage.url(name)
+        return request.build_absolute_uri(url) if request is not None else url
+    return convert
+
+
+class RowMapper:
+    """
+    A compiled ModelSerializer; compile() returns None for serializers
+    that need DRF's general machinery.
+    """
+    _compiled = {}
+
+    def __init__(self, serializer_class):
+        serializer = serializer_class()
+        self.model = serializer.Meta.model
+        self.names = []
+        self.paths = []
+        self.converters = []      # (name, convert)
+        self.file_fields = []     # (name, convert(name, request))
+        self.nested = []          # (name, fk attname, RowMapper)
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if self.nested and not isinstance(field, serializers.ListSerializer):
+                raise TypeError("nested fields must come last")
+            self._add(name, field)
+        if self.nested and 'id' not in self.names:
+            raise TypeError("nested fields need the id")
+
+    @classmethod
+    def compile(cls, serializer_class):
+        if serializer_class not in cls._compiled:
+            try:
+                cls._compiled[serializer_class] = cls(serializer_class)
+            except (TypeError, FieldDoesNotExist):
+                cls._compiled[serializer_class] = None
+        return cls._compiled[serializer_class]
+
+    def _add(self, name, field):
+        source = field.source
+        if isinstance(field, serializers.ListSerializer):
+            relation = next(
+                (rel for rel in self.model._meta.related_objects
+                 if rel.get_accessor_name() == source and rel.one_to_many),
+                None,
+            )
+            if relation is None:
+                raise TypeError(f"{source!r} is not a reverse foreign key")
+            child = RowMapper(type(field.child))
+            if child.nested:
+                raise TypeError("nested fields are only followed one level")
+            self.nested.append((name, relation.field.attname, child))
+            return
+        if source == '*' or '.' in source:
+            raise TypeError(f"unsupported source {source!r}")
+        if isinstance(field, serializers.PrimaryKeyRelatedField):
+            path = self.model._meta.get_field(source).attname
+        elif isinstance(field, serializers.FileField):
+            self.file_fields.append((name, _file_url(field)))
+            path = source
+        elif isinstance(field, CONVERTED_FIELDS):
+            self.converters.append((name, field.to_representation))
+            path = source
+        elif isinstance(field, PLAIN_FIELDS) and not isinstance(field, serializers.MultipleChoiceField):
+            path = source
+        else:
+            raise TypeError(f"unsupported field {type(field).__name__}")
+        self.model._meta.get_field(path)
+        self.names.append(name)
+        self.paths.append(path)
+
+    def _rows(self, queryset, request, extra=()):
+        names = self.names
+        converters = self.converters
+        file_fields = self.file_fields
+        rows = []
+        for values in queryset.values_list(*self.paths, *extra):
+            item = dict(zip(names, values))
+            for name, convert in converters:
+                value = item[name]
+                if value is not None:
+                    item[name] = convert(value)
+            for name, convert in file_fields:
+                value = item[name]
+                item[name] = convert(value, request) if value else None
+            rows.append((item, values[len(names):]))
+        return rows
+
+    def represent(self, queryset, request=None):
+        """
+        The serializer's output for every row of `queryset`, as a list.
+        """
+        queryset = queryset.prefetch_related(None)
+        items = [item for item, _ in self._rows(queryset, request)]
+        if self.nested and items:
+            # A subquery rather than a list of ids, which for a long page
+            # would exceed SQLite's bound-parameter limit.
+            parents = queryset.values('pk')
+            for name, fk, child in self.nested:
+                children = defaultdict(list)
+                related = child.model._default_manager.filter(**{f'{fk}__in': parents}).order_by(fk, 'pk')
+                for child_item, (parent_id,) in child._rows(related, request, extra=(fk,)):
+                    children[parent_id].append(child_item)
+                for item in items:
+                    item[name] = children.get(item['id'], [])
+        return items
@@ -0,0 +1,127 @@
+"""
+Data layer for the role-aware homepage.
+
+home_viewer() resolves everything the page depends on about the visitor
+(role, profile id and artist id) together with the data versions of
+the models shown, in a single query. The sections themselves are bounded
+"latest N" lists, rendered once per role variant and cached under a key
+made of the role, the profile (for personal variants) and those data
+versions, so a warm homepage costs that one query whatever the size of
+the catalogue. Any save to an album, song, playlist, profile or artist bumps a
+version and so moves every variant to a fresh key.
+"""
+from collections import namedtuple
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef, Subquery
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .models import Album, Artist, DottifyUser, Playlist, Song
+from .rows import AlbumRow, PlaylistRow, SongRow, project
+from .versions import current, version_subquery
+
+# Items per homepage section; the full lists are one click away.
+HOME_SECTION_SIZE = 10
+
+# Keys change with the data versions, so this only bounds how long
+# superseded variants linger.
+HOME_SHELL_TIMEOUT = 60 * 60
+
+# Models whose changes can alter the homepage sections.
+HOME_VERSIONS = ('album', 'song', 'playlist', 'dottifyuser', 'artist')
+
+ANONYMOUS = 'anonymous'
+LISTENER = 'listener'
+ARTIST = 'artist'
+ADMIN = 'admin'
+
+Viewer = namedtuple('Viewer', 'role duser_id artist_id versions')
+
+
+def home_viewer(user):
+    """
+    Resolve the visitor's homepage role in one query.
+
+    Admins are superusers or members of DottifyAdmin; artists are members
+    of Artist; everyone else logged in is a listener.
+    """
+    if not user.is_authenticated:
+        return Viewer(ANONYMOUS, None, None, current(*HOME_VERSIONS))
+
+    memberships = User.groups.through.objects.filter(user_id=OuterRef('pk'))
+    profile = DottifyUser.objects.filter(user_id=OuterRef('pk'))
+    artist = Artist.objects.filter(user__user_id=OuterRef('pk'))
+    row = (
+        User.objects.filter(pk=user.pk)
+        .annotate(
+            is_dottify_admin=Exists(memberships.filter(group__name='DottifyAdmin')),
+            is_artist=Exists(memberships.filter(group__name='Artist')),
+            duser_id=Subquery(profile.values('id')[:1]),
+            artist_id=Subquery(artist.values('id')[:1]),
+            **{f'v_{name}': version_subquery(name) for name in HOME_VERSIONS},
+        )
+        .values('is_dottify_admin', 'is_artist', 'duser_id', 'artist_id',
+                *(f'v_{name}' for name in HOME_VERSIONS))
+        .get()
+    )
+    if user.is_superuser or row['is_dottify_admin']:
+        role = ADMIN
+    elif row['is_artist']:
+        role = ARTIST
+    else:
+        role = LISTENER
+    versions = {name: row[f'v_{name}'] or 0 for name in HOME_VERSIONS}
+    return Viewer(role, row['duser_id'], row['artist_id'], versions)
+
+
+def home_sections(viewer, size=HOME_SECTION_SIZE):
+    """
+    Template context for the sections `viewer` sees, each the latest
+    `size` rows as records (dottify/rows.py) with playlist owners joined
+    in.
+    """
+    latest_albums = Album.objects.order_by('-id')
+    latest_playlists = Playlist.objects.order_by('-created_at', '-id')
+
+    if viewer.role == ANONYMOUS:
+        return {
+            'albums': project(latest_albums[:size], AlbumRow),
+            'playlists': project(latest_playlists.filter(visibility=2)[:size], PlaylistRow),
+        }
+    if viewer.role == ADMIN:
+        return {
+            'albums': project(latest_albums[:size], AlbumRow),
+            'playlists': project(latest_playlists[:size], PlaylistRow),
+            'songs': project(Song.objects.order_by('-id')[:size], SongRow),
+        }
+    if viewer.role == ARTIST:
+        if viewer.artist_id is None:
+            return {'albums': []}
+        return {'albums': project(latest_albums.filter(artist_id=viewer.artist_id)[:size], AlbumRow)}
+    if viewer.duser_id is None:
+        return {'playlists': []}
+    return {'playlists': project(latest_playlists.filter(owner_id=viewer.duser_id)[:size], PlaylistRow)}
+
+
+def home_shell_key(viewer):
+    # Artist and listener sections are personal; the others are shared.
+    scope = viewer.duser_id if viewer.role in (ARTIST, LISTENER) else ''
+    versions = ':'.join(str(viewer.versions[name]) for name in HOME_VERSIONS)
+    return f"home:{viewer.role}:{scope}:{versions}"
+
+
+def home_shell(viewer):
+    """
+    The rendered sections for `viewer`, from the cache when possible.
+
+    Rendered without the request, so nothing about the individual visitor
+    beyond the role variant can end up in a shared entry.
+    """
+    key = home_shell_key(viewer)
+    html = cache.get(key)
+    if html is None:
+        html = render_to_string('dottify/home_sections.html', home_sections(viewer))
+        cache.set(key, html, HOME_SHELL_TIMEOUT)
+    return mark_safe(html)
@@ -0,0 +1,149 @@
+"""
+A small database-backed job queue.
+
+Views call `some_job.delay(...)`, which only inserts a Job row, and the
+run_jobs management command claims due jobs and runs them in a thread or
+process pool. Failed jobs are retried with exponential backoff until
+`max_attempts`, then left as FAILED with the traceback in last_error.
+
+Claiming flips QUEUED rows to RUNNING inside one transaction, so two
+workers never run the same job: on SQLite the transaction takes the
+write lock up front (BEGIN IMMEDIATE), elsewhere select_for_update()
+with skip_locked does the same job. Jobs left RUNNING by a worker that
+died are re-queued by requeue_stale().
+
+Jobs are registered with the @job decorator; the job functions
+themselves live in dottify/tasks.py.
+"""
+import traceback
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+JOBS = {}
+
+MAX_ATTEMPTS = 3
+RETRY_BASE_DELAY = 30    # seconds; doubled after every failed attempt
+CLAIM_BATCH_SIZE = 20
+STALE_AFTER = timedelta(minutes=10)
+
+
+def job(func=None, *, name=None, max_attempts=MAX_ATTEMPTS):
+    """
+    Register `func` as a background job and give it a .delay() method
+    that enqueues it.
+    """
+    def decorator(func):
+        job_name = name or func.__name__
+        JOBS[job_name] = func
+        func.job_name = job_name
+        func.delay = lambda *args, **kwargs: enqueue(
+            job_name, *args, max_attempts=max_attempts, **kwargs
+        )
+        return func
+
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+def enqueue(name, *args, max_attempts=MAX_ATTEMPTS, run_after=None, **kwargs):
+    if name not in JOBS:
+        raise KeyError(f"Unknown job {name!r}")
+    return Job.objects.create(
+        name=name,
+        args=list(args),
+        kwargs=kwargs,
+        max_attempts=max_attempts,
+        run_after=run_after or timezone.now(),
+    )
+
+
+def claim(limit=CLAIM_BATCH_SIZE):
+    """
+    Mark up to `limit` due jobs as RUNNING and return their ids.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status=Job.QUEUED, run_after__lte=now)
+            .order_by('run_after', 'id')
+            .values_list('id', flat=True)[:limit]
+        )
+        if ids:
+            Job.objects.filter(id__in=ids, status=Job.QUEUED).update(
+                status=Job.RUNNING, attempts=F('attempts') + 1, updated_at=now
+            )
+    return ids
+
+
+def retry_delay(attempts):
+    return timedelta(seconds=RETRY_BASE_DELAY * 2 ** (attempts - 1))
+
+
+def execute(job_id):
+    """
+    Run one claimed job and record the outcome. Returns the final status.
+    """
+    current = Job.objects.get(pk=job_id)
+    try:
+        JOBS[current.name](*current.args, **current.kwargs)
+    except Exception:
+        if current.attempts < current.max_attempts:
+            current.status = Job.QUEUED
+            current.run_after = timezone.now() + retry_delay(current.attempts)
+        else:
+            current.status = Job.FAILED
+        current.last_error = traceback.format_exc()
+    else:
+        current.status = Job.DONE
+        current.last_error = ''
+    current.save(update_fields=['status', 'run_after', 'last_error', 'updated_at'])
+    return current.status
+
+
+def run_job(job_id):
+    """
+    execute() for pool threads and processes, each of which opens its own
+    database connection; it is closed again before returning.
+    """
+    try:
+        return execute(job_id)
+    finally:
+        connection.close()
+
+
+def requeue_stale(older_than=STALE_AFTER):
+    """
+    Put RUNNING jobs that have not finished within `older_than` back in
+    the queue; their worker is assumed to have died.
+    """
+    cutoff = timezone.now() - older_than
+    return Job.objects.filter(status=Job.RUNNING, updated_at__lt=cutoff).update(
+        status=Job.QUEUED, updated_at=timezone.now()
+    )
+
+
+def run_pending(executor=None, limit=CLAIM_BATCH_SIZE):
+    """
+    Claim and run due jobs until none are left. With an executor the
+    jobs of each claimed batch run concurrently, otherwise inline.
+    Returns {status: count}.
+    """
+    results = {}
+    while True:
+        ids = claim(limit)
+        if not ids:
+            return results
+        if executor is None:
+            statuses = [execute(job_id) for job_id in ids]
+        else:
+            statuses = list(executor.map(run_job, ids))
+        for status in statuses:
+            results[status] = results.get(status, 0) + 1
+
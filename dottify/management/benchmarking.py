@@ -0,0 +1,93 @@
+"""
+Shared helpers for the benchmark_* management commands.
+
+Benchmarks build a synthetic catalogue inside a transaction that is
+always rolled back, so they can be pointed at a development database
+without leaving rows behind.
+"""
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+from types import SimpleNamespace
+
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from dottify.models import Album, DottifyUser, Playlist, Song
+
+
+def best_of(fn, repeat=3):
+    """
+    Run fn() `repeat` times and return (best_seconds, last_result).
+    """
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, result
+
+
+@contextmanager
+def synthetic_catalogue(albums=1000, songs_per_album=10, playlists=0, songs_per_playlist=0):
+    """
+    Create a throwaway catalogue and yield a namespace of the new ids.
+
+    Everything is written inside transaction.atomic() and rolled back on
+    exit, whether or not the benchmark succeeded.
+    """
+    formats = [code for code, _ in Album.FORMAT_CHOICES]
+    with transaction.atomic():
+        try:
+            album_objs = Album.objects.bulk_create(
+                [
+                    Album(
+                        title=f"Bench Album {i}",
+                        artist_name=f"Bench Artist {i % 500}",
+                        format=formats[i % len(formats)],
+                        release_date=f"{1960 + i % 60}-01-01",
+                        retail_price=Decimal(i % 2000) / 100,
+                    )
+                    for i in range(albums)
+                ],
+                batch_size=1000,
+            )
+            song_objs = Song.objects.bulk_create(
+                [
+                    Song(title=f"Bench Song {a.id}-{n}", album=a, length=60 + (a.id * 7 + n) % 400)
+                    for a in album_objs
+                    for n in range(songs_per_album)
+                ],
+                batch_size=1000,
+            )
+            playlist_ids = []
+            if playlists:
+                user = User.objects.create_user('bench-user')
+                owner = DottifyUser.objects.create(user=user, display_name='Bench User')
+                playlist_objs = Playlist.objects.bulk_create(
+                    [Playlist(name=f"Bench Playlist {i}", owner=owner) for i in range(playlists)],
+                    batch_size=1000,
+                )
+                playlist_ids = [p.id for p in playlist_objs]
+                Through = Playlist.songs.through
+                song_ids = [s.id for s in song_objs]
+                if song_ids and songs_per_playlist:
+                    rows = []
+                    for i, pid in enumerate(playlist_ids):
+                        start = (i * 37) % len(song_ids)
+                        for k in range(songs_per_playlist):
+                            rows.append(Through(
+                                playlist_id=pid,
+                                song_id=song_ids[(start + k * 13) % len(song_ids)],
+                            ))
+                    Through.objects.bulk_create(rows, batch_size=5000, ignore_conflicts=True)
+            yield SimpleNamespace(
+                album_ids=[a.id for a in album_objs],
+                song_ids=[s.id for s in song_objs],
+                playlist_ids=playlist_ids,
+            )
+        finally:
+            transaction.set_rollback(True)
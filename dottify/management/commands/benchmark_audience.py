@@ -0,0 +1,78 @@
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand
+from django.db.models import Sum
+from django.db.models.functions import Length
+from django.test import override_settings
+
+from dottify import audience, plays
+from dottify.management.benchmarking import best_of, synthetic_catalogue
+from dottify.models import AudienceSketch
+
+
+class Command(BaseCommand):
+    help = (
+        "Play synthetic events from a large user base into a throwaway "
+        "catalogue (rolled back afterwards), roll them up, and compare "
+        "reading an album's unique listeners from its sketches with "
+        "counting distinct users over the raw play events, plus the "
+        "sketches' error and storage."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--albums', type=int, default=200,
+                            help='Albums in the synthetic catalogue (default: 200).')
+        parser.add_argument('--events', type=int, default=1_000_000,
+                            help='Play events, spread over --days days (default: 1000000).')
+        parser.add_argument('--users', type=int, default=300_000,
+                            help='Distinct users playing (default: 300000).')
+        parser.add_argument('--days', type=int, default=5,
+                            help='Days the events are spread over (default: 5).')
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        with synthetic_catalogue(albums=options['albums']) as catalogue, \
+                tempfile.TemporaryDirectory() as directory, \
+                override_settings(DOTTIFY_PLAYS_DIR=directory):
+            songs = catalogue.song_ids
+            weights = [1 / (rank + 1) for rank in range(len(songs))]
+            today = datetime.now(dt_timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+            by_day = {}
+            for day in range(options['days']):
+                start = (today - timedelta(days=day) - plays.EPOCH) // timedelta(microseconds=1)
+                data = by_day.setdefault(start // plays.DAY_MICROS, bytearray())
+                for song in rng.choices(songs, weights, k=options['events'] // options['days']):
+                    data.extend(plays.RECORD.pack(rng.randint(1, options['users']), song, start, 1000))
+            writer = plays.PlayWriter(flush_interval=0)
+            writer.append(by_day)
+            writer.flush()
+
+            started = time.perf_counter()
+            for day in plays.pending_days():
+                plays.roll_up(day)
+            self.stdout.write(f"roll-up with sketches: {time.perf_counter() - started:.2f} s")
+
+            album = catalogue.album_ids[0]
+            album_songs = set(songs[:len(songs) // len(catalogue.album_ids)])
+
+            def exact():
+                users = set()
+                for day in plays.days():
+                    users.update(user for user, song, _, _ in plays.read_events(day) if song in album_songs)
+                return len(users)
+
+            sketch_time, counts = best_of(lambda: audience.album_audience(album), repeat=20)
+            exact_time, true = best_of(exact, repeat=1)
+            self.stdout.write(f"album listeners from sketches {sketch_time * 1000:10.2f} ms")
+            self.stdout.write(f"distinct users over events    {exact_time * 1000:10.2f} ms")
+            self.stdout.write(
+                f"estimate {counts['listeners']:,} vs exact {true:,} "
+                f"({(counts['listeners'] - true) / true:+.2%}, standard error {audience.RELATIVE_ERROR:.2%})"
+            )
+            sketches = AudienceSketch.objects.aggregate(bytes=Sum(Length('registers')))['bytes']
+            self.stdout.write(
+                f"{AudienceSketch.objects.count():,} sketches, {sketches / 1024 / 1024:.1f} MiB"
+            )
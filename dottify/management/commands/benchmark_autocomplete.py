@@ -0,0 +1,52 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from dottify.autocomplete import AutocompleteService
+from dottify.management.benchmarking import synthetic_catalogue
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the autocomplete index over a throwaway catalogue (rolled "
+        "back afterwards) and report build time, size and p50/p99/max "
+        "suggestion latency for prefixes of catalogue names."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--albums', type=int, default=20000,
+                            help='Albums in the synthetic catalogue (default: 20000).')
+        parser.add_argument('--songs-per-album', type=int, default=10,
+                            help='Songs per album (default: 10).')
+        parser.add_argument('--queries', type=int, default=20000,
+                            help='Suggestion lookups to time (default: 20000).')
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        with synthetic_catalogue(albums=options['albums'], songs_per_album=options['songs_per_album'],
+                                 playlists=options['albums'] // 10, songs_per_playlist=20):
+            service = AutocompleteService()
+            start = time.perf_counter()
+            service.rebuild()
+            built = time.perf_counter() - start
+            index = service.index
+            self.stdout.write(f"index: {len(index):,} items, {len(index.entries):,} keys, "
+                              f"built in {built:.2f} s")
+
+            labels = [s.label for s in index.items.values()]
+            queries = []
+            for _ in range(options['queries']):
+                words = rng.choice(labels).split()
+                word = ' '.join(words[rng.randrange(len(words)):])
+                queries.append(word[:rng.randint(1, len(word))])
+
+            timings = []
+            for query in queries:
+                start = time.perf_counter()
+                service.search(query)
+                timings.append(time.perf_counter() - start)
+            timings.sort()
+            pick = lambda q: timings[min(len(timings) - 1, int(q * len(timings)))] * 1e6
+            self.stdout.write(f"suggest: p50 {pick(0.5):.0f} us  p99 {pick(0.99):.0f} us  "
+                              f"max {timings[-1] * 1e6:.0f} us over {len(timings):,} queries")
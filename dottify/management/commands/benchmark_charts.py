@@ -0,0 +1,80 @@
+import random
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand
+from django.db.models import Sum
+from django.test import override_settings
+
+from dottify import charts, plays
+from dottify.management.benchmarking import best_of, synthetic_catalogue
+from dottify.models import SongDailyPlays
+
+
+class Command(BaseCommand):
+    help = (
+        "Play Zipf-distributed synthetic events into a throwaway catalogue "
+        "(rolled back afterwards), build the charts from them, and compare "
+        "answering a chart from the checkpoint with ranking the rolled-up "
+        "daily plays in SQL, plus the sketch's recall of the exact top songs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--albums', type=int, default=10000,
+                            help='Albums in the synthetic catalogue (default: 10000).')
+        parser.add_argument('--events', type=int, default=1_000_000,
+                            help='Play events (default: 1000000).')
+        parser.add_argument('--skew', type=float, default=1.1,
+                            help='Zipf exponent of song popularity (default: 1.1).')
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        with synthetic_catalogue(albums=options['albums']) as catalogue, \
+                tempfile.TemporaryDirectory() as directory, \
+                override_settings(DOTTIFY_PLAYS_DIR=directory):
+            songs = catalogue.song_ids[:]
+            rng.shuffle(songs)
+            weights = [1 / (rank + 1) ** options['skew'] for rank in range(len(songs))]
+            now = datetime.now(dt_timezone.utc)
+            start_seconds = (now - plays.EPOCH).total_seconds() - 3 * 24 * 3600
+            picked = rng.choices(songs, weights, k=options['events'])
+            writer = plays.PlayWriter(flush_interval=0)
+            events = sorted(
+                (round((start_seconds + rng.uniform(0, 3 * 24 * 3600)) * 1_000_000), song) for song in picked
+            )
+            by_day = {}
+            for micros, song in events:
+                by_day.setdefault(micros // plays.DAY_MICROS, bytearray()).extend(
+                    plays.RECORD.pack(1, song, micros, 1000)
+                )
+            writer.append(by_day)
+            writer.flush()
+
+            builder = charts.ChartBuilder()
+            start = time.perf_counter()
+            played, _ = charts.update(builder, now=now)
+            elapsed = time.perf_counter() - start
+            self.stdout.write(f"update: {played:,} plays in {elapsed:.2f} s ({played / elapsed:,.0f}/s)")
+
+            for day in plays.pending_days():
+                plays.roll_up(day)
+            sketch_time, _ = best_of(lambda: charts.chart('songs', limit=charts.CHART_LIMIT), repeat=20)
+            sql_time, exact = best_of(lambda: list(
+                SongDailyPlays.objects.values('song').annotate(total=Sum('plays'))
+                .order_by('-total', 'song').values_list('song', flat=True)[:charts.CHART_LIMIT]
+            ))
+            self.stdout.write(f"chart from checkpoint {sketch_time * 1000:8.2f} ms")
+            self.stdout.write(f"GROUP BY daily plays  {sql_time * 1000:8.2f} ms")
+
+            decayed = Counter()
+            for micros, song in events:
+                decayed[song] += 2.0 ** ((micros - builder.landmark) / charts.HALF_LIFE_MICROS)
+            true_top = {song for song, _ in decayed.most_common(charts.CHART_LIMIT)}
+            sketch_top = {item for item, _, _ in builder.sketches['songs:'].top(charts.CHART_LIMIT)}
+            self.stdout.write(
+                f"recall of the exact decayed top {charts.CHART_LIMIT}: "
+                f"{len(true_top & sketch_top)}/{charts.CHART_LIMIT} "
+                f"(undecayed SQL top overlap {len(set(exact) & sketch_top)})"
+            )
@@ -0,0 +1,49 @@
+import gzip
+
+from django.core.management.base import BaseCommand
+from rest_framework.test import APIClient
+
+from dottify.management.benchmarking import best_of, synthetic_catalogue
+from dottify.renderers import MSGPACK
+
+FORMATS = [
+    ('json', 'application/json'),
+    ('msgpack', MSGPACK),
+    ('msgpack columns', f'{MSGPACK}; layout=columns'),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare response size (raw and gzipped) and latency of the JSON "
+        "and MessagePack representations of the album, song and playlist "
+        "lists. Uses a throwaway catalogue that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--albums', type=int, default=2000,
+                            help='Albums in the synthetic catalogue (default: 2000).')
+        parser.add_argument('--songs-per-album', type=int, default=10,
+                            help='Songs per album (default: 10).')
+        parser.add_argument('--playlists', type=int, default=1000,
+                            help='Playlists in the synthetic catalogue (default: 1000).')
+        parser.add_argument('--repeat', type=int, default=3,
+                            help='Timing runs per measurement (best is reported).')
+
+    def handle(self, *args, **options):
+        client = APIClient()
+        with synthetic_catalogue(albums=options['albums'], songs_per_album=options['songs_per_album'],
+                                 playlists=options['playlists'], songs_per_playlist=20):
+            for path in ('/api/albums/', '/api/songs/', '/api/playlists/'):
+                self.stdout.write(path)
+                baseline = None
+                for label, accept in FORMATS:
+                    seconds, response = best_of(lambda: client.get(path, HTTP_ACCEPT=accept), options['repeat'])
+                    size = len(response.content)
+                    gzipped = len(gzip.compress(response.content))
+                    baseline = baseline or (size, gzipped)
+                    self.stdout.write(
+                        f"  {label:<16} {size:>11,} B ({size / baseline[0]:5.0%})  "
+                        f"gzip {gzipped:>10,} B ({gzipped / baseline[1]:5.0%})  "
+                        f"{seconds * 1000:8.1f} ms"
+                    )
@@ -0,0 +1,67 @@
+import json
+import random
+import tempfile
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+
+from dottify import plays
+from dottify.management.benchmarking import synthetic_catalogue
+from dottify.packing import packb
+from dottify.renderers import MSGPACK
+
+
+class Command(BaseCommand):
+    help = (
+        "Ingest synthetic play events into a temporary segment directory "
+        "and report events per second, both straight into the writer and "
+        "through POST /api/plays/ as JSON and MessagePack, then time the "
+        "daily roll-up over a throwaway catalogue (rolled back afterwards)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=500_000,
+                            help='Events per run (default: 500000).')
+        parser.add_argument('--batch', type=int, default=1000,
+                            help='Events per request (default: 1000).')
+        parser.add_argument('--albums', type=int, default=10000,
+                            help='Albums in the synthetic catalogue (default: 10000).')
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        size = options['batch']
+        with synthetic_catalogue(albums=options['albums']) as catalogue, \
+                tempfile.TemporaryDirectory() as directory, \
+                override_settings(DOTTIFY_PLAYS_DIR=directory):
+            now = datetime.now(dt_timezone.utc).timestamp()
+            events = [
+                {'user': rng.randint(1, 100_000), 'song': rng.choice(catalogue.song_ids),
+                 'timestamp': round(now - rng.uniform(0, 3600), 3), 'duration': rng.randint(5, 400)}
+                for _ in range(options['events'])
+            ]
+            batches = [events[i:i + size] for i in range(0, len(events), size)]
+            client = Client()
+            for label, run in [
+                ('writer', lambda batch: plays.writer.append(plays.parse_events(batch)[1])),
+                ('api json', lambda body: client.post('/api/plays/', body, content_type='application/json')),
+                ('api msgpack', lambda body: client.post('/api/plays/', body, content_type=MSGPACK)),
+            ]:
+                if label == 'api json':
+                    bodies = [json.dumps({'events': batch}) for batch in batches]
+                elif label == 'api msgpack':
+                    bodies = [packb({'events': batch}) for batch in batches]
+                else:
+                    bodies = batches
+                start = time.perf_counter()
+                for body in bodies:
+                    run(body)
+                plays.writer.flush()
+                elapsed = time.perf_counter() - start
+                self.stdout.write(f"{label:<12} {len(events) / elapsed:>10,.0f} events/s")
+
+            for day in plays.pending_days():
+                start = time.perf_counter()
+                read = plays.roll_up(day)
+                self.stdout.write(f"roll-up {day}: {read:,} events in {time.perf_counter() - start:.2f} s")
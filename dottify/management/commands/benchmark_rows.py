@@ -0,0 +1,70 @@
+import gc
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+
+from dottify.management.benchmarking import best_of, synthetic_catalogue
+from dottify.models import Album, Playlist, Song
+from dottify.rows import AlbumRow, PlaylistRow, SongRow, project
+
+
+def _allocations(fn):
+    """
+    (peak, retained) bytes allocated by fn(), the latter while its result
+    is still referenced.
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = fn()
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return peak, retained
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare loading the album, song and playlist list pages' rows as "
+        "model instances and as row records (dottify/rows.py) over a "
+        "throwaway catalogue (rolled back afterwards): fetch time, rows per "
+        "second, peak and retained allocations, and song list render time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100_000,
+                            help='Albums, songs and playlists each (default: 100000).')
+        parser.add_argument('--repeat', type=int, default=3,
+                            help='Timing runs per measurement (best is reported).')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        repeat = options['repeat']
+        self.stdout.write(f"Building {rows:,} albums, songs and playlists...")
+        with synthetic_catalogue(albums=rows, songs_per_album=1, playlists=rows):
+            for name, models, records in [
+                ('albums', lambda: list(Album.objects.all()),
+                 lambda: project(Album.objects.all(), AlbumRow)),
+                ('songs', lambda: list(Song.objects.all()),
+                 lambda: project(Song.objects.all(), SongRow)),
+                ('playlists', lambda: list(Playlist.objects.select_related('owner')),
+                 lambda: project(Playlist.objects.all(), PlaylistRow)),
+            ]:
+                for label, fn in (('models', models), ('records', records)):
+                    elapsed, result = best_of(fn, repeat)
+                    peak, retained = _allocations(fn)
+                    self.stdout.write(
+                        f"{name:<10} {label:<8} {elapsed * 1000:8.1f} ms "
+                        f"({len(result) / elapsed:>10,.0f} rows/s)   "
+                        f"peak {peak / 2 ** 20:7.1f} MiB   retained {retained / 2 ** 20:7.1f} MiB"
+                    )
+
+            for label, fn in (('models', lambda: list(Song.objects.all())),
+                              ('records', lambda: project(Song.objects.all(), SongRow))):
+                elapsed, _ = best_of(
+                    lambda: render_to_string('dottify/song_list.html', {'songs': (songs := fn()), 'count': len(songs)}),
+                    repeat,
+                )
+                self.stdout.write(f"song_list render with {label:<8} {elapsed * 1000:8.1f} ms")
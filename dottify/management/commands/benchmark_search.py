@@ -0,0 +1,79 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from dottify import search
+from dottify.management.benchmarking import synthetic_catalogue
+from dottify.models import Album, Song
+
+
+def misspell(text, rng):
+    i = rng.randrange(len(text))
+    return text[:i] + rng.choice('aeiourst') + text[i + 1:]
+
+
+def vocabulary(rng, size):
+    syllables = [c + v for c in 'bcdfghklmnprstvwz' for v in 'aeiou'] + ['ster', 'ing', 'ow', 'ell']
+    return sorted({''.join(rng.choice(syllables) for _ in range(rng.randint(1, 4))) for _ in range(size)})
+
+
+class Command(BaseCommand):
+    help = (
+        "Index a throwaway catalogue (rolled back afterwards) for fuzzy "
+        "search and report latency for misspelt album titles and artists, "
+        "compared with the title__icontains lookup it replaced. Titles are "
+        "drawn from a random vocabulary unless --uniform-titles keeps the "
+        "near-identical 'Bench Album N' names, a worst case for trigrams."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--albums', type=int, default=20000,
+                            help='Albums in the synthetic catalogue (default: 20000).')
+        parser.add_argument('--songs-per-album', type=int, default=10,
+                            help='Songs per album (default: 10).')
+        parser.add_argument('--queries', type=int, default=200,
+                            help='Searches to time (default: 200).')
+        parser.add_argument('--uniform-titles', action='store_true',
+                            help="Keep the synthetic catalogue's 'Bench Album N' names.")
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        with synthetic_catalogue(albums=options['albums'], songs_per_album=options['songs_per_album']):
+            if not options['uniform_titles']:
+                words = vocabulary(rng, 20000)
+                phrase = lambda: ' '.join(rng.choice(words) for _ in range(rng.randint(1, 4))).title()
+                artists = [phrase() for _ in range(max(1, options['albums'] // 4))]
+                with connection.cursor() as cursor:
+                    cursor.executemany(
+                        f"UPDATE {Album._meta.db_table} SET title = %s, artist_name = %s WHERE id = %s",
+                        [(phrase(), rng.choice(artists), pk) for pk in Album.objects.values_list('id', flat=True)],
+                    )
+                    cursor.executemany(
+                        f"UPDATE {Song._meta.db_table} SET title = %s WHERE id = %s",
+                        [(phrase(), pk) for pk in Song.objects.values_list('id', flat=True)],
+                    )
+
+            start = time.perf_counter()
+            written = search.rebuild()
+            self.stdout.write(f"index: {written:,} postings in {time.perf_counter() - start:.1f} s")
+
+            names = list(Album.objects.values_list('title', 'artist_name'))
+            queries = [misspell(rng.choice(rng.choice(names)), rng) for _ in range(options['queries'])]
+            for label, run in [
+                ('fuzzy', lambda q: search.search(q)),
+                ('icontains', lambda q: list(Album.objects.filter(title__icontains=q)[:search.SEARCH_LIMIT])),
+            ]:
+                timings = []
+                found = 0
+                for query in queries:
+                    start = time.perf_counter()
+                    found += bool(run(query))
+                    timings.append(time.perf_counter() - start)
+                timings.sort()
+                self.stdout.write(
+                    f"{label:<10} p50 {timings[len(timings) // 2] * 1000:6.2f} ms  "
+                    f"p99 {timings[int(len(timings) * 0.99)] * 1000:6.2f} ms  "
+                    f"found {found}/{len(queries)}"
+                )
@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Prefetch
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from dottify.fastserializers import RowMapper, dumps, orjson
+from dottify.management.benchmarking import best_of, synthetic_catalogue
+from dottify.models import Album, Song
+from dottify.serializers import AlbumSerializer, SongSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare rows per second of the DRF serializers and the RowMapper "
+        "fast path for the album and song list responses, and check that "
+        "both produce the same bytes. Uses a throwaway catalogue that is "
+        "rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--albums', type=int, default=5000,
+                            help='Albums in the synthetic catalogue (default: 5000).')
+        parser.add_argument('--songs-per-album', type=int, default=10,
+                            help='Songs per album (default: 10).')
+        parser.add_argument('--repeat', type=int, default=3,
+                            help='Timing runs per measurement (best is reported).')
+
+    def handle(self, *args, **options):
+        request = Request(APIRequestFactory().get('/api/albums/'))
+        renderer = JSONRenderer()
+        self.stdout.write(f"JSON encoder: {'orjson' if orjson else 'json (orjson not installed)'}")
+
+        with synthetic_catalogue(albums=options['albums'], songs_per_album=options['songs_per_album']):
+            albums = Album.objects.prefetch_related(
+                Prefetch('song_set', queryset=Song.objects.order_by('id'))
+            ).order_by('id')
+            songs = Song.objects.order_by('id')
+            for label, queryset, serializer_class in [
+                ('albums', albums, AlbumSerializer),
+                ('songs', songs, SongSerializer),
+            ]:
+                rows = queryset.count()
+
+                def drf():
+                    data = serializer_class(queryset.all(), many=True, context={'request': request}).data
+                    return renderer.render(data)
+
+                def fast():
+                    return dumps(RowMapper.compile(serializer_class).represent(queryset.all(), request))
+
+                drf_time, drf_bytes = best_of(drf, options['repeat'])
+                fast_time, fast_bytes = best_of(fast, options['repeat'])
+                if drf_bytes != fast_bytes:
+                    raise CommandError(f"{label}: fast path output differs from the serializer's.")
+                self.stdout.write(
+                    f"{label:<7} {rows:>8} rows  "
+                    f"DRF {drf_time:7.3f}s ({rows / drf_time:>10,.0f} rows/s)  "
+                    f"fast {fast_time:7.3f}s ({rows / fast_time:>10,.0f} rows/s)  "
+                    f"x{drf_time / fast_time:.1f}, {len(fast_bytes):,} identical bytes"
+                )
@@ -0,0 +1,99 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from dottify import smart_playlists
+from dottify.management.benchmarking import synthetic_catalogue
+from dottify.models import Album, Playlist, Rating, Song
+
+RULES = [
+    {"album_format": "LIVE", "year_max": 1979, "length_max": 299},
+    {"album_format": ["DLUX", "RMST"], "length_min": 300},
+    {"year_min": 1990, "price_max": "5.00"},
+    {"length_max": 120},
+    {"rated_within_days": 7, "min_rating": 4},
+    {"album_format": "COMP", "rated_within_days": 30, "min_rating": 3},
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Build throwaway catalogues of increasing size (rolled back "
+        "afterwards) with a set of smart playlists, and compare the time to "
+        "evaluate their rules from scratch with the time to maintain them "
+        "after single song, album and rating changes and a batch of song "
+        "edits. Maintenance should stay flat as the catalogue grows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000,50000',
+                            help='Comma-separated album counts (default: 1000,10000,50000).')
+        parser.add_argument('--songs-per-album', type=int, default=10,
+                            help='Songs per album (default: 10).')
+        parser.add_argument('--copies', type=int, default=5,
+                            help='Smart playlists per rule set (default: 5).')
+        parser.add_argument('--changes', type=int, default=50,
+                            help='Changes timed per kind (default: 50).')
+        parser.add_argument('--batch', type=int, default=100,
+                            help='Songs in the batch edit (default: 100).')
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        self.stdout.write(
+            f"{'albums':>8} {'songs':>9} {'evaluate':>10} {'song':>9} {'album':>9} "
+            f"{'rating':>9} {'batch':>9}"
+        )
+        for albums in sizes:
+            rng = random.Random(0)
+            with synthetic_catalogue(albums=albums, songs_per_album=options['songs_per_album'],
+                                     playlists=1) as catalogue:
+                owner = Playlist.objects.get(id=catalogue.playlist_ids[0]).owner
+                rated = rng.sample(catalogue.album_ids, len(catalogue.album_ids) // 20)
+                Rating.objects.bulk_create(
+                    [Rating(album_id=album_id, value=rng.randint(1, 5)) for album_id in rated for _ in range(3)],
+                    batch_size=1000,
+                )
+                # bulk_create() sends no signals; each playlist is
+                # evaluated below instead.
+                playlists = Playlist.objects.bulk_create([
+                    Playlist(name=f"Smart {i}", owner=owner, rules=RULES[i % len(RULES)])
+                    for i in range(len(RULES) * options['copies'])
+                ])
+                start = time.perf_counter()
+                for playlist in playlists:
+                    smart_playlists.materialize(playlist)
+                evaluate = time.perf_counter() - start
+
+                def per_change(change):
+                    start = time.perf_counter()
+                    for _ in range(options['changes']):
+                        change()
+                    return (time.perf_counter() - start) / options['changes']
+
+                def edit_song():
+                    song = Song.objects.get(id=rng.choice(catalogue.song_ids))
+                    song.length = rng.randint(60, 460)
+                    song.save()
+
+                def edit_album():
+                    album = Album.objects.get(id=rng.choice(catalogue.album_ids))
+                    album.format = rng.choice([code for code, _ in Album.FORMAT_CHOICES])
+                    album.save()
+
+                def rate_album():
+                    Rating.objects.create(album_id=rng.choice(rated), value=rng.randint(1, 5))
+
+                def edit_batch():
+                    ids = rng.sample(catalogue.song_ids, options['batch'])
+                    Song.objects.filter(id__in=ids).update(length=rng.randint(60, 460))
+                    smart_playlists.refresh(ids)
+
+                timings = [per_change(change) for change in (edit_song, edit_album, rate_album)]
+                start = time.perf_counter()
+                edit_batch()
+                timings.append(time.perf_counter() - start)
+                self.stdout.write(
+                    f"{albums:>8,} {len(catalogue.song_ids):>9,} {evaluate * 1000:>8.0f}ms "
+                    + ' '.join(f"{t * 1000:>7.2f}ms" for t in timings)
+                )
@@ -0,0 +1,153 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from dottify.sqlite_tuning import (
+    BUSY_TIMEOUT,
+    backoff_delays,
+    is_lock_error,
+    pragma_statements,
+)
+
+SCHEMA = """
+CREATE TABLE rating (
+    id INTEGER PRIMARY KEY,
+    album_id INTEGER NOT NULL,
+    value INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX rating_album_idx ON rating (album_id);
+CREATE TABLE playlist_song (
+    playlist_id INTEGER NOT NULL,
+    song_id INTEGER NOT NULL,
+    PRIMARY KEY (playlist_id, song_id)
+);
+"""
+
+# Django's defaults: rollback journal, deferred transactions, 5s timeout.
+PROFILES = {
+    'default': {'pragmas': [], 'begin': 'BEGIN', 'timeout': 5, 'retry': False},
+    'production': {
+        'pragmas': pragma_statements(),
+        'begin': 'BEGIN IMMEDIATE',
+        'timeout': BUSY_TIMEOUT,
+        'retry': True,
+    },
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare SQLite read/write throughput under concurrent rating and "
+        "playlist writes with Django's default settings and with the "
+        "dottify.sqlite_tuning production profile. Uses a temporary file."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=5.0)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--albums', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        for name, profile in PROFILES.items():
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, 'bench.sqlite3')
+                self._seed(path, options['albums'])
+                stats = self._run(path, profile, options)
+            seconds = options['seconds']
+            self.stdout.write(
+                f"{name:<11} reads/s {stats['reads'] / seconds:10,.0f}   "
+                f"writes/s {stats['writes'] / seconds:8,.0f}   "
+                f"lock errors {stats['errors']:5d}"
+            )
+
+    def _connect(self, path, profile):
+        conn = sqlite3.connect(path, timeout=profile['timeout'],
+                               isolation_level=None, check_same_thread=False)
+        for statement in profile['pragmas']:
+            conn.execute(statement)
+        return conn
+
+    def _seed(self, path, albums):
+        conn = sqlite3.connect(path)
+        conn.executescript(SCHEMA)
+        conn.executemany(
+            "INSERT INTO rating (album_id, value, created_at) VALUES (?, ?, ?)",
+            ((i % albums, i % 5 + 1, time.time()) for i in range(albums * 20)),
+        )
+        conn.commit()
+        conn.close()
+
+    def _run(self, path, profile, options):
+        stats = {'reads': 0, 'writes': 0, 'errors': 0}
+        lock = threading.Lock()
+        deadline = time.perf_counter() + options['seconds']
+        albums = options['albums']
+
+        def reader(n):
+            conn = self._connect(path, profile)
+            done = 0
+            while time.perf_counter() < deadline:
+                conn.execute(
+                    "SELECT AVG(value), COUNT(*) FROM rating WHERE album_id = ?",
+                    ((done * 7 + n) % albums,),
+                ).fetchone()
+                done += 1
+            with lock:
+                stats['reads'] += done
+            conn.close()
+
+        def write_once(conn, n, i):
+            # Read-then-write, like get_or_create(): with deferred
+            # transactions two writers can deadlock upgrading their locks.
+            conn.execute(profile['begin'])
+            try:
+                conn.execute("SELECT COUNT(*) FROM playlist_song WHERE playlist_id = ?", (n,)).fetchone()
+                conn.execute(
+                    "INSERT INTO rating (album_id, value, created_at) VALUES (?, ?, ?)",
+                    (i % albums, i % 5 + 1, time.time()),
+                )
+                conn.execute(
+                    "INSERT OR IGNORE INTO playlist_song (playlist_id, song_id) VALUES (?, ?)",
+                    (n, i),
+                )
+                conn.execute("COMMIT")
+            except sqlite3.OperationalError:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+
+        def writer(n):
+            conn = self._connect(path, profile)
+            done = errors = i = 0
+            while time.perf_counter() < deadline:
+                i += 1
+                delays = backoff_delays() if profile['retry'] else iter(())
+                while True:
+                    try:
+                        write_once(conn, n, i)
+                        done += 1
+                        break
+                    except sqlite3.OperationalError as exc:
+                        delay = next(delays, None)
+                        if delay is None or not is_lock_error(exc):
+                            errors += 1
+                            break
+                        time.sleep(delay)
+            with lock:
+                stats['writes'] += done
+                stats['errors'] += errors
+            conn.close()
+
+        threads = [threading.Thread(target=reader, args=(n,)) for n in range(options['readers'])]
+        threads += [threading.Thread(target=writer, args=(n,)) for n in range(options['writers'])]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return stats
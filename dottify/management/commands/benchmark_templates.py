@@ -0,0 +1,88 @@
+import re
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.template import Engine, engines
+from django.template.loader import get_template, render_to_string
+
+from dottify.management.benchmarking import best_of, synthetic_catalogue
+from dottify.models import Album
+from dottify.rows import AlbumRow, project
+
+
+CACHED_ROWS = re.compile(r'\{% cached_rows (\S+) (\S+) "(\w+)" %\}')
+
+
+def _inline_loop(match):
+    rows, row_template, name = match.groups()
+    row_source = get_template(row_template.strip('"')).template.source
+    return f'{{% for {name} in {rows} %}}{row_source}{{% endfor %}}'
+
+
+def _without_fragment_cache(template_name):
+    """
+    Compile a copy of `template_name` whose {% cached_rows %} tags are
+    replaced by the equivalent inline {% for %} loop, i.e. the page as it
+    was rendered before row fragments were cached.
+    """
+    source = get_template(template_name).template.source
+    return engines['django'].from_string(CACHED_ROWS.sub(_inline_loop, source))
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure render time of the large list pages with and without "
+        "warm row fragments, and template loading with and without the "
+        "cached loader. Uses a throwaway catalogue that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000,
+                            help='Number of albums in the synthetic catalogue.')
+        parser.add_argument('--repeat', type=int, default=3,
+                            help='Timing runs per measurement (best is reported).')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        repeat = options['repeat']
+
+        self.stdout.write(f"Building {rows} albums...")
+        with synthetic_catalogue(albums=rows, songs_per_album=0):
+            albums = project(Album.objects.all(), AlbumRow)
+            for name, template, context in [
+                ('album_list', 'dottify/album_list.html', {'albums': albums}),
+                ('index (anonymous)', 'dottify/index.html', {'albums': albums, 'playlists': []}),
+            ]:
+                def cold():
+                    cache.clear()
+                    return render_to_string(template, context)
+
+                baseline = _without_fragment_cache(template)
+                plain_time, _ = best_of(lambda: baseline.render(context), repeat)
+                cold_time, html = best_of(cold, repeat)
+                warm_time, warm_html = best_of(lambda: render_to_string(template, context), repeat)
+                if html != warm_html:
+                    self.stdout.write(self.style.ERROR(f"{name}: warm render differs from cold render"))
+                self.stdout.write(
+                    f"{name:<20} no fragments {plain_time * 1000:8.1f} ms   "
+                    f"cold {cold_time * 1000:8.1f} ms   "
+                    f"warm {warm_time * 1000:8.1f} ms   "
+                    f"({rows / warm_time:,.0f} rows/s warm)"
+                )
+
+        loaders = ['django.template.loaders.app_directories.Loader']
+        libraries = {'dottify_cache': 'dottify.templatetags.dottify_cache'}
+        plain = Engine(loaders=loaders, libraries=libraries)
+        cached = Engine(
+            loaders=[('django.template.loaders.cached.Loader', loaders)],
+            libraries=libraries,
+        )
+        cached.get_template('dottify/album_list.html')
+        n = 200
+        plain_time, _ = best_of(lambda: [plain.get_template('dottify/album_list.html') for _ in range(n)], repeat)
+        cached_time, _ = best_of(lambda: [cached.get_template('dottify/album_list.html') for _ in range(n)], repeat)
+        self.stdout.write(
+            f"{'get_template':<20} plain {plain_time / n * 1e6:7.1f} us   "
+            f"cached {cached_time / n * 1e6:7.1f} us"
+        )
+        cache.clear()
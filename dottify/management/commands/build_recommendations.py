@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from dottify.recommendations import (
+    ITEM_CHUNK_SIZE,
+    MAX_PLAYLIST_ITEMS,
+    TOP_K,
+    build_similarity,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the similar-album and similar-song tables from playlist "
+        "co-occurrence. Meant to run offline, e.g. nightly from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=TOP_K,
+                            help=f'Neighbours kept per item (default: {TOP_K}).')
+        parser.add_argument('--chunk-size', type=int, default=ITEM_CHUNK_SIZE,
+                            help=f'Albums or songs ranked per query (default: {ITEM_CHUNK_SIZE}).')
+        parser.add_argument('--max-items', type=int, default=MAX_PLAYLIST_ITEMS,
+                            help=f'Skip playlists with more songs than this (default: {MAX_PLAYLIST_ITEMS}).')
+        parser.add_argument('--min-support', type=int, default=1,
+                            help='Ignore pairs sharing fewer playlists than this.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        stats = build_similarity(
+            top_k=options['top_k'],
+            chunk_size=options['chunk_size'],
+            max_items=options['max_items'],
+            min_support=options['min_support'],
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"Read {stats['playlists']} playlists ({stats['skipped']} skipped as too long)."
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {stats['album_rows']} album and {stats['song_rows']} song neighbours "
+            f"in {elapsed:.2f}s."
+        ))
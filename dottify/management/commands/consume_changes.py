@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from dottify.outbox import BATCH_SIZE, CONSUMER_NAME, consume, prune
+
+
+class Command(BaseCommand):
+    help = (
+        "Apply pending playlist/song/rating change events to the derived "
+        "tables (recommendation neighbours, album stats), resuming from the "
+        "consumer's checkpoint."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--name', default=CONSUMER_NAME,
+                            help=f'Checkpoint name (default: {CONSUMER_NAME}).')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                            help=f'Events applied per transaction (default: {BATCH_SIZE}).')
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Keep polling every N seconds instead of draining once.')
+        parser.add_argument('--prune', action='store_true',
+                            help='Delete events this consumer has applied.')
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.perf_counter()
+            applied = consume(options['name'], options['batch_size'])
+            if applied or not options['interval']:
+                self.stdout.write(
+                    f"Applied {applied} events in {(time.perf_counter() - started) * 1000:.1f} ms"
+                )
+            if options['prune']:
+                pruned = prune(options['name'])
+                if pruned:
+                    self.stdout.write(f"Pruned {pruned} applied events")
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,144 @@
+import json
+import os
+import re
+import subprocess
+import sys
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter started with -X importtime, so nothing the
+# management command itself has imported skews the numbers. It boots the
+# project the way a WSGI worker does, serves one request and prints the
+# phase timings as JSON on stdout (import times go to stderr).
+CHILD_SCRIPT = r'''
+import json, sys, time
+start = time.perf_counter()
+from django.apps import AppConfig
+
+ready_times = []
+_create = AppConfig.create.__func__
+
+
+def create(cls, entry):
+    config = _create(cls, entry)
+    ready = config.ready
+
+    def timed_ready():
+        t = time.perf_counter()
+        ready()
+        ready_times.append((config.label, time.perf_counter() - t))
+
+    config.ready = timed_ready
+    return config
+
+
+AppConfig.create = classmethod(create)
+
+from wsgiref.util import setup_testing_defaults
+from django.core.wsgi import get_wsgi_application
+
+t = time.perf_counter()
+application = get_wsgi_application()
+setup_time = time.perf_counter() - t
+
+environ = {'PATH_INFO': sys.argv[1], 'HTTP_HOST': 'localhost'}
+setup_testing_defaults(environ)
+statuses = []
+t = time.perf_counter()
+b''.join(application(environ, lambda status, headers, exc_info=None: statuses.append(status)))
+request_time = time.perf_counter() - t
+
+print(json.dumps({
+    'setup': setup_time,
+    'first_request': request_time,
+    'total': time.perf_counter() - start,
+    'status': statuses[0] if statuses else None,
+    'ready': ready_times,
+    'pil_loaded': 'PIL' in sys.modules,
+    'api_urls_loaded': 'dottify.api_urls' in sys.modules,
+}))
+'''
+
+
+def _ms(seconds):
+    return f"{seconds * 1000:9.1f} ms"
+
+
+IMPORT_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def parse_importtime(stderr):
+    """
+    Parse `python -X importtime` output into (self_us, cumulative_us, module).
+    """
+    rows = []
+    for line in stderr.splitlines():
+        m = IMPORT_LINE.match(line)
+        if m:
+            rows.append((int(m.group(1)), int(m.group(2)), m.group(4)))
+    return rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Profile worker cold start: time django.setup(), each "
+        "AppConfig.ready() and the first request in a fresh interpreter, "
+        "and report import time per package and module."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='/',
+                            help='Path requested as the first request (default: /).')
+        parser.add_argument('--top', type=int, default=15,
+                            help='Number of packages/modules to list.')
+        parser.add_argument('--json', action='store_true',
+                            help='Print the raw measurements as JSON.')
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get(
+            'DJANGO_SETTINGS_MODULE', 'MusicDBInc.settings'))
+        proc = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', CHILD_SCRIPT, options['url']],
+            cwd=settings.BASE_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        if proc.returncode != 0:
+            raise CommandError(f"Start-up run failed:\n{proc.stderr[-2000:]}")
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        imports = parse_importtime(proc.stderr)
+        by_package = Counter()
+        for self_us, _, module in imports:
+            by_package[module.split('.')[0]] += self_us
+        top = options['top']
+
+        if options['json']:
+            result['packages'] = by_package.most_common(top)
+            result['modules'] = sorted(imports, key=lambda r: r[1], reverse=True)[:top]
+            self.stdout.write(json.dumps(result, indent=2))
+            return
+
+        self.stdout.write(f"Cold start for GET {options['url']} ({result['status']})")
+        self.stdout.write(f"  {'django.setup()':<32}{_ms(result['setup'])}")
+        self.stdout.write(f"  {'first request':<32}{_ms(result['first_request'])}")
+        self.stdout.write(f"  {'total':<32}{_ms(result['total'])}")
+
+        self.stdout.write("\nAppConfig.ready()")
+        for label, seconds in sorted(result['ready'], key=lambda r: r[1], reverse=True):
+            self.stdout.write(f"  {label:<32}{_ms(seconds)}")
+
+        self.stdout.write(f"\nImport time by top-level package (self time, top {top})")
+        for package, us in by_package.most_common(top):
+            self.stdout.write(f"  {package:<32}{_ms(us / 1e6)}")
+
+        self.stdout.write(f"\nSlowest imports (cumulative, top {top})")
+        for _, cumulative, module in sorted(imports, key=lambda r: r[1], reverse=True)[:top]:
+            self.stdout.write(f"  {module:<48}{_ms(cumulative / 1e6)}")
+
+        self.stdout.write(
+            f"\nPillow imported: {'yes' if result['pil_loaded'] else 'no'}; "
+            f"API URLconf imported: {'yes' if result['api_urls_loaded'] else 'no'}"
+        )
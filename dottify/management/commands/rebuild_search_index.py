@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from dottify import search
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-create the fuzzy search trigram postings from the catalogue. "
+        "Only needed after bulk writes (bulk_create, QuerySet.update()) "
+        "that bypass the signal handlers keeping them current."
+    )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        written = search.rebuild()
+        self.stdout.write(f"Wrote {written:,} postings in {time.perf_counter() - start:.1f} s.")
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from dottify.smart_playlists import materialize, smart_playlists
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-evaluate the rules of every smart playlist and bring its songs "
+        "in line. Run daily, so ratings that have left a rating window are "
+        "dropped, and after bulk writes that sent no signals."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rated-only', action='store_true',
+                            help='Only playlists with a rating window.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = added = removed = 0
+        for playlist in smart_playlists().order_by('id'):
+            if options['rated_only'] and 'min_rating' not in playlist.rules:
+                continue
+            with transaction.atomic():
+                a, r = materialize(playlist)
+            count += 1
+            added += a
+            removed += r
+        self.stdout.write(
+            f"Refreshed {count} smart playlists (+{added} -{removed} songs) "
+            f"in {(time.perf_counter() - started) * 1000:.1f} ms"
+        )
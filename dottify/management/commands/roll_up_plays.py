@@ -0,0 +1,36 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from dottify.audience import prune
+from dottify.plays import pending_days, roll_up
+
+
+class Command(BaseCommand):
+    help = (
+        "Roll the play event segments up into per-song and per-album daily "
+        "play counts and unique listener sketches, for every day with events "
+        "not yet rolled up (or the days given), then drop expired day sketches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('days', nargs='*', type=date.fromisoformat,
+                            help='Days (YYYY-MM-DD) to roll up again regardless.')
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Keep polling every N seconds instead of running once.')
+
+    def handle(self, *args, **options):
+        days = options['days']
+        while True:
+            for day in days or pending_days():
+                started = time.perf_counter()
+                events = roll_up(day)
+                self.stdout.write(
+                    f"{day}: {events} events in {(time.perf_counter() - started) * 1000:.1f} ms"
+                )
+            prune()
+            if not options['interval']:
+                break
+            days = []
+            time.sleep(options['interval'])
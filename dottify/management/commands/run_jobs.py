@@ -0,0 +1,56 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from dottify.jobs import CLAIM_BATCH_SIZE, requeue_stale, run_pending
+
+
+class Command(BaseCommand):
+    help = (
+        "Run queued background jobs (cover processing, cache warming, "
+        "support mail) in a thread or process pool."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4,
+                            help='Jobs run concurrently (default: 4).')
+        parser.add_argument('--pool', choices=['thread', 'process'], default='thread',
+                            help='Executor type: threads suit I/O-bound jobs, processes '
+                                 'CPU-bound ones such as image resizing (default: thread).')
+        parser.add_argument('--batch-size', type=int, default=CLAIM_BATCH_SIZE,
+                            help=f'Jobs claimed per round (default: {CLAIM_BATCH_SIZE}).')
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help='Seconds to sleep when the queue is empty (default: 1).')
+        parser.add_argument('--once', action='store_true',
+                            help='Drain the due jobs and exit instead of polling.')
+
+    def handle(self, *args, **options):
+        if options['pool'] == 'process':
+            # Spawned children import Django afresh rather than inheriting
+            # this process's open database connections.
+            connections.close_all()
+            executor = ProcessPoolExecutor(
+                max_workers=options['workers'],
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=django.setup,
+            )
+        else:
+            executor = ThreadPoolExecutor(max_workers=options['workers'])
+
+        with executor:
+            while True:
+                requeued = requeue_stale()
+                if requeued:
+                    self.stdout.write(f"Re-queued {requeued} stale jobs")
+                started = time.perf_counter()
+                results = run_pending(executor, limit=options['batch_size'])
+                if results:
+                    summary = ', '.join(f"{n} {status}" for status, n in sorted(results.items()))
+                    self.stdout.write(f"{summary} in {(time.perf_counter() - started) * 1000:.1f} ms")
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
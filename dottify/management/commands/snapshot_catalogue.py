@@ -0,0 +1,33 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from dottify.snapshot import SNAPSHOT_CHUNK_SIZE, write_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Write a columnar, memory-mappable snapshot of albums, songs, "
+        "playlist membership and ratings to a directory, replacing any "
+        "previous snapshot there. Point DOTTIFY_SNAPSHOT at it to serve the "
+        "album API without a database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Snapshot directory.')
+        parser.add_argument('--chunk-size', type=int, default=SNAPSHOT_CHUNK_SIZE,
+                            help=f'Rows read per query (default: {SNAPSHOT_CHUNK_SIZE}).')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        counts = write_snapshot(options['path'], chunk_size=options['chunk_size'])
+        elapsed = time.perf_counter() - started
+
+        path = options['path']
+        size = sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+        for table, rows in counts.items():
+            self.stdout.write(f"{table:<14} {rows:>10} rows")
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {size / 1024:.1f} KiB to {path} in {elapsed:.2f}s."
+        ))
@@ -0,0 +1,69 @@
+import sqlite3
+import time
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+def sqlite_path(name):
+    """
+    Filesystem path of a sqlite3 DATABASES NAME, which may be a plain path
+    or a file: URI such as file:/srv/db.replica.sqlite3?mode=ro.
+    """
+    name = str(name)
+    if name.startswith('file:'):
+        return urlparse(name).path
+    return name
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the primary SQLite database into a local stand-in read "
+        "replica using SQLite's online backup API, once or every --interval "
+        "seconds."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='replica',
+                            help='DATABASES alias of the replica (default: replica).')
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Keep syncing every N seconds instead of once.')
+
+    def handle(self, *args, **options):
+        alias = options['database']
+        if alias not in settings.DATABASES or alias == 'default':
+            raise CommandError(f"{alias!r} is not a replica alias in DATABASES.")
+        source = sqlite_path(settings.DATABASES['default']['NAME'])
+        target = sqlite_path(settings.DATABASES[alias]['NAME'])
+
+        while True:
+            started = time.perf_counter()
+            self.sync(source, target)
+            self.stdout.write(
+                f"Synced {source} -> {target} in {(time.perf_counter() - started) * 1000:.1f} ms"
+            )
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def sync(self, source, target):
+        """
+        Copy `source` over `target` in place.
+
+        The backup API takes a consistent snapshot of the primary (WAL
+        writers are not blocked) and writes it into the existing replica
+        file, so replica connections that stay open under CONN_MAX_AGE
+        see the new data rather than an unlinked old file. The copy
+        inherits WAL mode from the primary; it is switched back to a
+        rollback journal so that read-only (mode=ro) connections can open it
+        without -wal/-shm files.
+        """
+        src = sqlite3.connect(source)
+        dst = sqlite3.connect(target, timeout=30)
+        try:
+            src.backup(dst)
+            dst.execute('PRAGMA journal_mode=DELETE')
+        finally:
+            dst.close()
+            src.close()
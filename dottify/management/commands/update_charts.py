@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from dottify.charts import CHART_NAME, load, update
+
+
+class Command(BaseCommand):
+    help = (
+        "Count play events and ratings added since the last run into the "
+        "decayed song and album charts, then checkpoint them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--name', default=CHART_NAME,
+                            help=f'Checkpoint name (default: {CHART_NAME}).')
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Keep polling every N seconds instead of running once.')
+
+    def handle(self, *args, **options):
+        builder = load(options['name'])
+        while True:
+            started = time.perf_counter()
+            played, rated = update(builder, options['name'])
+            if played or rated or not options['interval']:
+                self.stdout.write(
+                    f"Counted {played} plays and {rated} ratings in "
+                    f"{(time.perf_counter() - started) * 1000:.1f} ms"
+                )
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,86 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dottify.warming import (
+    DEFAULT_ROUTES,
+    ROLES,
+    fetch_in_process,
+    http_fetcher,
+    popular_album_paths,
+    role_sessions,
+    shared_cache,
+    top_paths_from_log,
+    warm,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Render hot pages and API responses into the caches, once per "
+        "visibility role, using a thread pool. Run after a deploy or cache "
+        "flush. Renders in this process only when the cache is shared with "
+        "the web workers; otherwise pass --base-url."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--route', action='append', dest='routes', metavar='PATH',
+                            help='Path to warm; repeatable. Defaults to ' + ', '.join(DEFAULT_ROUTES) + '.')
+        parser.add_argument('--access-log', metavar='FILE',
+                            help='Also warm the most requested paths in this access log.')
+        parser.add_argument('--top', type=int, default=20,
+                            help='Paths taken from --access-log (default: 20).')
+        parser.add_argument('--top-albums', type=int, default=10,
+                            help='Also warm the detail pages of the N most playlisted albums (default: 10).')
+        parser.add_argument('--roles', nargs='+', choices=ROLES, default=ROLES,
+                            help='Role variants to warm (default: all that have a user).')
+        parser.add_argument('--workers', type=int, default=8,
+                            help='Concurrent requests (default: 8).')
+        parser.add_argument('--base-url',
+                            help='Warm a running server over HTTP, e.g. http://127.0.0.1:8000, '
+                                 'instead of rendering in this process. Must be https:// or localhost, '
+                                 'since the requests carry login sessions.')
+
+    def handle(self, *args, **options):
+        if options['base_url']:
+            try:
+                fetch = http_fetcher(options['base_url'])
+            except ValueError as exc:
+                raise CommandError(str(exc))
+        elif shared_cache():
+            fetch = fetch_in_process
+        else:
+            raise CommandError(
+                "The cache is local to each process, so warming it here would not help the "
+                "web workers. Pass --base-url, or set DOTTIFY_CACHE_URL to share the cache."
+            )
+        paths = list(options['routes'] or DEFAULT_ROUTES)
+        if options['access_log']:
+            try:
+                with open(options['access_log'], encoding='utf-8', errors='replace') as f:
+                    paths += top_paths_from_log(f, options['top'])
+            except OSError as exc:
+                raise CommandError(f"Cannot read access log: {exc}")
+        if options['top_albums']:
+            paths += popular_album_paths(options['top_albums'])
+        paths = list(dict.fromkeys(paths))
+
+        started = time.perf_counter()
+        with role_sessions(options['roles']) as sessions:
+            skipped = [role for role in options['roles'] if role not in sessions]
+            results = warm(paths, sessions, fetch, options['workers'])
+        elapsed = time.perf_counter() - started
+
+        for role in skipped:
+            self.stdout.write(self.style.WARNING(f"No user found for role {role!r}; skipped."))
+        for result in sorted(results, key=lambda r: (ROLES.index(r.role), r.path)):
+            line = f"{result.role:<10} {str(result.status):<5} {result.ms:8.1f} ms  {result.path}"
+            self.stdout.write(line if result.status == 200 else self.style.WARNING(line))
+        total = sum(r.ms for r in results)
+        slowest = max(results, key=lambda r: r.ms, default=None)
+        self.stdout.write(
+            f"Warmed {len(paths)} paths x {len(sessions)} roles = {len(results)} requests "
+            f"in {elapsed:.2f}s wall ({total / 1000:.2f}s of rendering)."
+        )
+        if slowest is not None:
+            self.stdout.write(f"Slowest: {slowest.path} as {slowest.role} ({slowest.ms:.1f} ms)")
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.6 on 2026-10-19 10:03
+
+from django.db import migrations, models
+from django.template.defaultfilters import slugify
+
+
+def backfill_slugs(apps, schema_editor):
+    DottifyUser = apps.get_model('dottify', 'DottifyUser')
+    for duser in DottifyUser.objects.only('id', 'display_name').iterator():
+        DottifyUser.objects.filter(pk=duser.pk).update(slug=slugify(duser.display_name))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dottify', '0011_comment_threading'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dottifyuser',
+            name='slug',
+            field=models.SlugField(blank=True, editable=False, max_length=150),
+        ),
+        migrations.RunPython(backfill_slugs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.6 on 2026-10-19 14:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dottify', '0013_album_updated_at_song_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlbumNeighbour',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField()),
+                ('album', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='dottify.album')),
+                ('neighbour', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='dottify.album')),
+            ],
+            options={
+                'ordering': ['album', 'rank'],
+                'constraints': [models.UniqueConstraint(fields=('album', 'rank'), name='albumneighbour_album_rank_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SongNeighbour',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField()),
+                ('neighbour', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='dottify.song')),
+                ('song', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='dottify.song')),
+            ],
+            options={
+                'ordering': ['song', 'rank'],
+                'constraints': [models.UniqueConstraint(fields=('song', 'rank'), name='songneighbour_song_rank_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.6 on 2026-10-19 17:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_artists(apps, schema_editor):
+    """
+    One Artist per distinct Album.artist_name, owned by the profile whose
+    display name matched it (the old ownership rule), then point every
+    album at its artist.
+    """
+    Album = apps.get_model('dottify', 'Album')
+    Artist = apps.get_model('dottify', 'Artist')
+    DottifyUser = apps.get_model('dottify', 'DottifyUser')
+
+    names = Album.objects.exclude(artist_name='').values_list('artist_name', flat=True).distinct()
+    claimed = set()
+    for name in names.iterator():
+        owner = (
+            DottifyUser.objects.filter(display_name=name)
+            .exclude(id__in=claimed)
+            .order_by('id')
+            .first()
+        )
+        if owner is not None:
+            claimed.add(owner.id)
+        artist = Artist.objects.create(name=name, user=owner)
+        Album.objects.filter(artist_name=name).update(artist=artist)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dottify', '0017_dataversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Artist',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, unique=True)),
+                ('user', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='artist', to='dottify.dottifyuser')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='album',
+            name='artist',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='albums', to='dottify.artist'),
+        ),
+        migrations.RunPython(backfill_artists, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 5.2.6 on 2026-10-19 20:10
+
+import re
+import unicodedata
+from itertools import islice
+
+from django.db import migrations, models
+
+_NON_WORD = re.compile(r'[\W_]+')
+
+
+# Copies of dottify.autocomplete.normalize() and dottify.search.trigrams()
+# as they were when this migration was written, so that later changes to
+# either do not change what it backfills.
+def normalize(text):
+    decomposed = unicodedata.normalize('NFKD', text)
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return _NON_WORD.sub(' ', stripped.casefold()).strip()
+
+
+def trigrams(text):
+    grams = set()
+    for word in normalize(text).split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def backfill_postings(apps, schema_editor):
+    """
+    Index the existing catalogue; later changes are indexed by the
+    signal handlers in dottify/search.py.
+    """
+    Album = apps.get_model('dottify', 'Album')
+    Song = apps.get_model('dottify', 'Song')
+
+    sql = 'INSERT INTO dottify_searchtrigram (trigram, field, object_id) VALUES (%s, %s, %s)'
+    with schema_editor.connection.cursor() as cursor:
+        for field, model, attribute in [(1, Album, 'title'), (2, Album, 'artist_name'), (3, Song, 'title')]:
+            rows = (
+                (gram, field, object_id)
+                for object_id, text in model.objects.values_list('id', attribute).iterator(chunk_size=5000)
+                for gram in trigrams(text)
+            )
+            while batch := list(islice(rows, 5000)):
+                cursor.executemany(sql, batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dottify', '0020_playlist_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3)),
+                ('field', models.PositiveSmallIntegerField(choices=[(1, 'Album title'), (2, 'Album artist'), (3, 'Song title')])),
+                ('object_id', models.BigIntegerField()),
+            ],
+        ),
+        # Loaded before the indexes exist, which is much faster than
+        # maintaining them row by row.
+        migrations.RunPython(backfill_postings, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='searchtrigram',
+            index=models.Index(fields=['trigram', 'field', 'object_id'], name='searchtrigram_posting_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='searchtrigram',
+            index=models.Index(fields=['field', 'object_id', 'trigram'], name='searchtrigram_object_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.6 on 2026-10-19 21:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dottify', '0022_catalogue_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='playlist',
+            name='rules',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='playlist',
+            index=models.Index(condition=models.Q(('rules__isnull', False)), fields=['id'], name='playlist_smart_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rating',
+            index=models.Index(fields=['created_at'], name='rating_created_at_idx'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.6 on 2026-10-19 21:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dottify', '0023_playlist_rules'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlayRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('events', models.PositiveBigIntegerField()),
+                ('rolled_up_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AlbumDailyPlays',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('plays', models.PositiveIntegerField()),
+                ('seconds', models.PositiveBigIntegerField()),
+                ('album', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='dottify.album')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day'], name='albumdailyplays_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('album', 'day'), name='albumdailyplays_album_day_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SongDailyPlays',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('plays', models.PositiveIntegerField()),
+                ('seconds', models.PositiveBigIntegerField()),
+                ('song', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='dottify.song')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day'], name='songdailyplays_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('song', 'day'), name='songdailyplays_song_day_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.6 on 2026-10-19 22:40
+
+from django.db import migrations, models
+
+
+def backfill_raters(apps, schema_editor):
+    """
+    All-time rater sketches for the existing ratings; new ratings are
+    added by the signal handler in dottify/audience.py.
+    """
+    from dottify.audience import HyperLogLog
+
+    AudienceSketch = apps.get_model('dottify', 'AudienceSketch')
+    Rating = apps.get_model('dottify', 'Rating')
+
+    sketches = {}
+    rows = Rating.objects.filter(user__isnull=False).values_list('user_id', 'album_id', 'song_id', 'song__album_id')
+    for user, album, song, song_album in rows.iterator(chunk_size=5000):
+        for target, object_id in ((1, album or song_album), (2, song)):
+            if object_id is not None:
+                if (target, object_id) not in sketches:
+                    sketches[target, object_id] = HyperLogLog()
+                sketches[target, object_id].add(user)
+    AudienceSketch.objects.bulk_create(
+        (AudienceSketch(target=target, object_id=object_id, metric=2, day=None, registers=sketch.to_bytes())
+         for (target, object_id), sketch in sketches.items()),
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dottify', '0025_chartcheckpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AudienceSketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('target', models.PositiveSmallIntegerField(choices=[(1, 'Album'), (2, 'Song')])),
+                ('object_id', models.BigIntegerField()),
+                ('metric', models.PositiveSmallIntegerField(choices=[(1, 'Listeners'), (2, 'Raters')])),
+                ('day', models.DateField(blank=True, null=True)),
+                ('registers', models.BinaryField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day'], name='audiencesketch_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('target', 'object_id', 'metric', 'day'), name='audiencesketch_day_uniq'), models.UniqueConstraint(condition=models.Q(('day__isnull', True)), fields=('target', 'object_id', 'metric'), name='audiencesketch_all_time_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill_raters, migrations.RunPython.noop),
+    ]
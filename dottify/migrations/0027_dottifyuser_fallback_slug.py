@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-19 23:10
+
+from django.db import migrations
+
+
+def fill_empty_slugs(apps, schema_editor):
+    DottifyUser = apps.get_model('dottify', 'DottifyUser')
+    DottifyUser.objects.filter(slug='').update(slug='user')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dottify', '0026_audiencesketch'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_empty_slugs, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,11 @@
 from decimal import Decimal
 from django.db import models
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
+from django.template.defaultfilters import slugify
+from django.urls import reverse
+from django.utils import timezone
 
 def default_cover():
     """
@@ -13,21 +17,87 @@ def default_cover():
     """
     return ''
 
+# Profile slug for display names that slugify to ''.
+FALLBACK_SLUG = 'user'
+
 class DottifyUser(models.Model):
     """
     Profile model that extends Django's built-in User.
 
     Sheet C/D talk about 'display names' for playlists and comments.
     We keep authentication on auth.User, but expose display_name here.
+    The profile URL slug is derived from display_name (FALLBACK_SLUG if
+    that slugifies to nothing) and cached in `slug` on save, so links can
+    be built without re-slugifying.
+    A new profile claims the unowned Artist whose name matches its
+    display name, if there is one.
     """
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     display_name = models.CharField(max_length=150)
+    slug = models.SlugField(max_length=150, blank=True, editable=False)
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        # Names with nothing to slugify ("!!!", non-Latin scripts) still
+        # need a slug for the profile URL to reverse.
+        self.slug = slugify(self.display_name) or FALLBACK_SLUG
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'display_name' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'slug'}
+        super().save(*args, **kwargs)
+        if adding:
+            Artist.objects.filter(name=self.display_name, user__isnull=True).update(user=self)
+
+    def get_absolute_url(self):
+        return reverse('user-detail-slug', kwargs={'user_id': self.pk, 'slug': self.slug})
+
     def __str__(self):
         return self.display_name
 
+class Artist(models.Model):
+    """
+    A recording artist, optionally owned by a DottifyUser account.
+
+    Albums point at their Artist, so "does this user own this album" is
+    an integer comparison (album.artist_id == duser.artist.id) and an
+    artist's albums are an index range scan on album.artist_id, whatever
+    the user's display name is now. Artists are created from
+    Album.artist_name by Album.save(); see Artist.for_name().
+    """
+    name = models.CharField(max_length=200, unique=True)
+    user = models.OneToOneField(
+        DottifyUser,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='artist',
+    )
+
+    @classmethod
+    def for_name(cls, name):
+        """
+        The Artist called `name`, created on first use and then owned by
+        the profile whose display name matches, if any.
+        """
+        artist = cls.objects.filter(name=name).first()
+        if artist is None:
+            owner = DottifyUser.objects.filter(display_name=name, artist__isnull=True).order_by('id').first()
+            artist, _ = cls.objects.get_or_create(name=name, defaults={'user': owner})
+        return artist
+
+    def __str__(self):
+        return self.name
+
+
 class Album(models.Model):
     """
     Represents a single album / EP / single in the catalogue.
+
+    updated_at is part of the template fragment cache key for album
+    rows, so bulk QuerySet.update() calls must set it explicitly.
+
+    artist_name stays the displayed credit; save() keeps the `artist`
+    foreign key in step with it.
     """
     FORMAT_SNGL = "SNGL"
     FORMAT_RMST = "RMST"
@@ -49,6 +119,13 @@ class Album(models.Model):
         blank=True,
     )
     artist_name = models.CharField(max_length=200)
+    artist = models.ForeignKey(
+        Artist,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='albums',
+    )
     release_date = models.DateField(null=True, blank=True)
     retail_price = models.DecimalField(
         max_digits=6,
@@ -58,16 +135,57 @@ class Album(models.Model):
         blank=True,
     )
     cover_image = models.ImageField(upload_to='', null=True, blank=True, default=default_cover)
+    # Version stamp for cached fragments; bumped on every save().
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Covering indexes for the /api/analytics/ aggregates.
+            models.Index(fields=['format', 'retail_price'], name='album_format_price_idx'),
+            models.Index(fields=['release_date'], name='album_release_date_idx'),
+            # API filters and sort orders (dottify/filters.py): each sort
+            # column alone and behind each equality filter.
+            models.Index(fields=['title'], name='album_title_idx'),
+            models.Index(fields=['retail_price'], name='album_price_idx'),
+            models.Index(fields=['format', 'id'], name='album_format_id_idx'),
+            models.Index(fields=['format', 'title'], name='album_format_title_idx'),
+            models.Index(fields=['format', 'release_date'], name='album_format_date_idx'),
+            models.Index(fields=['artist', 'title'], name='album_artist_title_idx'),
+            models.Index(fields=['artist', 'release_date'], name='album_artist_date_idx'),
+            models.Index(fields=['artist', 'retail_price'], name='album_artist_price_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.artist_name and (self.artist_id is None or self.artist.name != self.artist_name):
+            self.artist = Artist.for_name(self.artist_name)
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and 'artist_name' in update_fields:
+                kwargs['update_fields'] = {*update_fields, 'artist'}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.title} - {self.artist_name}"
 
 class Song(models.Model):
     """
     A song belongs to exactly one Album.
+
+    As with Album, updated_at versions the cached song row fragments.
     """
     title = models.CharField(max_length=200)
     album = models.ForeignKey(Album, on_delete=models.CASCADE)
     length = models.PositiveIntegerField(default=0)
+    # Version stamp for cached fragments; bumped on every save().
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Per-album length aggregates read this index alone.
+            models.Index(fields=['album', 'length'], name='song_album_length_idx'),
+            # Length filters and sort orders across albums.
+            models.Index(fields=['length'], name='song_length_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -78,6 +196,13 @@ class Playlist(models.Model):
     - 0 = Private
     - 1 = Unlisted
     - 2 = Public
+
+    updated_at is the playlist's revision stamp for API ETags; changes to
+    songs touch it too (see dottify/conditional.py).
+
+    A playlist with `rules` is a smart playlist: its songs are the ones
+    the rules select, kept up to date by dottify/smart_playlists.py
+    rather than edited by hand.
     """
     VISIBILITY = [
         (0, 'Private'),
@@ -97,19 +222,59 @@ class Playlist(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
     visibility = models.IntegerField(choices=VISIBILITY, default=2)
+    updated_at = models.DateTimeField(auto_now=True)
+    rules = models.JSONField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['id'], condition=models.Q(rules__isnull=False), name='playlist_smart_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
 class Comment(models.Model):
     """
-    Read-only comments for playlists (Sheet D requirement).
-    playlist is used in the UI; song is available for future extension.
+    Threaded comments for playlists and songs.
+
+    A comment with no parent starts a thread; replies point at the
+    comment they answer and must share its playlist/song. The composite
+    indexes let the detail pages read one page of the newest comments
+    without touching the rest of a long discussion.
     Users are linked through DottifyUser so we can show display_name.
     """
     user = models.ForeignKey(DottifyUser, on_delete=models.CASCADE, null=True, blank=True)
     song = models.ForeignKey(Song, on_delete=models.CASCADE, null=True, blank=True)
     playlist = models.ForeignKey(Playlist, on_delete=models.CASCADE, null=True, blank=True)
+    parent = models.ForeignKey(
+        'self',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='replies',
+    )
     text = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['created_at', 'id']
+        indexes = [
+            models.Index(fields=['playlist', 'created_at'], name='comment_playlist_created_idx'),
+            models.Index(fields=['song', 'created_at'], name='comment_song_created_idx'),
+        ]
+
+    def clean(self):
+        if self.parent_id is not None:
+            if self.parent_id == self.pk:
+                raise ValidationError("A comment cannot reply to itself.")
+            if (self.parent.playlist_id != self.playlist_id
+                    or self.parent.song_id != self.song_id):
+                raise ValidationError(
+                    "A reply must belong to the same playlist or song as its parent."
+                )
+
+    def __str__(self):
+        return self.text[:50]
 
 class Rating(models.Model):
     """
@@ -121,4 +286,286 @@ class Rating(models.Model):
     song = models.ForeignKey(Song, on_delete=models.CASCADE, null=True, blank=True)
     album = models.ForeignKey(Album, on_delete=models.CASCADE, null=True, blank=True)
     value = models.IntegerField(null=True, blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
\ No newline at end of file
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['album', 'value'], name='rating_album_value_idx'),
+            models.Index(fields=['created_at'], name='rating_created_at_idx'),
+        ]
+
+class AlbumNeighbour(models.Model):
+    """
+    Precomputed "similar albums": the top-K albums that share playlists
+    with `album`, ranked by cosine similarity of playlist co-occurrence.
+
+    Rebuilt offline by the build_recommendations command (see
+    dottify/recommendations.py). The (album, rank) constraint is the
+    index the /api/albums/<pk>/similar/ endpoint reads.
+    """
+    album = models.ForeignKey(Album, on_delete=models.CASCADE, related_name='+')
+    neighbour = models.ForeignKey(Album, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        ordering = ['album', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['album', 'rank'], name='albumneighbour_album_rank_uniq'),
+        ]
+
+
+class SongNeighbour(models.Model):
+    """
+    Song-level counterpart of AlbumNeighbour.
+    """
+    song = models.ForeignKey(Song, on_delete=models.CASCADE, related_name='+')
+    neighbour = models.ForeignKey(Song, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        ordering = ['song', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['song', 'rank'], name='songneighbour_song_rank_uniq'),
+        ]
+
+
+class AlbumStats(models.Model):
+    """
+    Per-album aggregates kept up to date by the consume_changes command
+    rather than recomputed on every page view.
+    """
+    album = models.OneToOneField(Album, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_total = models.PositiveIntegerField(default=0)
+    playlist_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def rating_average(self):
+        return self.rating_total / self.rating_count if self.rating_count else None
+
+
+class ChangeEvent(models.Model):
+    """
+    Outbox of changes to playlists, songs and ratings (see dottify/outbox.py).
+
+    Rows are written by signal handlers in the same transaction as the
+    change itself and read in id order by consumers, which remember how
+    far they got in a ConsumerCheckpoint.
+    """
+    model = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=10)
+    payload = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f"{self.model}:{self.object_id} {self.action}"
+
+
+class ConsumerCheckpoint(models.Model):
+    """
+    The last ChangeEvent id a named consumer has fully applied.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    last_event_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.last_event_id}"
+
+
+class Job(models.Model):
+    """
+    A unit of background work for the run_jobs worker (see dottify/jobs.py).
+
+    `name` is the registered job name; args/kwargs must be JSON-serialisable.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+    name = models.CharField(max_length=100)
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='job_status_run_after_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+
+class DataVersion(models.Model):
+    """
+    A counter per model, bumped whenever a row of that model is saved or
+    deleted (see dottify/versions.py). Cached pages and API responses put
+    the versions they depend on in their keys.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    version = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} v{self.version}"
+
+
+class SearchTrigram(models.Model):
+    """
+    One posting of the fuzzy search index (see dottify/search.py): the
+    text in `field` of the row `object_id` contains `trigram`.
+
+    Kept in step by signal handlers on Album and Song; bulk writes must
+    call dottify.search.rebuild() (the rebuild_search_index command).
+    """
+    ALBUM_TITLE = 1
+    ALBUM_ARTIST = 2
+    SONG_TITLE = 3
+    FIELD_CHOICES = [
+        (ALBUM_TITLE, 'Album title'),
+        (ALBUM_ARTIST, 'Album artist'),
+        (SONG_TITLE, 'Song title'),
+    ]
+    trigram = models.CharField(max_length=3)
+    field = models.PositiveSmallIntegerField(choices=FIELD_CHOICES)
+    object_id = models.BigIntegerField()
+
+    class Meta:
+        # Both covering. Rows are unique per (trigram, field, object_id)
+        # by construction; dottify.search.rebuild() drops and recreates
+        # these around its bulk load.
+        indexes = [
+            # The posting lists: rows for a trigram in field order.
+            models.Index(fields=['trigram', 'field', 'object_id'], name='searchtrigram_posting_idx'),
+            models.Index(fields=['field', 'object_id', 'trigram'], name='searchtrigram_object_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.trigram!r} {self.get_field_display()} #{self.object_id}"
+
+
+class SongDailyPlays(models.Model):
+    """
+    Plays of a song on one UTC day, and the seconds listened, rolled up
+    from the play event segments by the roll_up_plays command (see
+    dottify/plays.py). A day is always rewritten whole.
+    """
+    song = models.ForeignKey(Song, on_delete=models.CASCADE, related_name='+')
+    day = models.DateField()
+    plays = models.PositiveIntegerField()
+    seconds = models.PositiveBigIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['song', 'day'], name='songdailyplays_song_day_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['day'], name='songdailyplays_day_idx'),
+        ]
+
+
+class AlbumDailyPlays(models.Model):
+    """
+    SongDailyPlays summed over each album's songs.
+    """
+    album = models.ForeignKey(Album, on_delete=models.CASCADE, related_name='+')
+    day = models.DateField()
+    plays = models.PositiveIntegerField()
+    seconds = models.PositiveBigIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['album', 'day'], name='albumdailyplays_album_day_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['day'], name='albumdailyplays_day_idx'),
+        ]
+
+
+class PlayRollup(models.Model):
+    """
+    How many play events of `day` the last roll-up of that day read; a
+    day whose segments now hold more is rolled up again.
+    """
+    day = models.DateField(unique=True)
+    events = models.PositiveBigIntegerField()
+    rolled_up_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.day}: {self.events} events"
+
+
+class ChartCheckpoint(models.Model):
+    """
+    The last saved state of a chart builder (see dottify/charts.py): its
+    decayed heavy-hitter counters and read positions in `state`, and the
+    song and album charts they gave in `charts`, which the API serves.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    state = models.BinaryField()
+    charts = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.updated_at}"
+
+
+class AudienceSketch(models.Model):
+    """
+    A HyperLogLog sketch of the distinct users who played (LISTENERS) or
+    rated (RATERS) an album or song on one UTC day, or over all time when
+    `day` is null; see dottify/audience.py.
+
+    Listener sketches are written by the play roll-up, rater sketches by
+    a signal handler on Rating.
+    """
+    ALBUM = 1
+    SONG = 2
+    TARGET_CHOICES = [
+        (ALBUM, 'Album'),
+        (SONG, 'Song'),
+    ]
+    LISTENERS = 1
+    RATERS = 2
+    METRIC_CHOICES = [
+        (LISTENERS, 'Listeners'),
+        (RATERS, 'Raters'),
+    ]
+    target = models.PositiveSmallIntegerField(choices=TARGET_CHOICES)
+    object_id = models.BigIntegerField()
+    metric = models.PositiveSmallIntegerField(choices=METRIC_CHOICES)
+    day = models.DateField(null=True, blank=True)
+    registers = models.BinaryField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['target', 'object_id', 'metric', 'day'],
+                                    name='audiencesketch_day_uniq'),
+            models.UniqueConstraint(fields=['target', 'object_id', 'metric'], condition=models.Q(day__isnull=True),
+                                    name='audiencesketch_all_time_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['day'], name='audiencesketch_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_metric_display()} of {self.get_target_display()} #{self.object_id} on {self.day or 'all days'}"
@@ -0,0 +1,226 @@
+"""
+Change-event outbox for derived data.
+
+Signal handlers append a ChangeEvent for every change to a playlist (its
+row or its songs), a song or a rating, inside the same transaction as the
+change, so an event exists if and only if the change committed.
+
+The consume_changes command drains the outbox in id order and refreshes
+only what the batch touched: the recommendation neighbours of affected
+songs/albums and the AlbumStats aggregates. Every refresh recomputes its
+rows from the current tables instead of applying deltas, so replaying a
+batch is harmless. The checkpoint is saved in the same transaction as the
+refresh; after a crash the consumer resumes from the last committed batch.
+"""
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+
+from .models import (
+    Album,
+    AlbumStats,
+    ChangeEvent,
+    ConsumerCheckpoint,
+    Playlist,
+    Rating,
+    Song,
+)
+from .recommendations import ALBUM, SONG, refresh_neighbours
+
+CONSUMER_NAME = 'derived'
+BATCH_SIZE = 500
+
+
+def record(model, object_id, action, **payload):
+    ChangeEvent.objects.create(model=model, object_id=object_id, action=action, payload=payload)
+
+
+def _playlist_saved(sender, instance, created, **kwargs):
+    record('playlist', instance.pk, 'create' if created else 'update')
+
+
+def _playlist_deleting(sender, instance, **kwargs):
+    # The join rows are gone by post_delete, so remember the songs now.
+    instance._outbox_songs = list(instance.songs.values_list('id', flat=True))
+
+
+def _playlist_deleted(sender, instance, **kwargs):
+    record('playlist', instance.pk, 'delete', songs=getattr(instance, '_outbox_songs', []))
+
+
+def _playlist_songs_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Playlist.songs changes, from either side of the relation.
+
+    One event per affected playlist, listing the songs that were added or
+    removed. clear() does not pass pk_set, so the members are read in
+    pre_clear and used in post_clear.
+    """
+    if action == 'pre_clear':
+        related = instance.playlists if reverse else instance.songs
+        instance._outbox_cleared = list(related.values_list('id', flat=True))
+        return
+    if action == 'post_clear':
+        pk_set = getattr(instance, '_outbox_cleared', [])
+    elif action not in ('post_add', 'post_remove'):
+        return
+    if not pk_set:
+        return
+    if reverse:
+        for playlist_id in sorted(pk_set):
+            record('playlist', playlist_id, 'songs', songs=[instance.pk])
+    else:
+        record('playlist', instance.pk, 'songs', songs=sorted(pk_set))
+
+
+def _album_changing(sender, instance, update_fields=None, **kwargs):
+    """
+    Remember the stored album of a song or rating that is moving to
+    another one, so its event can name both.
+    """
+    instance._outbox_previous_album = None
+    if instance._state.adding or (update_fields is not None and 'album' not in update_fields):
+        return
+    stored = sender.objects.filter(pk=instance.pk).values_list('album_id', flat=True).first()
+    if stored != instance.album_id:
+        instance._outbox_previous_album = stored
+
+
+def _album_payload(instance):
+    payload = {'album': instance.album_id}
+    previous = getattr(instance, '_outbox_previous_album', None)
+    if previous is not None:
+        payload['previous_album'] = previous
+    return payload
+
+
+def _song_saved(sender, instance, created, **kwargs):
+    record('song', instance.pk, 'create' if created else 'update', **_album_payload(instance))
+
+
+def _song_deleted(sender, instance, **kwargs):
+    record('song', instance.pk, 'delete', album=instance.album_id)
+
+
+def _rating_saved(sender, instance, created, **kwargs):
+    record('rating', instance.pk, 'create' if created else 'update',
+           song=instance.song_id, **_album_payload(instance))
+
+
+def _rating_deleted(sender, instance, **kwargs):
+    record('rating', instance.pk, 'delete', album=instance.album_id, song=instance.song_id)
+
+
+def connect_signals():
+    """
+    Called from DottifyConfig.ready().
+    """
+    post_save.connect(_playlist_saved, sender=Playlist, dispatch_uid='outbox_playlist_saved')
+    pre_delete.connect(_playlist_deleting, sender=Playlist, dispatch_uid='outbox_playlist_deleting')
+    post_delete.connect(_playlist_deleted, sender=Playlist, dispatch_uid='outbox_playlist_deleted')
+    m2m_changed.connect(_playlist_songs_changed, sender=Playlist.songs.through,
+                        dispatch_uid='outbox_playlist_songs')
+    pre_save.connect(_album_changing, sender=Song, dispatch_uid='outbox_song_saving')
+    post_save.connect(_song_saved, sender=Song, dispatch_uid='outbox_song_saved')
+    post_delete.connect(_song_deleted, sender=Song, dispatch_uid='outbox_song_deleted')
+    pre_save.connect(_album_changing, sender=Rating, dispatch_uid='outbox_rating_saving')
+    post_save.connect(_rating_saved, sender=Rating, dispatch_uid='outbox_rating_saved')
+    post_delete.connect(_rating_deleted, sender=Rating, dispatch_uid='outbox_rating_deleted')
+
+
+def refresh_album_stats(album_ids):
+    """
+    Recompute AlbumStats for `album_ids` from Rating and the playlist table.
+    """
+    album_ids = set(Album.objects.filter(id__in=album_ids).values_list('id', flat=True))
+    if not album_ids:
+        return
+    ratings = {
+        row['album']: row
+        for row in Rating.objects.filter(album_id__in=album_ids, value__isnull=False)
+        .values('album')
+        .annotate(n=Count('id'), total=Sum('value'))
+    }
+    playlists = dict(
+        Playlist.songs.through.objects.filter(song__album_id__in=album_ids)
+        .values('song__album_id')
+        .annotate(n=Count('playlist_id', distinct=True))
+        .values_list('song__album_id', 'n')
+    )
+    AlbumStats.objects.filter(album_id__in=album_ids).delete()
+    AlbumStats.objects.bulk_create([
+        AlbumStats(
+            album_id=album_id,
+            rating_count=ratings.get(album_id, {}).get('n', 0),
+            rating_total=ratings.get(album_id, {}).get('total') or 0,
+            playlist_count=playlists.get(album_id, 0),
+        )
+        for album_id in album_ids
+    ])
+
+
+def apply_events(events):
+    """
+    Refresh everything derived from `events`. Safe to call more than once
+    for the same events.
+    """
+    playlists, songs, albums = set(), set(), set()
+    for event in events:
+        payload = event.payload
+        if event.model == 'playlist':
+            playlists.add(event.object_id)
+            songs.update(payload.get('songs', []))
+        elif event.model == 'song':
+            songs.add(event.object_id)
+            albums.update((payload.get('album'), payload.get('previous_album')))
+        elif event.model == 'rating':
+            albums.update((payload.get('album'), payload.get('previous_album')))
+    albums.discard(None)
+
+    # Every remaining member of a changed playlist now co-occurs with
+    # different songs, not just the ones added or removed.
+    if playlists:
+        songs.update(
+            Playlist.songs.through.objects.filter(playlist_id__in=playlists)
+            .values_list('song_id', flat=True)
+        )
+    if songs:
+        albums.update(
+            Song.objects.filter(id__in=songs).values_list('album_id', flat=True)
+        )
+
+    refresh_neighbours(SONG, songs)
+    refresh_neighbours(ALBUM, albums)
+    refresh_album_stats(albums)
+    return {'playlists': len(playlists), 'songs': len(songs), 'albums': len(albums)}
+
+
+def consume(name=CONSUMER_NAME, batch_size=BATCH_SIZE):
+    """
+    Apply every event after the checkpoint of consumer `name`, one batch
+    per transaction. Returns the number of events applied.
+    """
+    applied = 0
+    while True:
+        with transaction.atomic():
+            checkpoint, _ = ConsumerCheckpoint.objects.select_for_update().get_or_create(name=name)
+            events = list(
+                ChangeEvent.objects.filter(id__gt=checkpoint.last_event_id).order_by('id')[:batch_size]
+            )
+            if not events:
+                return applied
+            apply_events(events)
+            checkpoint.last_event_id = events[-1].id
+            checkpoint.save(update_fields=['last_event_id', 'updated_at'])
+        applied += len(events)
+
+
+def prune(name=CONSUMER_NAME):
+    """
+    Delete events that consumer `name` has already applied.
+    """
+    checkpoint = ConsumerCheckpoint.objects.filter(name=name).first()
+    if checkpoint is None:
+        return 0
+    deleted, _ = ChangeEvent.objects.filter(id__lte=checkpoint.last_event_id).delete()
+    return deleted
@@ -0,0 +1,277 @@
+"""
+MessagePack encoding for the compact API representation.
+
+A small implementation of the MessagePack format (https://msgpack.org)
+covering the types API data is made of: nil, booleans, integers up to 64
+bits, float64, UTF-8 strings, binary, arrays and maps. Any MessagePack
+library can read what packb() writes, and unpackb() reads their output
+for those types; extension types are rejected.
+
+to_columns() turns a list of objects sharing the same keys into one
+array per key, recursively for nested lists of objects, which is what
+the `layout=columns` variant of the media type sends: a page of songs
+becomes parallel arrays of ids, titles, lengths and album ids, with
+every key written once instead of once per row.
+"""
+import struct
+
+from rest_framework.utils.encoders import JSONEncoder
+
+_encoder = JSONEncoder()
+
+_pack_double = struct.Struct('>d').pack
+
+
+def packb(obj):
+    """
+    `obj` as MessagePack bytes. Values that are not plain data (dates,
+    decimals, lazy strings, ...) are converted as DRF's JSON encoder
+    would convert them.
+    """
+    out = bytearray()
+    _pack(obj, out)
+    return bytes(out)
+
+
+def _pack_length(out, n, fix_tag, fix_max, tags):
+    if n <= fix_max:
+        out.append(fix_tag | n)
+    elif tags[0] is not None and n < 0x100:
+        out.append(tags[0])
+        out.append(n)
+    elif n < 0x10000:
+        out.append(tags[1])
+        out += n.to_bytes(2, 'big')
+    elif n < 0x100000000:
+        out.append(tags[2])
+        out += n.to_bytes(4, 'big')
+    else:
+        raise ValueError("object too large for MessagePack")
+
+
+def _pack_none(obj, out):
+    out.append(0xc0)
+
+
+def _pack_bool(obj, out):
+    out.append(0xc3 if obj else 0xc2)
+
+
+def _pack_int(obj, out):
+    if 0 <= obj < 0x80 or -0x20 <= obj < 0:
+        out.append(obj & 0xff)
+    elif obj >= 0:
+        for tag, size in ((0xcc, 1), (0xcd, 2), (0xce, 4), (0xcf, 8)):
+            if obj < 1 << (8 * size):
+                out.append(tag)
+                out += obj.to_bytes(size, 'big')
+                return
+        raise OverflowError("integer too large for MessagePack")
+    else:
+        for tag, size in ((0xd0, 1), (0xd1, 2), (0xd2, 4), (0xd3, 8)):
+            if obj >= -(1 << (8 * size - 1)):
+                out.append(tag)
+                out += obj.to_bytes(size, 'big', signed=True)
+                return
+        raise OverflowError("integer too small for MessagePack")
+
+
+def _pack_float(obj, out):
+    out.append(0xcb)
+    out += _pack_double(obj)
+
+
+def _pack_str(obj, out):
+    data = obj.encode()
+    n = len(data)
+    if n < 32:
+        out.append(0xa0 | n)
+    else:
+        _pack_length(out, n, 0xa0, 31, (0xd9, 0xda, 0xdb))
+    out += data
+
+
+def _pack_bin(obj, out):
+    data = bytes(obj)
+    _pack_length(out, len(data), 0, -1, (0xc4, 0xc5, 0xc6))
+    out += data
+
+
+def _pack_array(obj, out):
+    _pack_length(out, len(obj), 0x90, 15, (None, 0xdc, 0xdd))
+    for item in obj:
+        _PACKERS.get(type(item), _pack_other)(item, out)
+
+
+def _pack_map(obj, out):
+    _pack_length(out, len(obj), 0x80, 15, (None, 0xde, 0xdf))
+    for key, value in obj.items():
+        _PACKERS.get(type(key), _pack_other)(key, out)
+        _PACKERS.get(type(value), _pack_other)(value, out)
+
+
+# Exact types first, by a dict lookup; subclasses (ReturnDict,
+# ReturnList, ...) and everything else go through _pack_other.
+_PACKERS = {
+    type(None): _pack_none,
+    bool: _pack_bool,
+    int: _pack_int,
+    float: _pack_float,
+    str: _pack_str,
+    bytes: _pack_bin,
+    bytearray: _pack_bin,
+    memoryview: _pack_bin,
+    list: _pack_array,
+    tuple: _pack_array,
+    dict: _pack_map,
+}
+
+
+def _pack_other(obj, out):
+    for base in type(obj).__mro__[1:]:
+        if base in _PACKERS:
+            return _PACKERS[base](obj, out)
+    _pack(_encoder.default(obj), out)
+
+
+def _pack(obj, out):
+    _PACKERS.get(type(obj), _pack_other)(obj, out)
+
+
+# tag -> (struct format, size) for fixed-size scalars.
+_SCALARS = {
+    0xca: ('>f', 4), 0xcb: ('>d', 8),
+    0xcc: ('>B', 1), 0xcd: ('>H', 2), 0xce: ('>I', 4), 0xcf: ('>Q', 8),
+    0xd0: ('>b', 1), 0xd1: ('>h', 2), 0xd2: ('>i', 4), 0xd3: ('>q', 8),
+}
+# tag -> (kind, length bytes) for variable-size values.
+_SIZED = {
+    0xc4: ('bin', 1), 0xc5: ('bin', 2), 0xc6: ('bin', 4),
+    0xd9: ('str', 1), 0xda: ('str', 2), 0xdb: ('str', 4),
+    0xdc: ('array', 2), 0xdd: ('array', 4),
+    0xde: ('map', 2), 0xdf: ('map', 4),
+}
+
+
+def unpackb(data):
+    """
+    Decode one MessagePack value occupying all of `data`. Raises
+    ValueError for malformed, truncated or unsupported input.
+    """
+    data = bytes(data)
+    try:
+        obj, end = _unpack(data, 0)
+    except (IndexError, RecursionError, struct.error, UnicodeDecodeError) as exc:
+        raise ValueError(f"invalid MessagePack data: {exc}")
+    if end != len(data):
+        raise ValueError("invalid MessagePack data: trailing bytes")
+    return obj
+
+
+def _unpack(data, i):
+    tag = data[i]
+    i += 1
+    if tag < 0x80:
+        return tag, i
+    if tag >= 0xe0:
+        return tag - 0x100, i
+    if tag < 0x90:
+        return _unpack_map(data, i, tag & 0x0f)
+    if tag < 0xa0:
+        return _unpack_array(data, i, tag & 0x0f)
+    if tag < 0xc0:
+        return _unpack_str(data, i, tag & 0x1f)
+    if tag == 0xc0:
+        return None, i
+    if tag == 0xc2:
+        return False, i
+    if tag == 0xc3:
+        return True, i
+    if tag in _SCALARS:
+        fmt, size = _SCALARS[tag]
+        return struct.unpack_from(fmt, data, i)[0], i + size
+    if tag in _SIZED:
+        kind, size = _SIZED[tag]
+        if len(data) < i + size:
+            raise IndexError("truncated length")
+        n = int.from_bytes(data[i:i + size], 'big')
+        i += size
+        if kind == 'str':
+            return _unpack_str(data, i, n)
+        if kind == 'bin':
+            if len(data) < i + n:
+                raise IndexError("truncated binary")
+            return data[i:i + n], i + n
+        if kind == 'array':
+            return _unpack_array(data, i, n)
+        return _unpack_map(data, i, n)
+    raise ValueError(f"invalid MessagePack data: unsupported type 0x{tag:02x}")
+
+
+def _unpack_str(data, i, n):
+    if len(data) < i + n:
+        raise IndexError("truncated string")
+    return data[i:i + n].decode(), i + n
+
+
+def _unpack_array(data, i, n):
+    items = []
+    for _ in range(n):
+        item, i = _unpack(data, i)
+        items.append(item)
+    return items, i
+
+
+def _unpack_map(data, i, n):
+    result = {}
+    for _ in range(n):
+        key, i = _unpack(data, i)
+        value, i = _unpack(data, i)
+        try:
+            result[key] = value
+        except TypeError:
+            raise ValueError("invalid MessagePack data: unhashable map key")
+    return result, i
+
+
+def is_rows(value):
+    return isinstance(value, list) and all(
+        isinstance(row, dict) and row.keys() == value[0].keys() for row in value
+    )
+
+
+def to_columns(rows):
+    """
+    [{'id': 1, 'title': 'a'}, {'id': 2, 'title': 'b'}] ->
+    {'id': [1, 2], 'title': ['a', 'b']}. A key whose values are all lists
+    of objects (song_set, say) holds one column map per row. An empty
+    list becomes {}.
+    """
+    if not rows:
+        return {}
+    columns = {key: [row[key] for row in rows] for key in rows[0]}
+    for key, values in columns.items():
+        if all(is_rows(value) for value in values) and any(values):
+            columns[key] = [to_columns(value) for value in values]
+    return columns
+
+
+def from_columns(columns):
+    """
+    Inverse of to_columns(): every map of equal-length arrays, top-level
+    or nested, becomes a list of objects again.
+    """
+    if not columns:
+        return []
+    names = list(columns)
+    rows = [dict(zip(names, values)) for values in zip(*columns.values())]
+    for name in names:
+        values = columns[name]
+        if values and all(_is_columns(value) for value in values):
+            for row in rows:
+                row[name] = from_columns(row[name])
+    return rows
+
+
+def _is_columns(value):
+    return isinstance(value, dict) and all(isinstance(v, list) for v in value.values())
@@ -0,0 +1,317 @@
+"""
+Play events: ingestion into append-only segment files and daily
+roll-ups.
+
+POST /api/plays/ takes batches of (user, song, timestamp, duration)
+events. Each event is packed into a fixed-width RECORD and handed to the
+process's PlayWriter, which buffers records per UTC day and appends them
+to that day's segment file, under settings.DOTTIFY_PLAYS_DIR/<day>/,
+once PLAY_FLUSH_BYTES have built up or PLAY_FLUSH_INTERVAL has passed.
+Every process writes its own segments, so writers never share a file or
+a lock, and nothing is ever rewritten: a segment only grows until it
+reaches PLAY_SEGMENT_BYTES and the next one is started. A reader takes
+the complete records of each segment and ignores a torn last one.
+
+Events still buffered when a process dies are lost, up to
+PLAY_FLUSH_INTERVAL's worth; clients are answered 202 Accepted, not
+201.
+
+The roll_up_plays command reads a day's segments and rewrites that
+day's SongDailyPlays and AlbumDailyPlays rows and unique listener
+sketches (dottify/audience.py), recording in PlayRollup how many events
+it read. Days whose segments have grown since (late events included)
+are rolled up again, so it can run as often as the daily numbers need
+to be fresh.
+"""
+import atexit
+import os
+import socket
+import struct
+import threading
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection, transaction
+from rest_framework.exceptions import ValidationError
+
+from . import audience
+from .audience import HyperLogLog
+from .models import AlbumDailyPlays, PlayRollup, Song, SongDailyPlays
+
+# user (0 when anonymous), song, timestamp in microseconds since the
+# epoch, duration in milliseconds.
+RECORD = struct.Struct('<qqqi')
+# User and song ids must fit the record's signed 64-bit fields.
+ID_LIMIT = 1 << 63
+
+PLAY_FLUSH_BYTES = 1 << 20
+PLAY_FLUSH_INTERVAL = 1.0
+PLAY_SEGMENT_BYTES = 64 << 20
+PLAY_BATCH_LIMIT = 10_000
+# Events older than this, or this far in the future, are refused.
+PLAY_MAX_AGE = timedelta(days=7)
+PLAY_MAX_SKEW = timedelta(minutes=5)
+PLAY_MAX_DURATION = 24 * 60 * 60
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+DAY_MICROS = 24 * 60 * 60 * 1_000_000
+SEGMENT_SUFFIX = '.seg'
+
+# Song ids looked up per query during a roll-up.
+ROLLUP_CHUNK_SIZE = 500
+
+
+def plays_dir():
+    return Path(settings.DOTTIFY_PLAYS_DIR)
+
+
+def day_of(micros):
+    return EPOCH.date() + timedelta(days=micros // DAY_MICROS)
+
+
+def _micros(value):
+    if type(value) is str:
+        moment = datetime.fromisoformat(value)
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=dt_timezone.utc)
+        return (moment - EPOCH) // timedelta(microseconds=1)
+    if type(value) in (int, float):
+        return round(value * 1_000_000)
+    raise TypeError(value)
+
+
+def parse_events(events, now=None):
+    """
+    Check and pack a batch of event objects. Returns (count, {day number:
+    packed records}); raises ValidationError naming the first bad event.
+    Timestamps are ISO 8601 strings (UTC unless they say otherwise) or
+    seconds since the epoch; durations are seconds.
+    """
+    if not isinstance(events, list):
+        raise ValidationError({'events': "Expected a list of events."})
+    if len(events) > PLAY_BATCH_LIMIT:
+        raise ValidationError({'events': f"At most {PLAY_BATCH_LIMIT} events per request."})
+    now = (now or datetime.now(dt_timezone.utc)) - EPOCH
+    earliest = (now - PLAY_MAX_AGE) // timedelta(microseconds=1)
+    latest = (now + PLAY_MAX_SKEW) // timedelta(microseconds=1)
+    pack = RECORD.pack
+    by_day = {}
+    for i, event in enumerate(events):
+        try:
+            user = event.get('user') or 0
+            song = event['song']
+            micros = _micros(event['timestamp'])
+            duration = event.get('duration', 0)
+            valid = (
+                type(user) is int and 0 <= user < ID_LIMIT
+                and type(song) is int and 0 < song < ID_LIMIT
+                and earliest <= micros <= latest
+                and type(duration) in (int, float) and 0 <= duration <= PLAY_MAX_DURATION
+            )
+        except (AttributeError, KeyError, TypeError, ValueError, OverflowError):
+            valid = False
+        if not valid:
+            raise ValidationError({'events': f"Event {i} is not a valid play from the last "
+                                             f"{PLAY_MAX_AGE.days} days."})
+        day = micros // DAY_MICROS
+        records = by_day.get(day)
+        if records is None:
+            records = by_day[day] = bytearray()
+        records += pack(user, song, micros, round(duration * 1000))
+    return len(events), by_day
+
+
+class PlayWriter:
+    """
+    Per-process buffer in front of the day segments. append() is cheap
+    and thread-safe; a daemon thread flushes every PLAY_FLUSH_INTERVAL,
+    and append() flushes in the caller once PLAY_FLUSH_BYTES are waiting.
+    """
+    def __init__(self, flush_bytes=PLAY_FLUSH_BYTES, flush_interval=PLAY_FLUSH_INTERVAL,
+                 segment_bytes=PLAY_SEGMENT_BYTES):
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self.segment_bytes = segment_bytes
+        self._reset()
+
+    def _reset(self):
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.buffers = {}
+        self.buffered = 0
+        self.segments = {}   # day directory -> [path, bytes written]
+        self.thread = None
+
+    def append(self, by_day):
+        with self.lock:
+            for day, records in by_day.items():
+                buffer = self.buffers.get(day)
+                if buffer is None:
+                    buffer = self.buffers[day] = bytearray()
+                buffer += records
+                self.buffered += len(records)
+            full = self.buffered >= self.flush_bytes
+            if self.thread is None and self.flush_interval:
+                self.thread = threading.Thread(target=self._run, name='play-writer', daemon=True)
+                self.thread.start()
+        if full:
+            self.flush()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def _segment(self, day, size):
+        directory = plays_dir() / day_of(day * DAY_MICROS).isoformat()
+        segment = self.segments.get(directory)
+        if segment is None or segment[1] + size > self.segment_bytes:
+            directory.mkdir(parents=True, exist_ok=True)
+            name = f'{socket.gethostname()}-{os.getpid()}-{time.time_ns()}{SEGMENT_SUFFIX}'
+            segment = self.segments[directory] = [directory / name, 0]
+        return segment
+
+    def flush(self):
+        """
+        Append everything buffered to the segments. Returns the number
+        of events written.
+        """
+        with self.flush_lock:
+            with self.lock:
+                buffers, self.buffers, self.buffered = self.buffers, {}, 0
+            for day, records in sorted(buffers.items()):
+                segment = self._segment(day, len(records))
+                with open(segment[0], 'ab') as f:
+                    f.write(records)
+                segment[1] += len(records)
+        return sum(map(len, buffers.values())) // RECORD.size
+
+
+writer = PlayWriter()
+atexit.register(writer.flush)
+# A forked worker starts with an empty buffer, no flush thread and its
+# own segments.
+os.register_at_fork(after_in_child=writer._reset)
+
+
+def days():
+    """
+    The days that have segments, oldest first.
+    """
+    root = plays_dir()
+    if not root.is_dir():
+        return []
+    return sorted(date.fromisoformat(entry.name) for entry in root.iterdir() if entry.is_dir())
+
+
+def segment_paths(day):
+    directory = plays_dir() / day.isoformat()
+    if not directory.is_dir():
+        return []
+    return sorted(path for path in directory.iterdir() if path.name.endswith(SEGMENT_SUFFIX))
+
+
+def stored_events(day):
+    """
+    Complete records in the day's segments, from their sizes alone.
+    """
+    return sum(path.stat().st_size // RECORD.size for path in segment_paths(day))
+
+
+def read_events(day):
+    """
+    Every complete (user, song, micros, duration_ms) record of `day`.
+    """
+    for path in segment_paths(day):
+        data = path.read_bytes()
+        yield from RECORD.iter_unpack(memoryview(data)[:len(data) - len(data) % RECORD.size])
+
+
+def tail(offsets, since=None):
+    """
+    The complete records appended to the segments since `offsets`
+    ({'<day>/<segment>': bytes read}), which is advanced as they are
+    read. For consumers that keep up with ingestion rather than waiting
+    for a day's roll-up; days before `since` are skipped and their
+    offsets dropped.
+    """
+    for key in [key for key in offsets if since and date.fromisoformat(key.split('/')[0]) < since]:
+        del offsets[key]
+    for day in days():
+        if since and day < since:
+            continue
+        for path in segment_paths(day):
+            key = f'{day.isoformat()}/{path.name}'
+            offset = offsets.get(key, 0)
+            with open(path, 'rb') as f:
+                f.seek(offset)
+                data = f.read()
+            complete = len(data) - len(data) % RECORD.size
+            if complete:
+                offsets[key] = offset + complete
+                yield from RECORD.iter_unpack(memoryview(data)[:complete])
+
+
+def pending_days():
+    """
+    Days whose segments hold events the last roll-up did not read.
+    """
+    rolled = dict(PlayRollup.objects.values_list('day', 'events'))
+    return [day for day in days() if stored_events(day) != rolled.get(day)]
+
+
+def _insert(model, key, rows):
+    opts = model._meta
+    qn = connection.ops.quote_name
+    columns = [opts.get_field(name).column for name in (key, 'day', 'plays', 'seconds')]
+    sql = 'INSERT INTO {} ({}) VALUES (%s, %s, %s, %s)'.format(
+        qn(opts.db_table), ', '.join(qn(c) for c in columns)
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def roll_up(day):
+    """
+    Rewrite the SongDailyPlays and AlbumDailyPlays rows of `day` from its
+    segments, and its unique listener sketches (dottify/audience.py).
+    Plays of songs that no longer exist are dropped. Returns the number
+    of events read.
+    """
+    plays = Counter()
+    millis = Counter()
+    listeners = {}
+    events = 0
+    for user, song, _, duration in read_events(day):
+        plays[song] += 1
+        millis[song] += duration
+        events += 1
+        if user:
+            sketch = listeners.get(song)
+            if sketch is None:
+                sketch = listeners[song] = HyperLogLog()
+            sketch.add(user)
+
+    song_ids = sorted(plays)
+    albums = {}
+    for start in range(0, len(song_ids), ROLLUP_CHUNK_SIZE):
+        chunk = song_ids[start:start + ROLLUP_CHUNK_SIZE]
+        albums.update(Song.objects.filter(id__in=chunk).values_list('id', 'album_id'))
+    album_plays = Counter()
+    album_millis = Counter()
+    for song, album in albums.items():
+        album_plays[album] += plays[song]
+        album_millis[album] += millis[song]
+
+    with transaction.atomic():
+        SongDailyPlays.objects.filter(day=day).delete()
+        AlbumDailyPlays.objects.filter(day=day).delete()
+        _insert(SongDailyPlays, 'song', [(song, day, plays[song], millis[song] // 1000) for song in sorted(albums)])
+        _insert(AlbumDailyPlays, 'album',
+                [(album, day, album_plays[album], album_millis[album] // 1000) for album in sorted(album_plays)])
+        audience.record_listeners(day, {song: listeners[song] for song in albums if song in listeners}, albums)
+        PlayRollup.objects.update_or_create(day=day, defaults={'events': events})
+    return events
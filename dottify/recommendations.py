@@ -0,0 +1,230 @@
+"""
+"Similar albums/songs" from playlist co-occurrence.
+
+Two items are similar when they keep turning up in the same playlists.
+For every pair that shares at least one playlist we count the shared
+playlists c(a, b) and score it with cosine similarity
+
+    score(a, b) = c(a, b) / sqrt(n(a) * n(b))
+
+where n(x) is the number of playlists containing x. Only the best TOP_K
+neighbours per item are kept, in AlbumNeighbour / SongNeighbour, so the
+API serves them with one indexed lookup.
+
+build_similarity() aggregates in SQL, one chunk of item ids at a time:
+a single INSERT ... SELECT counts the shared playlists of every pair
+whose first item is in the chunk, scores them and keeps the top K per
+item with a window function. Nothing per pair or per song is held in
+Python, and SQLite's working set is bounded by the pairs of one chunk
+of items rather than of the whole catalogue. Playlists longer than
+MAX_PLAYLIST_ITEMS still count towards n(x) but contribute no pairs:
+they add O(n^2) pairs and say little about any particular pair.
+
+refresh_neighbours() recomputes the rows of a few items straight from
+the join table; the outbox consumer (dottify/outbox.py) uses it to keep
+the tables current between full rebuilds.
+"""
+import heapq
+from collections import Counter, defaultdict
+from itertools import groupby, islice
+from math import sqrt
+
+from django.db import connection, transaction
+from django.db.models import Count, Subquery
+
+from .models import Album, AlbumNeighbour, Playlist, Song, SongNeighbour
+
+TOP_K = 20
+# Albums or songs whose neighbours build_similarity() ranks per statement.
+ITEM_CHUNK_SIZE = 2000
+MAX_PLAYLIST_ITEMS = 500
+WRITE_BATCH_SIZE = 2000
+REFRESH_CHUNK_SIZE = 500
+
+# Item kinds: the join-table lookup that gives the item of a playlist
+# entry, and the table its neighbours live in.
+SONG = ('song_id', SongNeighbour, 'song')
+ALBUM = ('song__album_id', AlbumNeighbour, 'album')
+
+
+def _rank(candidates, k):
+    """
+    Best k of (neighbour, score) pairs: highest score first, lower id on ties.
+    """
+    return heapq.nsmallest(k, candidates, key=lambda pair: (-pair[1], pair[0]))
+
+
+def _write_neighbours(model, field, neighbours, items):
+    """
+    Replace the rows of `model` for `items` with `neighbours`.
+
+    Each item can have K rows, so rows go straight to executemany() in
+    batches rather than through bulk_create(), which spends most of its
+    time building model instances.
+    """
+    model.objects.filter(**{f'{field}__in': items}).delete()
+    opts = model._meta
+    columns = [opts.get_field(name).column for name in (field, 'neighbour', 'rank', 'score')]
+    qn = connection.ops.quote_name
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        qn(opts.db_table), ', '.join(qn(c) for c in columns), ', '.join(['%s'] * len(columns))
+    )
+    rows = (
+        (item, other, rank, score)
+        for item, ranked in neighbours.items()
+        for rank, (other, score) in enumerate(ranked, start=1)
+    )
+    written = 0
+    with connection.cursor() as cursor:
+        while True:
+            batch = list(islice(rows, WRITE_BATCH_SIZE))
+            if not batch:
+                return written
+            cursor.executemany(sql, batch)
+            written += len(batch)
+
+
+# Pairs of one chunk of items, scored and ranked per item. {item_a} and
+# {item_b} are the item column of a playlist entry on either side of the
+# pair and {join_a}, {join_b} the joins they need. Entries are reduced to
+# distinct (playlist, item) rows before pairing, so an album counts once
+# per playlist however many of its songs the playlist holds; the playlist
+# counts n(x) come from the same entries restricted to one item.
+SIMILARITY_SQL = """
+WITH eligible AS (
+    SELECT playlist_id FROM {through} GROUP BY playlist_id HAVING COUNT(*) <= %s
+),
+entries AS (
+    SELECT DISTINCT ta.playlist_id, {item_a} AS item
+    FROM {through} ta {join_a}
+    WHERE {item_a} BETWEEN %s AND %s AND ta.playlist_id IN (SELECT playlist_id FROM eligible)
+),
+others AS (
+    SELECT DISTINCT tb.playlist_id, {item_b} AS item
+    FROM {through} tb {join_b}
+    WHERE tb.playlist_id IN (SELECT playlist_id FROM entries)
+),
+pairs AS (
+    SELECT e.item, o.item AS other, COUNT(*) AS shared
+    FROM entries e JOIN others o ON o.playlist_id = e.playlist_id
+    WHERE o.item != e.item
+    GROUP BY e.item, o.item
+    HAVING COUNT(*) >= %s
+),
+counts AS (
+    SELECT x.item, (
+        SELECT COUNT(DISTINCT ta.playlist_id) FROM {through} ta {join_a} WHERE {item_a} = x.item
+    ) AS n
+    FROM (SELECT item FROM pairs UNION SELECT other FROM pairs) x
+),
+ranked AS (
+    SELECT p.item, p.other, p.shared / SQRT(ca.n * cb.n) AS score
+    FROM pairs p JOIN counts ca ON ca.item = p.item JOIN counts cb ON cb.item = p.other
+)
+INSERT INTO {table} ({columns})
+SELECT item, other, rank, score FROM (
+    SELECT item, other, score, ROW_NUMBER() OVER (PARTITION BY item ORDER BY score DESC, other) AS rank
+    FROM ranked
+)
+WHERE rank <= %s
+"""
+
+
+def _similarity_sql(kind):
+    item_field, model, field = kind
+    qn = connection.ops.quote_name
+    through = qn(Playlist.songs.through._meta.db_table)
+    if item_field == 'song_id':
+        sides = {'item_a': 'ta.song_id', 'item_b': 'tb.song_id', 'join_a': '', 'join_b': ''}
+    else:
+        song = qn(Song._meta.db_table)
+        sides = {
+            'item_a': 'sa.album_id', 'item_b': 'sb.album_id',
+            'join_a': f'JOIN {song} sa ON sa.id = ta.song_id',
+            'join_b': f'JOIN {song} sb ON sb.id = tb.song_id',
+        }
+    opts = model._meta
+    columns = [opts.get_field(name).column for name in (field, 'neighbour', 'rank', 'score')]
+    return SIMILARITY_SQL.format(
+        through=through, table=qn(opts.db_table), columns=', '.join(qn(c) for c in columns), **sides,
+    )
+
+
+def build_similarity(top_k=TOP_K, chunk_size=ITEM_CHUNK_SIZE,
+                     max_items=MAX_PLAYLIST_ITEMS, min_support=1):
+    """
+    Recompute AlbumNeighbour and SongNeighbour from all playlists,
+    `chunk_size` albums or songs per statement.
+
+    Returns a dict of counts for the management command to report.
+    """
+    sizes = Playlist.songs.through.objects.values('playlist_id').annotate(n=Count('song_id'))
+    stats = {
+        'playlists': sizes.count(),
+        'skipped': sizes.filter(n__gt=max_items).count(),
+    }
+    with transaction.atomic(), connection.cursor() as cursor:
+        for kind, items in ((ALBUM, Album.objects), (SONG, Song.objects)):
+            _, model, field = kind
+            model.objects.all().delete()
+            sql = _similarity_sql(kind)
+            last_id = 0
+            while True:
+                ids = list(items.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:chunk_size])
+                if not ids:
+                    break
+                cursor.execute(sql, [max_items, ids[0], ids[-1], min_support, top_k])
+                last_id = ids[-1]
+            stats[f'{field}_rows'] = model.objects.count()
+    return stats
+
+
+def refresh_neighbours(kind, item_ids, top_k=TOP_K, max_items=MAX_PLAYLIST_ITEMS):
+    """
+    Recompute the neighbour rows of `item_ids` (song or album ids, per
+    `kind`) from the current playlists, with the same scoring as
+    build_similarity().
+
+    Only the lists of the given items are rewritten. Other items keep
+    their stored scores until they are touched themselves or the next
+    full rebuild, so scores that depend on a changed n(x) can lag a
+    little.
+    """
+    item_field, model, field = kind
+    item_ids = sorted(set(item_ids))
+    through = Playlist.songs.through
+    for start in range(0, len(item_ids), REFRESH_CHUNK_SIZE):
+        chunk = item_ids[start:start + REFRESH_CHUNK_SIZE]
+        targets = set(chunk)
+        containing = through.objects.filter(**{f'{item_field}__in': chunk}).values('playlist_id')
+        rows = (
+            through.objects.filter(playlist_id__in=Subquery(containing))
+            .order_by('playlist_id')
+            .values_list('playlist_id', item_field)
+        )
+        shared = defaultdict(Counter)
+        for _, group in groupby(rows.iterator(), key=lambda row: row[0]):
+            entries = [item for _, item in group]
+            if len(entries) > max_items:
+                continue
+            items = set(entries)
+            for item in items & targets:
+                shared[item].update(items - {item})
+
+        others = sorted(set().union(targets, *shared.values()))
+        counts = {}
+        for i in range(0, len(others), REFRESH_CHUNK_SIZE):
+            counts.update(
+                through.objects.filter(**{f'{item_field}__in': others[i:i + REFRESH_CHUNK_SIZE]})
+                .values(item_field)
+                .annotate(n=Count('playlist_id', distinct=True))
+                .values_list(item_field, 'n')
+            )
+        neighbours = {
+            item: _rank(
+                ((other, c / sqrt(counts[item] * counts[other])) for other, c in shared[item].items()),
+                top_k,
+            )
+            for item in chunk if shared[item]
+        }
+        _write_neighbours(model, field, neighbours, items=chunk)
@@ -0,0 +1,46 @@
+"""
+Compact binary media type for the catalogue API.
+
+`Accept: application/msgpack` returns the same data as JSON, encoded as
+MessagePack (see dottify/packing.py). Adding `; layout=columns` turns
+list responses into parallel arrays, one per field, which is what the
+mobile clients' bulk catalogue download asks for. Uploads may be sent
+as MessagePack with the same media type.
+"""
+from django.utils.http import parse_header_parameters
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer
+
+from .packing import is_rows, packb, to_columns, unpackb
+
+MSGPACK = 'application/msgpack'
+
+
+def wants_columns(accepted_media_type):
+    _, params = parse_header_parameters(accepted_media_type or '')
+    return params.get('layout') == 'columns'
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = MSGPACK
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if wants_columns(accepted_media_type) and is_rows(data):
+            data = to_columns(data)
+        return packb(data)
+
+
+class MessagePackParser(BaseParser):
+    media_type = MSGPACK
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return unpackb(stream.read() if stream is not None else b'')
+        except ValueError as exc:
+            raise ParseError(f"MessagePack parse error - {exc}")
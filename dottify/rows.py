@@ -0,0 +1,47 @@
+"""
+Lightweight row records for list pages.
+
+A list page only shows a handful of columns, yet a queryset of models
+builds a full instance per row: every field set through the model's
+__init__, plus per-row extras such as the FieldFile wrapper for an
+album's cover. The record types here are namedtuples (so no __dict__ per
+row) naming just the columns a template reads, each mapped to an ORM
+path that may follow a foreign key, and project() fills them straight
+from values_list() in a single query. Records expose `pk` so that
+{% cached_rows %} can key their fragments as it does for models.
+
+Add a column to a record type before using it in a template that
+receives these records: a missing attribute renders as an empty string.
+"""
+from collections import namedtuple
+
+
+def row_type(typename, /, **paths):
+    """
+    A record type with one attribute per keyword, read from the ORM path
+    given as its value. The first attribute is the primary key.
+    """
+    base = namedtuple(typename, paths)
+    return type(typename, (base,), {
+        '__slots__': (),
+        '__doc__': f"{typename}({', '.join(paths)}) from values_list().",
+        'paths': tuple(paths.values()),
+        'pk': property(lambda row: row[0]),
+    })
+
+
+AlbumRow = row_type(
+    'AlbumRow', id='id', title='title', artist_name='artist_name',
+    retail_price='retail_price', updated_at='updated_at',
+)
+SongRow = row_type('SongRow', id='id', title='title')
+PlaylistRow = row_type(
+    'PlaylistRow', id='id', name='name', visibility='visibility', owner_name='owner__display_name',
+)
+
+
+def project(queryset, record):
+    """
+    The rows of `queryset` as a list of `record`s, in one query.
+    """
+    return list(map(record._make, queryset.values_list(*record.paths)))
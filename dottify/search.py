@@ -0,0 +1,206 @@
+"""
+Typo-tolerant search over album titles, album artists and song titles.
+
+Text is normalized as for autocomplete and split into pg_trgm-style
+trigrams, each word padded as "  word ": "Fleetwood Mac" and "Flettwood
+Mac" share 11 of the latter's 14. The SearchTrigram table holds one row
+per (trigram, field, object id), and its index on those columns
+(searchtrigram_posting_idx) is the posting list of each trigram.
+
+A row matches when it contains at least SEARCH_THRESHOLD of the query's
+trigrams, so it must contain at least one of the query's rarest
+len(query) - needed + 1 trigrams. Only those posting lists are read, at
+most SEARCH_POSTING_LIMIT rows each, to collect candidates. Posting list
+lengths (capped at the same limit) are cached for SEARCH_FREQUENCY_TTL;
+a stale length changes which lists are read, not which rows can match.
+The SEARCH_CANDIDATES candidates sharing the most of those trigrams
+are scored from their own postings: rows rank by the share of the
+query's trigrams they contain, then by trigram similarity to their
+whole text. Text is loaded for the results only.
+"""
+import math
+from collections import Counter, namedtuple
+from functools import reduce
+from itertools import islice
+from operator import or_
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+
+from .autocomplete import normalize
+from .models import Album, SearchTrigram, Song
+
+SEARCH_THRESHOLD = 0.5
+SEARCH_POSTING_LIMIT = 2000
+SEARCH_CANDIDATES = 200
+SEARCH_FREQUENCY_TTL = 60 * 60
+SEARCH_LIMIT = 20
+ALL_FIELDS = (SearchTrigram.ALBUM_TITLE, SearchTrigram.ALBUM_ARTIST, SearchTrigram.SONG_TITLE)
+
+# SearchTrigram.field -> (model, attribute, API name)
+FIELDS = {
+    SearchTrigram.ALBUM_TITLE: (Album, 'title', 'album_title'),
+    SearchTrigram.ALBUM_ARTIST: (Album, 'artist_name', 'album_artist'),
+    SearchTrigram.SONG_TITLE: (Song, 'title', 'song_title'),
+}
+
+Match = namedtuple('Match', 'field object_id text score')
+
+
+def trigrams(text):
+    grams = set()
+    for word in normalize(text).split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def _frequencies(grams, fields):
+    """
+    {trigram: number of postings in `fields`, up to SEARCH_POSTING_LIMIT}.
+    """
+    keys = {f"search-df:{'-'.join(map(str, fields))}:{gram.encode().hex()}": gram for gram in grams}
+    found = {keys[key]: n for key, n in cache.get_many(keys).items()}
+    missing = {}
+    postings = SearchTrigram.objects.filter(field__in=fields)
+    for key, gram in keys.items():
+        if gram not in found:
+            found[gram] = missing[key] = postings.filter(trigram=gram)[:SEARCH_POSTING_LIMIT].count()
+    cache.set_many(missing, SEARCH_FREQUENCY_TTL)
+    return found
+
+
+def search(query, fields=ALL_FIELDS, limit=SEARCH_LIMIT):
+    """
+    Best matches for `query` in `fields`, as Match tuples with score
+    being the share of the query's trigrams found in the text.
+    """
+    query_grams = trigrams(query)
+    if not query_grams:
+        return []
+    postings = SearchTrigram.objects.filter(field__in=fields)
+    frequency = _frequencies(query_grams, fields)
+    needed = max(1, math.ceil(SEARCH_THRESHOLD * len(query_grams)))
+    probe = sorted(query_grams, key=lambda gram: (frequency[gram], gram))[:len(query_grams) - needed + 1]
+
+    # Lists known to be short are read in one query, long ones a slice each.
+    short = [gram for gram in probe if frequency[gram] < SEARCH_POSTING_LIMIT]
+    shared = Counter(postings.filter(trigram__in=short).values_list('field', 'object_id'))
+    for gram in probe:
+        if gram not in short:
+            shared.update(postings.filter(trigram=gram).values_list('field', 'object_id')[:SEARCH_POSTING_LIMIT])
+
+    candidates = sorted(shared, key=lambda ref: (-shared[ref], ref))[:SEARCH_CANDIDATES]
+    if not candidates:
+        return []
+    ids = {}
+    for field, object_id in candidates:
+        ids.setdefault(field, []).append(object_id)
+    grams = {ref: set() for ref in candidates}
+    rows = SearchTrigram.objects.filter(
+        reduce(or_, (Q(field=field, object_id__in=object_ids) for field, object_ids in ids.items()))
+    )
+    for field, object_id, gram in rows.values_list('field', 'object_id', 'trigram'):
+        grams[(field, object_id)].add(gram)
+
+    scored = []
+    for ref, row_grams in grams.items():
+        common = len(query_grams & row_grams)
+        coverage = common / len(query_grams)
+        if coverage >= SEARCH_THRESHOLD:
+            scored.append((-coverage, -common / len(query_grams | row_grams), ref))
+    scored.sort()
+    best = [(ref, -coverage) for coverage, _, ref in scored[:limit]]
+
+    texts = {}
+    for field in {field for (field, _), _ in best}:
+        model, attribute, _ = FIELDS[field]
+        object_ids = [object_id for (f, object_id), _ in best if f == field]
+        texts.update(((field, object_id), text) for object_id, text
+                     in model.objects.filter(id__in=object_ids).values_list('id', attribute))
+    return [Match(*ref, texts[ref], round(coverage, 3)) for ref, coverage in best if ref in texts]
+
+
+def search_albums(query, limit=SEARCH_LIMIT):
+    """
+    Albums whose title or artist best match `query`, best first.
+    """
+    matches = search(query, (SearchTrigram.ALBUM_TITLE, SearchTrigram.ALBUM_ARTIST), limit=SEARCH_CANDIDATES)
+    ids = list(dict.fromkeys(match.object_id for match in matches))[:limit]
+    albums = Album.objects.in_bulk(ids)
+    return [albums[i] for i in ids if i in albums]
+
+
+def index_text(field, object_id, text):
+    """
+    Bring the postings of one field of one row in line with `text`.
+    """
+    wanted = trigrams(text)
+    rows = SearchTrigram.objects.filter(field=field, object_id=object_id)
+    existing = set(rows.values_list('trigram', flat=True))
+    if existing - wanted:
+        rows.filter(trigram__in=existing - wanted).delete()
+    SearchTrigram.objects.bulk_create(
+        [SearchTrigram(trigram=gram, field=field, object_id=object_id) for gram in wanted - existing]
+    )
+
+
+def rebuild(batch_size=5000):
+    """
+    Re-create every posting, for after bulk writes that sent no signals.
+    Returns the number of postings written.
+
+    As in recommendations._write_neighbours(), rows go straight to
+    executemany() rather than through bulk_create(). Inserting millions
+    of rows into the trigram-ordered index is mostly random page writes,
+    so the indexes are dropped for the load and built again afterwards
+    in one sorted pass each.
+    """
+    opts = SearchTrigram._meta
+    qn = connection.ops.quote_name
+    columns = [opts.get_field(name).column for name in ('trigram', 'field', 'object_id')]
+    sql = 'INSERT INTO {} ({}) VALUES (%s, %s, %s)'.format(
+        qn(opts.db_table), ', '.join(qn(c) for c in columns)
+    )
+    written = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        SearchTrigram.objects.all().delete()
+        for index in opts.indexes:
+            cursor.execute(f'DROP INDEX {qn(index.name)}')
+        for field, (model, attribute, _) in FIELDS.items():
+            rows = (
+                (gram, field, object_id)
+                for object_id, text in model.objects.values_list('id', attribute).iterator(chunk_size=batch_size)
+                for gram in trigrams(text)
+            )
+            while batch := list(islice(rows, batch_size)):
+                cursor.executemany(sql, batch)
+                written += len(batch)
+        for index in opts.indexes:
+            cursor.execute('CREATE INDEX {} ON {} ({})'.format(
+                qn(index.name), qn(opts.db_table), ', '.join(qn(opts.get_field(name).column) for name in index.fields)
+            ))
+    return written
+
+
+def _saved(sender, instance, update_fields=None, **kwargs):
+    for field, (model, attribute, _) in FIELDS.items():
+        if model is sender and (update_fields is None or attribute in update_fields):
+            index_text(field, instance.pk, getattr(instance, attribute))
+
+
+def _deleted(sender, instance, **kwargs):
+    fields = [field for field, (model, _, _) in FIELDS.items() if model is sender]
+    SearchTrigram.objects.filter(field__in=fields, object_id=instance.pk).delete()
+
+
+def connect_signals():
+    """
+    Called from DottifyConfig.ready().
+    """
+    for model in (Album, Song):
+        name = model._meta.model_name
+        post_save.connect(_saved, sender=model, dispatch_uid=f'search_{name}_saved')
+        post_delete.connect(_deleted, sender=model, dispatch_uid=f'search_{name}_deleted')
@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from .models import Album, Song, Playlist, DottifyUser
+from .models import Album, Song, Playlist, DottifyUser, Comment, AlbumNeighbour
+from .smart_playlists import parse_rules
 
 
 class SongSerializer(serializers.ModelSerializer):
@@ -41,7 +42,8 @@ class PlaylistSerializer(serializers.ModelSerializer):
 
     - owner is a foreign key to DottifyUser (not auth.User) so we can
       expose display names if needed elsewhere.
-    - songs is a list of Song IDs (writeable).
+    - songs is a list of Song IDs (writeable), except on smart playlists,
+      whose songs come from their rules (see dottify/smart_playlists.py).
     """
     owner = serializers.PrimaryKeyRelatedField(queryset=DottifyUser.objects.all())
     songs = serializers.PrimaryKeyRelatedField(
@@ -52,7 +54,18 @@ class PlaylistSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Playlist
-        fields = ['id', 'songs', 'owner', 'name', 'created_at', 'visibility']
+        fields = ['id', 'songs', 'owner', 'name', 'created_at', 'visibility', 'rules']
+
+    def validate_rules(self, value):
+        if value is not None:
+            parse_rules(value)
+        return value
+
+    def validate(self, attrs):
+        rules = attrs['rules'] if 'rules' in attrs else getattr(self.instance, 'rules', None)
+        if rules is not None and attrs.pop('songs', None):
+            raise serializers.ValidationError({'songs': "A smart playlist's songs come from its rules."})
+        return attrs
 
 
 class DottifyUserSerializer(serializers.ModelSerializer):
@@ -64,3 +77,46 @@ class DottifyUserSerializer(serializers.ModelSerializer):
     class Meta:
         model = DottifyUser
         fields = ['id', 'user', 'display_name']
+
+
+class CommentSerializer(serializers.ModelSerializer):
+    """
+    Read-only serialiser for threaded comments.
+
+    display_name comes from the select_related author so a page of
+    comments costs one query; reply_count is annotated by
+    comments.comment_threads()/comment_replies().
+    """
+    display_name = serializers.CharField(source='user.display_name', read_only=True, default=None)
+    reply_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Comment
+        fields = [
+            'id',
+            'user',
+            'display_name',
+            'playlist',
+            'song',
+            'parent',
+            'text',
+            'created_at',
+            'reply_count',
+        ]
+        read_only_fields = fields
+
+
+class SimilarAlbumSerializer(serializers.ModelSerializer):
+    """
+    One entry of /api/albums/<pk>/similar/: the neighbouring album's
+    basic fields plus its similarity score. Expects the neighbour to be
+    select_related.
+    """
+    id = serializers.IntegerField(source='neighbour.id')
+    title = serializers.CharField(source='neighbour.title')
+    artist_name = serializers.CharField(source='neighbour.artist_name')
+
+    class Meta:
+        model = AlbumNeighbour
+        fields = ['id', 'title', 'artist_name', 'rank', 'score']
+        read_only_fields = fields
@@ -0,0 +1,259 @@
+"""
+Smart playlists: playlists whose songs are chosen by rules.
+
+Playlist.rules is a JSON object of conditions, all of which a song must
+meet. Catalogue conditions take the names and values of the /api/albums/
+and /api/songs/ filters (dottify/filters.py), applied to the song or its
+album; "live albums from before 1980, songs under five minutes" is
+
+    {"album_format": "LIVE", "year_max": 1979, "length_max": 299}
+
+and "top-rated this week" is {"rated_within_days": 7, "min_rating": 4},
+songs whose album averages at least min_rating over the ratings of the
+last rated_within_days days.
+
+The result is materialized into the ordinary Playlist.songs table, so a
+smart playlist is read exactly like any other. Saving a playlist whose
+rules are new or changed queues a job (tasks.materialize_smart_playlist)
+that evaluates them once; after that, saves and deletes of songs,
+albums and ratings re-check only the songs they touch, against every
+smart playlist whose rules could depend on the change, and add or
+remove just those songs. An update costs time in the number of songs
+changed and smart playlists, not in the size of the catalogue.
+
+Ratings also leave the window without any row changing, and bulk writes
+send no signals, so the refresh_smart_playlists command re-evaluates
+rules from scratch; run it daily.
+"""
+import math
+import operator
+from datetime import timedelta
+from itertools import islice
+
+from django.db.models import Avg
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .filters import ALBUM_FILTERS, SONG_FILTERS, Filter, parse_filters
+from .models import Album, Playlist, Rating, Song
+from .tasks import materialize_smart_playlist
+
+# Membership changes are applied this many songs at a time.
+CHUNK_SIZE = 500
+
+
+def _non_negative_number(raw):
+    try:
+        value = float(raw)
+    except ValueError:
+        value = None
+    if value is None or not math.isfinite(value) or value < 0:
+        raise ValueError("Must be a non-negative number.")
+    return value
+
+
+def _days(raw):
+    if not raw.isdigit() or not 1 <= int(raw) <= 3660:
+        raise ValueError("Must be a number of days.")
+    return int(raw)
+
+
+# Album filters apply to the song's album.
+RULES = {
+    **{name: Filter(f'album__{spec.lookup}', spec.parse) for name, spec in ALBUM_FILTERS.items()},
+    **SONG_FILTERS,
+    'rated_within_days': Filter('rated_within_days', _days),
+    'min_rating': Filter('min_rating', _non_negative_number),
+}
+RATING_RULES = ('rated_within_days', 'min_rating')
+
+# Song columns read to check rules in Python, one per lookup field.
+ROW_FIELDS = ['id', 'album', 'length', 'album__format', 'album__release_date',
+              'album__retail_price', 'album__artist']
+
+OPERATORS = {
+    'exact': operator.eq,
+    'in': lambda value, choices: value in choices,
+    'gt': operator.gt,
+    'gte': operator.ge,
+    'lt': operator.lt,
+    'lte': operator.le,
+}
+
+
+def parse_rules(rules):
+    """
+    {lookup: value} for a rules object, with the rating window as the
+    'rated_within_days' and 'min_rating' keys. Raises ValidationError
+    for unknown names or bad values.
+    """
+    if not isinstance(rules, dict):
+        raise ValidationError("Rules must be an object.")
+    unknown = sorted(set(rules) - set(RULES))
+    if unknown:
+        raise ValidationError({name: "Unknown rule." for name in unknown})
+    if sum(name in rules for name in RATING_RULES) == 1:
+        raise ValidationError("rated_within_days and min_rating go together.")
+    params = {
+        name: ','.join(map(str, value)) if isinstance(value, list) else str(value)
+        for name, value in rules.items()
+    }
+    return parse_filters(params, RULES)
+
+
+def _split(lookup):
+    field, _, op = lookup.rpartition('__')
+    if op in OPERATORS:
+        return field, OPERATORS[op]
+    return lookup, OPERATORS['exact']
+
+
+def _catalogue_lookups(lookups):
+    return {lookup: value for lookup, value in lookups.items() if lookup not in RATING_RULES}
+
+
+def rated_albums(lookups, album_ids=None):
+    """
+    Albums averaging at least min_rating over the ratings in the window,
+    as a values queryset (optionally limited to `album_ids`).
+    """
+    since = timezone.now() - timedelta(days=lookups['rated_within_days'])
+    ratings = Rating.objects.filter(created_at__gte=since, album__isnull=False)
+    if album_ids is not None:
+        ratings = ratings.filter(album__in=album_ids)
+    return (
+        ratings.order_by().values('album').annotate(average=Avg('value'))
+        .filter(average__gte=lookups['min_rating']).values_list('album', flat=True)
+    )
+
+
+def matching_songs(rules):
+    """
+    Every song that `rules` select.
+    """
+    lookups = parse_rules(rules)
+    songs = Song.objects.filter(**_catalogue_lookups(lookups))
+    if 'min_rating' in lookups:
+        songs = songs.filter(album__in=rated_albums(lookups))
+    return songs
+
+
+def _chunks(ids):
+    ids = iter(sorted(ids))
+    while chunk := list(islice(ids, CHUNK_SIZE)):
+        yield chunk
+
+
+def _apply(playlist, add, remove):
+    # Through the related manager, so the outbox, version and ETag
+    # handlers see membership changes as they would a manual edit.
+    for chunk in _chunks(remove):
+        playlist.songs.remove(*chunk)
+    for chunk in _chunks(add):
+        playlist.songs.add(*chunk)
+
+
+def materialize(playlist):
+    """
+    Evaluate the playlist's rules and make its songs match. Returns the
+    number of songs (added, removed).
+    """
+    wanted = set(matching_songs(playlist.rules).values_list('id', flat=True))
+    current = set(playlist.songs.values_list('id', flat=True))
+    _apply(playlist, wanted - current, current - wanted)
+    return len(wanted - current), len(current - wanted)
+
+
+def smart_playlists():
+    return Playlist.objects.filter(rules__isnull=False).only('id', 'rules')
+
+
+def refresh(song_ids, depends_on=None):
+    """
+    Re-check `song_ids` against every smart playlist (or those whose
+    parsed rules satisfy `depends_on`) and fix their membership.
+    """
+    song_ids = set(song_ids)
+    if not song_ids:
+        return
+    playlists = []
+    for playlist in smart_playlists():
+        lookups = parse_rules(playlist.rules)
+        if depends_on is None or depends_on(lookups):
+            playlists.append((playlist, lookups))
+    if not playlists:
+        return
+
+    rows = list(Song.objects.filter(id__in=song_ids).values(*ROW_FIELDS))
+    album_ids = {row['album'] for row in rows}
+    rated = {}
+    Through = Playlist.songs.through
+    members = set(
+        Through.objects.filter(playlist__in=[p.id for p, _ in playlists], song__in=song_ids)
+        .values_list('playlist_id', 'song_id')
+    )
+    for playlist, lookups in playlists:
+        tests = [(*_split(lookup), value) for lookup, value in _catalogue_lookups(lookups).items()]
+        if 'min_rating' in lookups:
+            window = (lookups['rated_within_days'], lookups['min_rating'])
+            if window not in rated:
+                rated[window] = set(rated_albums(lookups, album_ids))
+            tests.append(('album', OPERATORS['in'], rated[window]))
+        # NULL never matches, as in SQL.
+        wanted = {
+            row['id'] for row in rows
+            if all(row[field] is not None and test(row[field], value) for field, test, value in tests)
+        }
+        current = {song_id for playlist_id, song_id in members if playlist_id == playlist.id}
+        _apply(playlist, wanted - current, (song_ids & current) - wanted)
+
+
+def _uses_album(lookups):
+    return any(lookup.startswith('album__') for lookup in lookups)
+
+
+def _uses_ratings(lookups):
+    return 'min_rating' in lookups
+
+
+def _song_saved(sender, instance, **kwargs):
+    refresh([instance.pk])
+
+
+def _album_saved(sender, instance, created, **kwargs):
+    if not created:
+        refresh(Song.objects.filter(album=instance.pk).values_list('id', flat=True), _uses_album)
+
+
+def _rating_changed(sender, instance, **kwargs):
+    if instance.album_id is not None:
+        refresh(Song.objects.filter(album=instance.album_id).values_list('id', flat=True), _uses_ratings)
+
+
+def _playlist_saving(sender, instance, update_fields=None, **kwargs):
+    # Compared with the stored rules, so that renaming a smart playlist
+    # or changing its visibility does not evaluate them again.
+    changed = instance.rules is not None and (update_fields is None or 'rules' in update_fields)
+    if changed and not instance._state.adding:
+        stored = Playlist.objects.filter(pk=instance.pk).values_list('rules', flat=True).first()
+        changed = stored != instance.rules
+    instance._rules_changed = changed
+
+
+def _playlist_saved(sender, instance, **kwargs):
+    if getattr(instance, '_rules_changed', False):
+        materialize_smart_playlist.delay(instance.pk)
+
+
+def connect_signals():
+    """
+    Called from DottifyConfig.ready(). Deleted songs and albums take
+    their membership rows with them, so only saves need handling.
+    """
+    post_save.connect(_song_saved, sender=Song, dispatch_uid='smart_playlists_song_saved')
+    post_save.connect(_album_saved, sender=Album, dispatch_uid='smart_playlists_album_saved')
+    post_save.connect(_rating_changed, sender=Rating, dispatch_uid='smart_playlists_rating_saved')
+    post_delete.connect(_rating_changed, sender=Rating, dispatch_uid='smart_playlists_rating_deleted')
+    pre_save.connect(_playlist_saving, sender=Playlist, dispatch_uid='smart_playlists_playlist_saving')
+    post_save.connect(_playlist_saved, sender=Playlist, dispatch_uid='smart_playlists_playlist_saved')
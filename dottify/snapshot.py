@@ -0,0 +1,421 @@
+"""
+Columnar catalogue snapshots.
+
+write_snapshot() dumps albums, songs, playlist membership and ratings
+into a directory of flat column files: one file of fixed-width integers
+per numeric column, an offsets file plus a UTF-8 blob per string column,
+and integer codes into a small string table for low-cardinality strings
+such as artist names and formats. manifest.json describes the tables and
+is written last, and the finished directory replaces the previous
+snapshot in one rename.
+
+Snapshot() memory-maps those files read-only, so opening one costs a few
+system calls however large the catalogue, pages are shared between
+processes, and the raw columns (memoryviews of int64) are there for
+offline analysis. When settings.DOTTIFY_SNAPSHOT points at a snapshot,
+/api/albums/ and /api/albums/<pk>/ are served from it (see
+SnapshotReadMixin in api_views), which lets a read-only node boot and
+answer without a database.
+"""
+import json
+import mmap
+import os
+import shutil
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Album, Playlist, Rating, Song
+
+FORMAT = 'dottify-catalogue'
+VERSION = 1
+
+MANIFEST = 'manifest.json'
+
+# Rows fetched per query while writing.
+SNAPSHOT_CHUNK_SIZE = 2000
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+INT = 'int'
+STR = 'str'
+DICT = 'dict'
+
+
+class SnapshotError(Exception):
+    """
+    A snapshot directory is missing, incomplete or in a format this code
+    cannot read.
+    """
+
+
+def _cents(value):
+    return None if value is None else int(value * 100)
+
+
+def _ordinal(value):
+    return None if value is None else value.toordinal()
+
+
+def _micros(value):
+    if value is None:
+        return None
+    if timezone.is_naive(value):
+        value = value.replace(tzinfo=dt_timezone.utc)
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+def _text(value):
+    return None if value is None else str(value)
+
+
+# table: (queryset, [(column, kind, field, convert)]). Rows are written in
+# queryset order; songs are grouped by album so that an album's songs are
+# one contiguous range.
+def _tables():
+    return {
+        'album': (Album.objects.order_by('id'), [
+            ('id', INT, 'id', None),
+            ('title', STR, 'title', None),
+            ('artist_name', DICT, 'artist_name', None),
+            ('artist_id', INT, 'artist_id', None),
+            ('format', DICT, 'format', None),
+            ('release_date', INT, 'release_date', _ordinal),
+            ('retail_price_cents', INT, 'retail_price', _cents),
+            ('cover_image', STR, 'cover_image', _text),
+        ]),
+        'song': (Song.objects.order_by('album_id', 'id'), [
+            ('id', INT, 'id', None),
+            ('album_id', INT, 'album_id', None),
+            ('title', STR, 'title', None),
+            ('length', INT, 'length', None),
+        ]),
+        'playlist': (Playlist.objects.order_by('id'), [
+            ('id', INT, 'id', None),
+            ('owner_id', INT, 'owner_id', None),
+            ('name', STR, 'name', None),
+            ('visibility', INT, 'visibility', None),
+            ('created_at', INT, 'created_at', _micros),
+        ]),
+        'playlist_song': (Playlist.songs.through.objects.order_by('playlist_id', 'song_id'), [
+            ('playlist_id', INT, 'playlist_id', None),
+            ('song_id', INT, 'song_id', None),
+        ]),
+        'rating': (Rating.objects.order_by('id'), [
+            ('id', INT, 'id', None),
+            ('user_id', INT, 'user_id', None),
+            ('album_id', INT, 'album_id', None),
+            ('song_id', INT, 'song_id', None),
+            ('value', INT, 'value', None),
+            ('created_at', INT, 'created_at', _micros),
+        ]),
+    }
+
+
+class _IntWriter:
+    def __init__(self):
+        self.values = array('q')
+        self.nulls = bytearray()
+
+    def append(self, value):
+        self.nulls.append(value is None)
+        self.values.append(0 if value is None else value)
+
+    def write(self, directory, prefix):
+        _write_array(directory, f'{prefix}.i64', self.values)
+        spec = {'kind': INT, 'values': f'{prefix}.i64'}
+        if any(self.nulls):
+            spec['nulls'] = _write_bytes(directory, f'{prefix}.nulls', self.nulls)
+        return spec
+
+
+class _StrWriter:
+    def __init__(self):
+        self.offsets = array('q', [0])
+        self.data = bytearray()
+        self.nulls = bytearray()
+
+    def append(self, value):
+        self.nulls.append(value is None)
+        if value is not None:
+            self.data += value.encode()
+        self.offsets.append(len(self.data))
+
+    def write(self, directory, prefix):
+        _write_array(directory, f'{prefix}.offsets', self.offsets)
+        spec = {
+            'kind': STR,
+            'offsets': f'{prefix}.offsets',
+            'data': _write_bytes(directory, f'{prefix}.utf8', self.data),
+        }
+        if any(self.nulls):
+            spec['nulls'] = _write_bytes(directory, f'{prefix}.nulls', self.nulls)
+        return spec
+
+
+class _DictWriter:
+    def __init__(self):
+        self.codes = array('q')
+        self.index = {}
+
+    def append(self, value):
+        if value is None:
+            self.codes.append(-1)
+        else:
+            self.codes.append(self.index.setdefault(value, len(self.index)))
+
+    def write(self, directory, prefix):
+        strings = _StrWriter()
+        for value in self.index:
+            strings.append(value)
+        _write_array(directory, f'{prefix}.codes', self.codes)
+        return {'kind': DICT, 'codes': f'{prefix}.codes', 'strings': strings.write(directory, f'{prefix}.strings')}
+
+
+WRITERS = {INT: _IntWriter, STR: _StrWriter, DICT: _DictWriter}
+
+
+def _write_array(directory, name, values):
+    with open(os.path.join(directory, name), 'wb') as f:
+        values.tofile(f)
+    return name
+
+
+def _write_bytes(directory, name, data):
+    with open(os.path.join(directory, name), 'wb') as f:
+        f.write(data)
+    return name
+
+
+def write_snapshot(path, chunk_size=SNAPSHOT_CHUNK_SIZE):
+    """
+    Write a snapshot of the catalogue to the directory `path`, replacing
+    any previous one, and return {table: rows}.
+    """
+    path = os.path.abspath(path)
+    staging = f'{path}.tmp-{os.getpid()}'
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    try:
+        manifest = {
+            'format': FORMAT,
+            'version': VERSION,
+            'byteorder': sys.byteorder,
+            'created_at': timezone.now().isoformat(),
+            'tables': {},
+        }
+        counts = {}
+        for table, (queryset, columns) in _tables().items():
+            writers = [WRITERS[kind]() for _, kind, _, _ in columns]
+            fields = [field for _, _, field, _ in columns]
+            rows = 0
+            for row in queryset.values_list(*fields).iterator(chunk_size=chunk_size):
+                for writer, (_, _, _, convert), value in zip(writers, columns, row):
+                    writer.append(convert(value) if convert else value)
+                rows += 1
+            manifest['tables'][table] = {
+                'rows': rows,
+                'columns': {
+                    name: writer.write(staging, f'{table}.{name}')
+                    for writer, (name, _, _, _) in zip(writers, columns)
+                },
+            }
+            counts[table] = rows
+        with open(os.path.join(staging, MANIFEST), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+
+        previous = f'{path}.old-{os.getpid()}'
+        if os.path.exists(path):
+            os.rename(path, previous)
+        os.rename(staging, path)
+        shutil.rmtree(previous, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return counts
+
+
+class IntColumn:
+    """
+    Nullable int64 column. `values` is the raw memoryview; null rows hold 0.
+    """
+    def __init__(self, values, nulls=None):
+        self.values = values
+        self.nulls = nulls
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, i):
+        if self.nulls is not None and self.nulls[i]:
+            return None
+        return self.values[i]
+
+
+class StrColumn:
+    def __init__(self, offsets, data, nulls=None):
+        self.offsets = offsets
+        self.data = data
+        self.nulls = nulls
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if self.nulls is not None and self.nulls[i]:
+            return None
+        return str(self.data[self.offsets[i]:self.offsets[i + 1]], 'utf-8')
+
+
+class DictColumn:
+    """
+    Dictionary-encoded string column: `codes` index `strings`, -1 is null.
+    """
+    def __init__(self, codes, strings):
+        self.codes = codes
+        self.strings = [strings[i] for i in range(len(strings))]
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, i):
+        code = self.codes[i]
+        return None if code < 0 else self.strings[code]
+
+
+class Table:
+    def __init__(self, rows, columns):
+        self.rows = rows
+        self.columns = columns
+
+    def __len__(self):
+        return self.rows
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+
+class Snapshot:
+    """
+    A snapshot directory, memory-mapped read-only.
+    """
+    def __init__(self, path):
+        self.path = path
+        try:
+            with open(os.path.join(path, MANIFEST), encoding='utf-8') as f:
+                self.manifest = json.load(f)
+        except (OSError, ValueError) as exc:
+            raise SnapshotError(f"Cannot read snapshot manifest in {path}: {exc}")
+        if self.manifest.get('format') != FORMAT or self.manifest.get('version') != VERSION:
+            raise SnapshotError(f"{path} is not a version {VERSION} {FORMAT} snapshot.")
+        if self.manifest['byteorder'] != sys.byteorder:
+            raise SnapshotError(f"{path} was written on a {self.manifest['byteorder']}-endian machine.")
+        self.tables = {
+            name: Table(spec['rows'], {
+                column: self._column(column_spec) for column, column_spec in spec['columns'].items()
+            })
+            for name, spec in self.manifest['tables'].items()
+        }
+
+    def _map(self, name, fmt='B'):
+        with open(os.path.join(self.path, name), 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return memoryview(b'').cast(fmt)
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return memoryview(mapped).cast(fmt)
+
+    def _column(self, spec):
+        nulls = self._map(spec['nulls']) if 'nulls' in spec else None
+        if spec['kind'] == INT:
+            return IntColumn(self._map(spec['values'], 'q'), nulls)
+        if spec['kind'] == STR:
+            return StrColumn(self._map(spec['offsets'], 'q'), self._map(spec['data']), nulls)
+        return DictColumn(self._map(spec['codes'], 'q'), self._column(spec['strings']))
+
+    def __getitem__(self, table):
+        return self.tables[table]
+
+    def find(self, table, pk):
+        """
+        Row index of id `pk` in an id-ordered table, or None.
+        """
+        ids = self.tables[table]['id'].values
+        i = bisect_left(ids, pk)
+        return i if i < len(ids) and ids[i] == pk else None
+
+    def row_range(self, table, column, value):
+        """
+        (start, stop) of the rows whose `column` equals `value`, for a
+        table ordered by that column.
+        """
+        values = self.tables[table][column].values
+        return bisect_left(values, value), bisect_right(values, value)
+
+
+_loaded = {}
+
+
+def catalogue_snapshot():
+    """
+    The Snapshot at settings.DOTTIFY_SNAPSHOT, or None when unset.
+
+    Opened once per process and reopened when the manifest changes, so
+    a node picks up a newly written snapshot without restarting.
+    """
+    path = getattr(settings, 'DOTTIFY_SNAPSHOT', None)
+    if not path:
+        return None
+    try:
+        stat = os.stat(os.path.join(path, MANIFEST))
+    except OSError as exc:
+        raise SnapshotError(f"No snapshot at {path}: {exc}")
+    key = (path, stat.st_ino, stat.st_mtime_ns)
+    snapshot = _loaded.get(path)
+    if snapshot is None or snapshot[0] != key:
+        snapshot = _loaded[path] = (key, Snapshot(path))
+    return snapshot[1]
+
+
+def _price(cents):
+    # AlbumSerializer renders the DecimalField as a 2dp string.
+    return None if cents is None else f"{cents // 100}.{cents % 100:02d}"
+
+
+def album_representation(snapshot, i, request=None):
+    """
+    Row `i` of the album table in AlbumSerializer's output format.
+    """
+    albums = snapshot['album']
+    songs = snapshot['song']
+    album_id = albums['id'][i]
+    cover = albums['cover_image'][i]
+    if cover:
+        cover = Album._meta.get_field('cover_image').storage.url(cover)
+        if request is not None:
+            cover = request.build_absolute_uri(cover)
+    else:
+        cover = None
+    release_date = albums['release_date'][i]
+    start, stop = snapshot.row_range('song', 'album_id', album_id)
+    return {
+        'id': album_id,
+        'cover_image': cover,
+        'title': albums['title'][i],
+        'artist_name': albums['artist_name'][i],
+        'retail_price': _price(albums['retail_price_cents'][i]),
+        'format': albums['format'][i],
+        'release_date': None if release_date is None else date.fromordinal(release_date).isoformat(),
+        'song_set': [
+            {
+                'id': songs['id'][j],
+                'title': songs['title'][j],
+                'length': songs['length'][j],
+                'album': album_id,
+            }
+            for j in range(start, stop)
+        ],
+    }
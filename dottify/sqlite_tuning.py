@@ -0,0 +1,118 @@
+"""
+SQLite tuning for running Dottify under concurrent load.
+
+settings.py builds the `default` database OPTIONS from this module, so it
+must stay importable before Django is set up (no model imports here).
+
+The production profile:
+- WAL journaling, so readers never block the single writer and vice versa;
+- synchronous=NORMAL, which is durable across application crashes in WAL
+  mode and avoids an fsync on every commit;
+- a larger page cache and memory-mapped reads for the hot catalogue tables;
+- BEGIN IMMEDIATE for transactions, so a writer takes the write lock up
+  front instead of failing with "database is locked" when it tries to
+  upgrade a read lock half way through;
+- a busy timeout, plus retry_on_locked() for the write paths that still
+  lose the race.
+"""
+import random
+import time
+from functools import wraps
+
+from django.db import OperationalError, connection, transaction
+
+PRODUCTION_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -65536,        # negative = KiB, i.e. 64 MiB
+    'mmap_size': 268435456,      # 256 MiB
+    'temp_store': 'MEMORY',
+}
+
+# Read replicas are opened read-only (mode=ro), so only per-connection
+# pragmas apply; query_only guards against accidental writes.
+REPLICA_PRAGMAS = {
+    'cache_size': PRODUCTION_PRAGMAS['cache_size'],
+    'mmap_size': PRODUCTION_PRAGMAS['mmap_size'],
+    'temp_store': PRODUCTION_PRAGMAS['temp_store'],
+    'query_only': 'ON',
+}
+
+# Seconds sqlite3 waits on a locked database before raising.
+BUSY_TIMEOUT = 10
+
+# Persistent connections, so the pragmas above are paid once per worker
+# connection rather than once per request.
+CONN_MAX_AGE = 600
+
+RETRY_ATTEMPTS = 5
+RETRY_BASE_DELAY = 0.05
+
+
+def pragma_statements(pragmas=PRODUCTION_PRAGMAS):
+    return [f"PRAGMA {name}={value}" for name, value in pragmas.items()]
+
+
+def production_options(pragmas=PRODUCTION_PRAGMAS, timeout=BUSY_TIMEOUT):
+    """
+    OPTIONS for a django.db.backends.sqlite3 DATABASES entry.
+    """
+    return {
+        'init_command': ';'.join(pragma_statements(pragmas)),
+        'transaction_mode': 'IMMEDIATE',
+        'timeout': timeout,
+    }
+
+
+def replica_options(pragmas=REPLICA_PRAGMAS, timeout=BUSY_TIMEOUT):
+    """
+    OPTIONS for a read-only replica DATABASES entry.
+    """
+    return {
+        'init_command': ';'.join(pragma_statements(pragmas)),
+        'timeout': timeout,
+    }
+
+
+def is_lock_error(exc):
+    message = str(exc).lower()
+    return 'database is locked' in message or 'database table is locked' in message
+
+
+def backoff_delays(attempts=RETRY_ATTEMPTS, base_delay=RETRY_BASE_DELAY):
+    """
+    Jittered exponential delays to sleep between retries.
+    """
+    for attempt in range(attempts - 1):
+        yield base_delay * (2 ** attempt) * (1 + random.random())
+
+
+def retry_on_locked(func=None, *, attempts=RETRY_ATTEMPTS, base_delay=RETRY_BASE_DELAY):
+    """
+    Run the decorated write in its own transaction, retrying it with
+    backoff if SQLite reports lock contention.
+
+    When called inside an outer atomic block there is nothing safe to
+    retry (the outer transaction is already broken), so the function is
+    simply called and any error propagates.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if connection.in_atomic_block:
+                return func(*args, **kwargs)
+            delays = backoff_delays(attempts, base_delay)
+            while True:
+                try:
+                    with transaction.atomic():
+                        return func(*args, **kwargs)
+                except OperationalError as exc:
+                    delay = next(delays, None)
+                    if delay is None or not is_lock_error(exc):
+                        raise
+                    time.sleep(delay)
+        return wrapper
+
+    if func is not None:
+        return decorator(func)
+    return decorator
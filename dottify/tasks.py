@@ -0,0 +1,117 @@
+"""
+Background jobs run by the run_jobs worker (see dottify/jobs.py).
+
+Each job takes ids rather than objects and re-reads what it needs, since
+it may run much later than it was queued, or be retried.
+"""
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.mail import EmailMessage
+from django.db import transaction
+from django.utils import timezone
+
+from .jobs import job
+from .models import Album, Playlist
+from .versions import bump
+
+# Longest side, in pixels, of a stored cover image. Larger uploads are
+# scaled down once, so list and detail pages never ship the original.
+COVER_MAX_SIZE = 1200
+
+
+@job
+def process_cover(album_id):
+    """
+    Scale an uploaded cover image down to COVER_MAX_SIZE and re-encode it.
+    """
+    # Pillow is only needed by the worker, not by web requests.
+    from PIL import Image
+
+    album = Album.objects.filter(pk=album_id).first()
+    if album is None or not album.cover_image:
+        return
+    name = album.cover_image.name
+    with album.cover_image.open('rb') as f:
+        image = Image.open(f)
+        image.load()
+    if max(image.size) <= COVER_MAX_SIZE:
+        return
+
+    image_format = image.format or 'JPEG'
+    image.thumbnail((COVER_MAX_SIZE, COVER_MAX_SIZE))
+    if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    buffer = BytesIO()
+    image.save(buffer, format=image_format, optimize=True)
+
+    # The scaled copy is saved under a new name and the old file only
+    # deleted once the row points at it, so a crash never loses the cover
+    # and pages never link to a missing file.
+    storage = album.cover_image.storage
+    new_name = storage.save(name, ContentFile(buffer.getvalue()))
+    # update() rather than save(), so edits made while the job was queued
+    # are not overwritten; a cover replaced meanwhile is left alone.
+    updated = Album.objects.filter(pk=album_id, cover_image=name).update(
+        cover_image=new_name, updated_at=timezone.now(),
+    )
+    if not updated:
+        storage.delete(new_name)
+        return
+    storage.delete(name)
+    bump('album')
+    queue_album_warming(album_id)
+
+
+@job
+def warm_album_pages(album_id):
+    """
+    Render the album's detail page and the album list once, so that the
+    first visitor after an edit hits warm row caches. Only queued when
+    the cache is shared with the web workers (see queue_album_warming()).
+    """
+    from .warming import ANONYMOUS, shared_cache, warm
+
+    if not shared_cache() or not Album.objects.filter(pk=album_id).exists():
+        return
+    warm([f'/albums/{album_id}/', '/albums/'], {ANONYMOUS: None}, workers=0)
+
+
+def queue_album_warming(album_id):
+    """
+    Queue warm_album_pages, unless each process has its own cache: the
+    worker would then only fill its own memory.
+    """
+    from .warming import shared_cache
+
+    if shared_cache():
+        warm_album_pages.delay(album_id)
+
+
+@job
+def materialize_smart_playlist(playlist_id):
+    """
+    Bring a smart playlist's songs in line with its rules, after the
+    rules were set or changed.
+    """
+    from .smart_playlists import materialize
+
+    playlist = Playlist.objects.filter(pk=playlist_id, rules__isnull=False).first()
+    if playlist is None:
+        return
+    with transaction.atomic():
+        materialize(playlist)
+
+
+@job
+def send_support_email(email, subject, message):
+    """
+    Forward a help form submission to the support mailbox.
+    """
+    EmailMessage(
+        subject=f"[Dottify support] {subject}",
+        body=message,
+        to=[settings.DOTTIFY_SUPPORT_EMAIL],
+        reply_to=[email],
+    ).send()
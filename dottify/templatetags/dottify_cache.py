@@ -0,0 +1,38 @@
+from django import template
+from django.core.cache import cache
+from django.utils.safestring import mark_safe
+
+register = template.Library()
+
+# Row fragments are keyed by updated_at, so a stale entry can never be
+# served; the timeout only bounds how long dead versions linger.
+ROW_FRAGMENT_TIMEOUT = 60 * 60 * 24
+
+
+@register.simple_tag(takes_context=True)
+def cached_rows(context, rows, template_name, name):
+    """
+    Render `template_name` once per row, reusing cached row fragments.
+
+    Usage: {% cached_rows albums "dottify/rows/album_list_row.html" "album" %}
+
+    Each row is exposed to the row template as `name`. Fragments are
+    keyed by (template, pk, updated_at) and fetched with one get_many()
+    for the whole list, so a warm page costs one cache round trip rather
+    than one per row; only missing rows are rendered and stored.
+    """
+    row_template = context.template.engine.get_template(template_name)
+    keys = [f"rows:{template_name}:{row.pk}:{row.updated_at.timestamp()}" for row in rows]
+    cached = cache.get_many(keys)
+    missing = {}
+    parts = []
+    for key, row in zip(keys, rows):
+        html = cached.get(key)
+        if html is None:
+            with context.push(**{name: row}):
+                html = row_template.render(context)
+            missing[key] = html
+        parts.append(html)
+    if missing:
+        cache.set_many(missing, ROW_FRAGMENT_TIMEOUT)
+    return mark_safe(''.join(parts))
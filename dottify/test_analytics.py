@@ -0,0 +1,81 @@
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from dottify.models import Album, DottifyUser, Rating, Song
+
+
+class AnalyticsAPITests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.live = Album.objects.create(title="Live", artist_name="A", format="LIVE",
+                                        retail_price=Decimal("4.99"), release_date=date(1999, 5, 1))
+        cls.live2 = Album.objects.create(title="Live 2", artist_name="A", format="LIVE",
+                                         retail_price=Decimal("12.00"), release_date=date(1999, 9, 1))
+        cls.single = Album.objects.create(title="Single", artist_name="B", format="SNGL",
+                                          release_date=date(2005, 1, 1))
+        Album.objects.create(title="Undated", artist_name="B")
+        for album, lengths in [(cls.live, [100, 200]), (cls.live2, [300]), (cls.single, [60])]:
+            for length in lengths:
+                Song.objects.create(title=f"{album.title} {length}", album=album, length=length)
+        rater = DottifyUser.objects.create(
+            user=User.objects.create_user(username="rater", password="pw123"), display_name="Rater",
+        )
+        for album, value in [(cls.live, 5), (cls.live, 3), (cls.single, 5)]:
+            Rating.objects.create(user=rater, album=album, value=value)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_song_length_by_format(self):
+        data = self.client.get("/api/analytics/song-length/").json()
+        live = next(row for row in data if row["format"] == "LIVE")
+        self.assertEqual(live, {"format": "LIVE", "songs": 3, "avg_length": 200.0,
+                                "min_length": 100, "max_length": 300})
+
+    def test_song_length_by_album_pages(self):
+        first = self.client.get("/api/analytics/song-length/?by=album&limit=2").json()
+        self.assertEqual([row["album_id"] for row in first["results"]], [self.live.id, self.live2.id])
+        self.assertEqual(first["results"][0]["avg_length"], 150.0)
+        rest = self.client.get(f"/api/analytics/song-length/?by=album&after={first['next_after']}").json()
+        self.assertEqual([row["album_id"] for row in rest["results"]], [self.single.id])
+        self.assertIsNone(rest["next_after"])
+
+    def test_prices_histogram(self):
+        data = self.client.get("/api/analytics/prices/?bucket=5").json()
+        self.assertEqual(data["bucket"], "5.00")
+        live = next(row for row in data["formats"] if row["format"] == "LIVE")
+        self.assertEqual((live["albums"], live["min_price"], live["max_price"], live["avg_price"]),
+                         (2, "4.99", "12.00", "8.50"))
+        self.assertEqual(data["histogram"], [
+            {"format": "LIVE", "from": "0.00", "albums": 1},
+            {"format": "LIVE", "from": "10.00", "albums": 1},
+        ])
+
+    def test_release_years_and_ratings(self):
+        years = self.client.get("/api/analytics/release-years/").json()
+        self.assertEqual(years, {"years": [{"year": 1999, "albums": 2}, {"year": 2005, "albums": 1}],
+                                 "undated": 1})
+        ratings = self.client.get("/api/analytics/ratings/").json()
+        self.assertEqual(ratings["values"], [{"value": 3, "ratings": 1}, {"value": 5, "ratings": 2}])
+        self.assertEqual(ratings["average"], 4.33)
+        one = self.client.get(f"/api/analytics/ratings/?album={self.live.id}").json()
+        self.assertEqual((one["ratings"], one["average"]), (2, 4.0))
+
+    def test_cached_until_data_changes(self):
+        self.client.get("/api/analytics/release-years/")
+        with self.assertNumQueries(1):
+            self.client.get("/api/analytics/release-years/")
+        Album.objects.create(title="New", artist_name="C", release_date=date(2005, 6, 1))
+        years = self.client.get("/api/analytics/release-years/").json()
+        self.assertEqual(years["years"][-1], {"year": 2005, "albums": 2})
+
+    def test_invalid_parameters(self):
+        for path in ("song-length/?by=artist", "song-length/?by=album&limit=0",
+                     "prices/?bucket=-1", "prices/?bucket=abc", "ratings/?album=x"):
+            self.assertEqual(self.client.get(f"/api/analytics/{path}").status_code, 400, path)
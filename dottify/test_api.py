@@ -71,4 +71,59 @@ class DottifyAPITests(TestCase):
         body = resp.json()
         self.assertEqual(body['album_count'], Album.objects.count())
         self.assertEqual(body['song_count'], Song.objects.count())
-        self.assertEqual(body['playlist_count'], Playlist.objects.count())
\ No newline at end of file
+        self.assertEqual(body['playlist_count'], Playlist.objects.count())
+
+class ConditionalRequestTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.album = Album.objects.create(title='Tagged', artist_name='Tagger')
+        self.song = Song.objects.create(title='Tagged Song', album=self.album, length=100)
+        owner = DottifyUser.objects.create(
+            user=User.objects.create_user('tagger', password='pw'),
+            display_name='Tagger',
+        )
+        self.playlist = Playlist.objects.create(name='Tagged Mix', owner=owner)
+
+    def revalidate(self, path, etag):
+        return self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_album_is_304_without_serializing(self):
+        path = f'/api/albums/{self.album.id}/'
+        etag = self.client.get(path)['ETag']
+        # The revision query only: no album, songs or serializer.
+        with self.assertNumQueries(1):
+            resp = self.revalidate(path, etag)
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(resp['ETag'], etag)
+
+    def test_album_etag_follows_nested_songs(self):
+        path = f'/api/albums/{self.album.id}/'
+        etag = self.client.get(path)['ETag']
+        Song.objects.create(title='Bonus', album=self.album, length=50)
+        resp = self.revalidate(path, etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotEqual(resp['ETag'], etag)
+        etag = resp['ETag']
+        self.song.delete()
+        self.assertEqual(self.revalidate(path, etag).status_code, 200)
+
+    def test_playlist_etag_follows_song_membership(self):
+        path = f'/api/playlists/{self.playlist.id}/'
+        etag = self.client.get(path)['ETag']
+        self.assertEqual(self.revalidate(path, etag).status_code, 304)
+        self.song.playlists.add(self.playlist)
+        resp = self.revalidate(path, etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()['songs'], [self.song.id])
+
+    def test_collection_and_statistics_etags(self):
+        for path in ('/api/albums/', '/api/songs/', '/api/playlists/', '/api/statistics/'):
+            etag = self.client.get(path)['ETag']
+            with self.assertNumQueries(1):
+                self.assertEqual(self.revalidate(path, etag).status_code, 304, path)
+            Song.objects.create(title='Another', album=self.album, length=10)
+            self.assertEqual(self.revalidate(path, etag).status_code, 200, path)
+
+    def test_unknown_object_is_still_404(self):
+        self.assertEqual(self.client.get('/api/albums/999999/').status_code, 404)
+        self.assertEqual(self.client.get('/api/albums/abc/').status_code, 404)
@@ -0,0 +1,113 @@
+import shutil
+import tempfile
+from datetime import datetime, timezone as dt_timezone
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from dottify import audience, plays
+from dottify.models import Album, AudienceSketch, DottifyUser, Rating, Song
+from dottify.views import _build_album_detail_context
+
+
+def sketch_of(values):
+    sketch = audience.HyperLogLog()
+    for value in values:
+        sketch.add(value)
+    return sketch
+
+
+class HyperLogLogTests(SimpleTestCase):
+    def test_small_sets_are_near_exact(self):
+        for n in (0, 1, 10, 100):
+            self.assertAlmostEqual(sketch_of(range(1, n + 1)).count(), n, delta=max(1, n * 0.05))
+
+    def test_large_sets_within_error_bound(self):
+        for n in (10_000, 100_000):
+            estimate = sketch_of(range(n)).count()
+            self.assertLess(abs(estimate - n) / n, 3 * audience.RELATIVE_ERROR, n)
+
+    def test_union_and_round_trip(self):
+        left, right = sketch_of(range(0, 6000)), sketch_of(range(4000, 10000))
+        union = audience.HyperLogLog.from_bytes(left.to_bytes())
+        union.update(right)
+        union.update(right)
+        self.assertEqual(union.count(), sketch_of(range(10000)).count())
+
+        small = sketch_of([1, 2, 3])
+        data = small.to_bytes()
+        self.assertTrue(data.startswith(audience.SPARSE))
+        self.assertEqual(len(data), 1 + 3 * 3)
+        self.assertEqual(audience.HyperLogLog.from_bytes(data).sparse, small.sparse)
+        self.assertTrue(left.to_bytes().startswith(audience.DENSE))
+
+
+class AudienceTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.album = Album.objects.create(title="Heard", artist_name="Artist")
+        cls.first = Song.objects.create(title="First", album=cls.album, length=200)
+        cls.second = Song.objects.create(title="Second", album=cls.album, length=200)
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings = override_settings(DOTTIFY_PLAYS_DIR=directory)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def play(self, plays_by_user):
+        now = datetime.now(dt_timezone.utc).timestamp()
+        events = [{"user": user, "song": song.id, "timestamp": now} for user, song in plays_by_user]
+        plays.writer.append(plays.parse_events(events)[1])
+        plays.writer.flush()
+        return datetime.now(dt_timezone.utc).date()
+
+    def test_roll_up_records_listeners(self):
+        day = self.play([(1, self.first), (2, self.first), (1, self.second), (0, self.second)])
+        plays.roll_up(day)
+        plays.roll_up(day)
+        self.assertEqual(audience.song_audience(self.first.id)["listeners"], 2)
+        self.assertEqual(audience.song_audience(self.second.id)["recent_listeners"], 1)
+        self.assertEqual(audience.album_audience(self.album.id)["listeners"], 2)
+
+        self.play([(3, self.second)])
+        plays.roll_up(day)
+        self.assertEqual(audience.album_audience(self.album.id)["recent_listeners"], 3)
+        self.assertEqual(
+            AudienceSketch.objects.filter(target=AudienceSketch.ALBUM, metric=AudienceSketch.LISTENERS).count(), 2
+        )
+
+    def test_ratings_count_raters_once(self):
+        users = [DottifyUser.objects.create(user=User.objects.create_user(f"rater{i}"), display_name=f"R{i}")
+                 for i in range(3)]
+        for user in users:
+            Rating.objects.create(album=self.album, user=user, value=4)
+        Rating.objects.create(song=self.first, user=users[0], value=5)
+        Rating.objects.create(album=self.album, value=3)
+        self.assertEqual(audience.album_audience(self.album.id)["raters"], 3)
+        self.assertEqual(audience.song_audience(self.first.id)["raters"], 1)
+
+        client = APIClient()
+        response = client.get(f"/api/albums/{self.album.id}/audience/").json()
+        self.assertEqual(response["raters"], 3)
+        self.assertEqual(response["relative_error"], round(audience.RELATIVE_ERROR, 4))
+        self.assertEqual(client.get("/api/albums/999999/audience/").status_code, 404)
+        self.assertEqual(client.get("/api/albums/abc/audience/").status_code, 404)
+        self.assertEqual(client.get("/api/songs/abc/audience/").status_code, 404)
+        self.assertEqual(client.get(f"/api/songs/{self.first.id}/audience/").json()["raters"], 1)
+        self.assertEqual(_build_album_detail_context(self.album)["audience"]["raters"], 3)
+
+        self.album.delete()
+        self.assertFalse(AudienceSketch.objects.filter(target=AudienceSketch.ALBUM).exists())
+
+    def test_merge_reads_inside_its_transaction(self):
+        audience.merge_into(AudienceSketch.SONG, AudienceSketch.RATERS, None, {self.first.id: sketch_of([1])})
+        with CaptureQueriesContext(connection) as queries:
+            audience.merge_into(AudienceSketch.SONG, AudienceSketch.RATERS, None, {self.first.id: sketch_of([2])})
+        statements = [query["sql"].split()[0].upper() for query in queries]
+        self.assertEqual(statements, ["SAVEPOINT", "SELECT", "DELETE", "INSERT", "RELEASE"])
+        self.assertEqual(audience.song_audience(self.first.id)["raters"], 2)
@@ -0,0 +1,102 @@
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from dottify import autocomplete
+from dottify.autocomplete import PrefixIndex, Suggestion, normalize
+from dottify.models import Album, AlbumStats, Artist, Song
+
+
+class PrefixIndexTests(SimpleTestCase):
+    def test_normalize(self):
+        self.assertEqual(normalize("  Björk: Début!  "), "bjork debut")
+        self.assertEqual(normalize("AC/DC"), "ac dc")
+
+    def test_matches_later_words_most_popular_first(self):
+        index = PrefixIndex([
+            Suggestion("album", 1, "The Dark Side of the Moon", 5),
+            Suggestion("song", 2, "Moonage Daydream", 9),
+            Suggestion("song", 3, "Blue Moon", 1),
+            Suggestion("artist", 4, "Moby", 20),
+        ])
+        self.assertEqual([s.id for s in index.search("moon")], [2, 1, 3])
+        self.assertEqual([s.id for s in index.search("Mo", limit=2)], [4, 2])
+        self.assertEqual(index.search("zz"), [])
+
+    def test_broad_prefixes_agree_with_a_full_scan(self):
+        items = [Suggestion("song", i, f"Track {i % 37} take {i}", (i * 7919) % 101) for i in range(3000)]
+        index = PrefixIndex(items)
+        for query in ("t", "tr", "track 1", "take 2", "track 12 take 1"):
+            expected = sorted((s for s in items if any(k.startswith(normalize(query))
+                                                       for k in autocomplete.index_keys(s.label))),
+                              key=autocomplete._rank)[:10]
+            self.assertEqual(index.search(query), expected, query)
+        index.add(Suggestion("song", 5000, "Track star", 1000))
+        index.remove("song", 0)
+        self.assertEqual(index.search("tr")[0].id, 5000)
+        self.assertNotIn(0, [s.id for s in index.search("track 0 take 0", limit=20)])
+
+
+class FirstBuildTests(SimpleTestCase):
+    def test_one_build_and_no_lost_changes(self):
+        service = autocomplete.AutocompleteService()
+        loading, release, calls = threading.Event(), threading.Event(), []
+
+        def load(max_items):
+            calls.append(max_items)
+            loading.set()
+            release.wait(5)
+            return [Suggestion("album", 1, "Harvest", 3)]
+
+        with mock.patch("dottify.autocomplete.load_suggestions", load):
+            threads = [threading.Thread(target=service.search, args=("harv",)) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            loading.wait(5)
+            service.saved("song", 2, "Harvest Moon")
+            release.set()
+            for thread in threads:
+                thread.join(5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([s.id for s in service.search("harv")], [1, 2])
+
+
+class AutocompleteAPITests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.album = Album.objects.create(title="Harvest Moon", artist_name="Neil Young")
+        AlbumStats.objects.create(album=cls.album, playlist_count=3)
+        cls.song = Song.objects.create(title="Harvest", album=cls.album, length=200)
+
+    def setUp(self):
+        autocomplete.service.index = None
+        self.addCleanup(setattr, autocomplete.service, "index", None)
+        self.client = APIClient()
+
+    def test_suggestions(self):
+        response = self.client.get("/api/autocomplete/", {"q": "harv"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [
+            {"type": "album", "id": self.album.id, "label": "Harvest Moon"},
+            {"type": "song", "id": self.song.id, "label": "Harvest"},
+        ])
+        artist = Artist.objects.get(name="Neil Young")
+        self.assertEqual(self.client.get("/api/autocomplete/", {"q": "young"}).json(),
+                         [{"type": "artist", "id": artist.id, "label": "Neil Young"}])
+        self.assertEqual(self.client.get("/api/autocomplete/", {"q": ""}).json(), [])
+        self.assertEqual(self.client.get("/api/autocomplete/", {"q": "h", "limit": 99}).status_code, 400)
+
+    def test_follows_saves_and_deletes(self):
+        self.client.get("/api/autocomplete/", {"q": "x"})
+        with self.captureOnCommitCallbacks(execute=True):
+            Song.objects.create(title="Old Man", album=self.album, length=200)
+            self.album.title = "After the Gold Rush"
+            self.album.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.song.delete()
+        labels = lambda q: [s["label"] for s in self.client.get("/api/autocomplete/", {"q": q}).json()]
+        self.assertEqual(labels("old"), ["Old Man"])
+        self.assertEqual(labels("gold"), ["After the Gold Rush"])
+        self.assertEqual(labels("harv"), [])
@@ -0,0 +1,122 @@
+import random
+import shutil
+import tempfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from dottify import charts, plays
+from dottify.models import Album, ChartCheckpoint, Rating, Song
+
+
+class SpaceSavingTests(SimpleTestCase):
+    def test_exact_below_capacity(self):
+        sketch = charts.SpaceSaving(capacity=10)
+        for item, weight in [(1, 3), (2, 1), (1, 2), (3, 4)]:
+            sketch.add(item, weight)
+        self.assertEqual(sketch.top(2), [(1, 5, 0), (3, 4, 0)])
+
+    def test_heavy_hitters_survive_and_errors_bound_counts(self):
+        rng = random.Random(0)
+        sketch = charts.SpaceSaving(capacity=50)
+        true = {}
+        for _ in range(20000):
+            item = rng.randint(0, 9) if rng.random() < 0.5 else rng.randint(10, 100000)
+            sketch.add(item, 1.0)
+            true[item] = true.get(item, 0) + 1
+        self.assertEqual(len(sketch), 50)
+        self.assertEqual({item for item, _, _ in sketch.top(10)}, set(range(10)))
+        for item, count, error in sketch.top(50):
+            self.assertLessEqual(count - error, true[item])
+            self.assertGreaterEqual(count, true[item])
+
+    def test_state_round_trip_and_scaling(self):
+        sketch = charts.SpaceSaving(capacity=3)
+        for item in [1, 1, 2, 3, 4]:
+            sketch.add(item, 1.0)
+        copy = charts.SpaceSaving(3, sketch.state())
+        copy.scale(0.5)
+        self.assertEqual([(i, c * 2, e * 2) for i, c, e in copy.top(3)], sketch.top(3))
+
+
+class ChartTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.live = Album.objects.create(title="Live", artist_name="A", format="LIVE")
+        cls.single = Album.objects.create(title="Single", artist_name="B", format="SNGL")
+        cls.hit = Song.objects.create(title="Hit", album=cls.single, length=200)
+        cls.encore = Song.objects.create(title="Encore", album=cls.live, length=300)
+        cls.deep_cut = Song.objects.create(title="Deep Cut", album=cls.live, length=300)
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings = override_settings(DOTTIFY_PLAYS_DIR=directory)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.now = datetime.now(dt_timezone.utc)
+
+    def play(self, song, times, ago=timedelta(0)):
+        moment = (self.now - ago).timestamp()
+        plays.writer.append(plays.parse_events([{"song": song.id, "timestamp": moment}] * times)[1])
+        plays.writer.flush()
+
+    def test_recent_plays_outrank_old_ones(self):
+        self.play(self.hit, 10, ago=timedelta(days=6))
+        self.play(self.encore, 6)
+        self.play(self.deep_cut, 1)
+        self.assertEqual(charts.update(), (17, 0))
+
+        songs, _ = charts.chart("songs")
+        self.assertEqual([song for song, _ in songs], [self.encore, self.hit, self.deep_cut])
+        self.assertAlmostEqual(songs[0][1], 6, places=2)
+        self.assertAlmostEqual(songs[1][1], 10 * 2 ** (-6 / 7), places=2)
+        live, _ = charts.chart("songs", "LIVE")
+        self.assertEqual([song for song, _ in live], [self.encore, self.deep_cut])
+        albums, _ = charts.chart("albums")
+        self.assertEqual([album for album, _ in albums], [self.live, self.single])
+
+    def test_checkpoint_resumes_without_recounting(self):
+        self.play(self.hit, 2)
+        charts.update()
+        Rating.objects.create(album=self.live, value=5)
+        Rating.objects.create(song=self.deep_cut, value=4)
+        self.play(self.hit, 1)
+        call_command("update_charts", stdout=StringIO())
+        self.assertEqual(charts.update(), (0, 0))
+
+        builder = charts.load()
+        self.assertEqual(builder.last_rating, Rating.objects.latest("id").id)
+        self.assertAlmostEqual(dict((i, c) for i, c, _ in builder.sketches["songs:"].top(5))[self.hit.id], 3, 3)
+        albums, _ = charts.chart("albums")
+        self.assertEqual([album for album, _ in albums], [self.live, self.single])
+        self.assertAlmostEqual(albums[0][1], 9, places=2)
+
+    def test_renormalization_keeps_ranks(self):
+        builder = charts.ChartBuilder()
+        builder.add(self.hit.id, self.single.id, "SNGL", 1.0, builder.landmark)
+        later = builder.landmark + (charts.RENORMALIZE_HALF_LIVES + 1) * charts.HALF_LIFE_MICROS
+        builder.add(self.encore.id, self.live.id, "LIVE", 1.0, later)
+        self.assertEqual(builder.landmark, later)
+        self.assertEqual([item for item, _, _ in builder.sketches["songs:"].top(2)], [self.encore.id, self.hit.id])
+
+    def test_api(self):
+        client = APIClient()
+        self.assertEqual(client.get("/api/charts/songs/").json(), [])
+        self.play(self.encore, 2)
+        self.play(self.hit, 1)
+        charts.update()
+        self.encore.delete()
+
+        response = client.get("/api/charts/songs/")
+        self.assertEqual(response.json(), [
+            {"rank": 1, "id": self.hit.id, "title": "Hit", "album": self.single.id, "score": 1.0},
+        ])
+        self.assertEqual(client.get("/api/charts/songs/", HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+        albums = client.get("/api/charts/albums/", {"album_format": "LIVE"}).json()
+        self.assertEqual([(a["id"], a["score"]) for a in albums], [(self.live.id, 2.0)])
+        self.assertEqual(client.get("/api/charts/albums/", {"album_format": "VINYL"}).status_code, 400)
+        self.assertTrue(ChartCheckpoint.objects.filter(name=charts.CHART_NAME).exists())
@@ -0,0 +1,109 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from dottify.comments import COMMENT_PAGE_SIZE, COMMENT_REPLY_PREVIEW
+from dottify.models import Album, Comment, DottifyUser, Playlist, Song
+
+
+class CommentThreadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="commenter", password="pw123")
+        cls.duser = DottifyUser.objects.create(user=cls.user, display_name="Commenter")
+        cls.album = Album.objects.create(title="Threads", artist_name="Some Artist")
+        cls.song = Song.objects.create(title="Thread Song", album=cls.album, length=100)
+        cls.playlist = Playlist.objects.create(name="Busy Playlist", owner=cls.duser)
+        now = timezone.now()
+        cls.comments = []
+        for i in range(COMMENT_PAGE_SIZE + 5):
+            c = Comment.objects.create(user=cls.duser, playlist=cls.playlist, text=f"comment-{i:03d}")
+            Comment.objects.filter(pk=c.pk).update(created_at=now - timedelta(minutes=100 - i))
+            cls.comments.append(c)
+        cls.newest = cls.comments[-1]
+        for i in range(COMMENT_REPLY_PREVIEW + 2):
+            Comment.objects.create(
+                user=cls.duser, playlist=cls.playlist, parent=cls.newest, text=f"reply-{i:03d}"
+            )
+        Comment.objects.create(user=cls.duser, song=cls.song, text="Song remark")
+
+    def test_playlist_detail_renders_only_first_page(self):
+        resp = self.client.get(f"/playlists/{self.playlist.id}/")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(resp.context["comments"]), COMMENT_PAGE_SIZE)
+        html = resp.content.decode()
+        self.assertIn("comment-024", html)
+        self.assertNotIn("comment-000", html)
+        self.assertIn("Older comments", html)
+
+    def test_playlist_detail_cursor_link_reaches_older_comments(self):
+        resp = self.client.get(f"/playlists/{self.playlist.id}/")
+        next_link = resp.context["comments_paginator"].get_next_link()
+        resp2 = self.client.get(next_link)
+        self.assertEqual(resp2.status_code, 200)
+        self.assertEqual(len(resp2.context["comments"]), 5)
+        self.assertIn("comment-000", resp2.content.decode())
+
+    def test_playlist_detail_invalid_cursor_is_404(self):
+        resp = self.client.get(f"/playlists/{self.playlist.id}/?cursor=garbage")
+        self.assertEqual(resp.status_code, 404)
+
+    def test_playlist_detail_shows_reply_preview(self):
+        resp = self.client.get(f"/playlists/{self.playlist.id}/")
+        html = resp.content.decode()
+        self.assertIn("reply-000", html)
+        self.assertNotIn(f"reply-{COMMENT_REPLY_PREVIEW:03d}", html)
+        self.assertIn(f"{COMMENT_REPLY_PREVIEW + 2} replies in total", html)
+
+    def test_playlist_detail_query_count_is_fixed(self):
+        # playlist+owner, comment page, reply preview.
+        with self.assertNumQueries(3):
+            self.client.get(f"/playlists/{self.playlist.id}/")
+
+    def test_song_detail_shows_song_comments(self):
+        resp = self.client.get(f"/songs/{self.song.id}/")
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn("Song remark", resp.content.decode())
+
+    def test_api_playlist_comments_are_cursor_paginated(self):
+        client = APIClient()
+        resp = client.get(f"/api/playlists/{self.playlist.id}/comments/")
+        self.assertEqual(resp.status_code, 200)
+        body = resp.json()
+        self.assertEqual(len(body["results"]), COMMENT_PAGE_SIZE)
+        self.assertEqual(body["results"][0]["text"], "comment-024")
+        self.assertEqual(body["results"][0]["reply_count"], COMMENT_REPLY_PREVIEW + 2)
+        self.assertEqual(body["results"][0]["display_name"], "Commenter")
+        self.assertIsNotNone(body["next"])
+        body2 = client.get(body["next"]).json()
+        self.assertEqual([c["text"] for c in body2["results"]][-1], "comment-000")
+        self.assertIsNone(body2["next"])
+
+    def test_api_replies_by_parent(self):
+        client = APIClient()
+        resp = client.get(f"/api/playlists/{self.playlist.id}/comments/?parent={self.newest.id}")
+        self.assertEqual(resp.status_code, 200)
+        texts = [c["text"] for c in resp.json()["results"]]
+        self.assertEqual(texts[0], "reply-000")
+        self.assertEqual(len(texts), COMMENT_REPLY_PREVIEW + 2)
+
+    def test_api_song_comments(self):
+        resp = APIClient().get(f"/api/songs/{self.song.id}/comments/")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()["results"][0]["text"], "Song remark")
+
+    def test_api_private_playlist_comments_forbidden_for_others(self):
+        private = Playlist.objects.create(name="Secret", owner=self.duser, visibility=0)
+        client = APIClient()
+        self.assertEqual(client.get(f"/api/playlists/{private.id}/comments/").status_code, 403)
+        client.login(username="commenter", password="pw123")
+        self.assertEqual(client.get(f"/api/playlists/{private.id}/comments/").status_code, 200)
+
+    def test_reply_must_share_parent_target(self):
+        reply = Comment(user=self.duser, song=self.song, parent=self.newest, text="misplaced")
+        with self.assertRaises(ValidationError):
+            reply.full_clean()
@@ -0,0 +1,81 @@
+from django.contrib.auth.models import User
+from django.db import connections
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from dottify.db_router import PIN_COOKIE, ReplicaRouter, replica_reads
+from dottify.models import Album, DottifyUser, Song
+
+
+@override_settings(DOTTIFY_READ_REPLICAS=['replica'])
+class ReplicaRoutingTests(TransactionTestCase):
+    # `replica` mirrors `default` under test, so both see the same rows. The
+    # mirror is a second connection, so it only sees committed data, hence
+    # TransactionTestCase.
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        self.album = Album.objects.create(title="Replica Album", artist_name="Someone")
+        Song.objects.create(title="Replica Song", album=self.album, length=100)
+        user = User.objects.create_user("replica-user", password="pw123")
+        self.duser = DottifyUser.objects.create(user=user, display_name="Replica User")
+
+    def replica_queries(self, fn):
+        with CaptureQueriesContext(connections['replica']) as ctx:
+            response = fn()
+        return response, len(ctx.captured_queries)
+
+    def test_router_only_uses_replica_inside_scope(self):
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_read(Album), 'default')
+        with replica_reads():
+            self.assertEqual(router.db_for_read(Album), 'replica')
+            self.assertIsNone(router.db_for_read(User))
+
+    def test_html_list_and_detail_read_from_replica(self):
+        for url in ["/albums/", f"/albums/{self.album.id}/", "/songs/", "/playlists/"]:
+            response, n = self.replica_queries(lambda: self.client.get(url))
+            self.assertEqual(response.status_code, 200)
+            self.assertGreater(n, 0, url)
+
+    def test_api_list_and_retrieve_read_from_replica(self):
+        client = APIClient()
+        for url in ["/api/albums/", f"/api/albums/{self.album.id}/"]:
+            response, n = self.replica_queries(lambda: client.get(url))
+            self.assertEqual(response.status_code, 200)
+            self.assertGreater(n, 0, url)
+
+    def test_other_views_stay_on_primary(self):
+        _, n = self.replica_queries(lambda: self.client.get("/"))
+        self.assertEqual(n, 0)
+
+    def test_write_pins_following_reads_to_primary(self):
+        client = APIClient()
+        response, n = self.replica_queries(lambda: client.post(
+            "/api/playlists/", {"name": "Fresh", "owner": self.duser.id, "songs": []}, format="json"
+        ))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(n, 0)
+        self.assertIn(PIN_COOKIE, response.cookies)
+        response, n = self.replica_queries(lambda: client.get("/api/playlists/"))
+        self.assertEqual(n, 0)
+        self.assertIn("Fresh", response.content.decode())
+
+    def test_replica_loaded_instances_are_written_to_primary(self):
+        with replica_reads():
+            album = Album.objects.get(pk=self.album.pk)
+            song = Song.objects.get(album=album)
+        self.assertEqual(album._state.db, 'replica')
+        album.title = "Renamed"
+        _, n = self.replica_queries(album.save)
+        self.assertEqual(n, 0)
+        _, n = self.replica_queries(song.delete)
+        self.assertEqual(n, 0)
+        self.assertEqual(Album.objects.get(pk=album.pk).title, "Renamed")
+        self.assertFalse(Song.objects.exists())
+
+    def test_replica_routing_is_off_without_replicas(self):
+        with override_settings(DOTTIFY_READ_REPLICAS=[]):
+            _, n = self.replica_queries(lambda: self.client.get("/albums/"))
+        self.assertEqual(n, 0)
@@ -0,0 +1,54 @@
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+
+from django.test import TestCase
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from dottify.fastserializers import RowMapper, dumps
+from dottify.models import Album, Song
+from dottify.serializers import AlbumSerializer, PlaylistSerializer
+
+
+class FastSerializerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.album = Album.objects.create(
+            title='Quotes " \\ and \u2028 line\tbreaks\x01', artist_name="Björk 🎵",
+            format="LIVE", release_date=date(2001, 2, 3), retail_price=Decimal("7.5"),
+            cover_image="covers/a.png",
+        )
+        Album.objects.create(title="Plain", artist_name="Nobody")
+        for i in (3, 1, 2):
+            Song.objects.create(title=f"Song {i} \u2029", album=cls.album, length=i * 60)
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def drf_bytes(self, path):
+        # An indent parameter forces the DRF path; render its data the default way.
+        response = self.client.get(path, HTTP_ACCEPT="application/json; indent=0")
+        self.assertEqual(response.status_code, 200)
+        return JSONRenderer().render(response.data)
+
+    def test_list_and_detail_bytes_match_serializers(self):
+        for path in ("/api/albums/", f"/api/albums/{self.album.id}/", "/api/songs/"):
+            fast = self.client.get(path)
+            self.assertEqual(fast["Content-Type"], "application/json")
+            self.assertEqual(fast.content, self.drf_bytes(path), path)
+
+    def test_json_fallback_matches_orjson(self):
+        data = RowMapper.compile(AlbumSerializer).represent(Album.objects.order_by("id"))
+        with mock.patch("dottify.fastserializers.orjson", None):
+            self.assertEqual(dumps(data), JSONRenderer().render(data))
+        self.assertEqual(dumps(data), JSONRenderer().render(data))
+
+    def test_album_list_query_count_is_fixed(self):
+        with self.assertNumQueries(3):  # ETag version lookup, albums, songs
+            self.client.get("/api/albums/")
+
+    def test_unsupported_serializers_use_drf(self):
+        # Many-to-many primary keys are not compiled.
+        self.assertIsNone(RowMapper.compile(PlaylistSerializer))
+        self.assertEqual(self.client.get("/api/albums/999999/").status_code, 404)
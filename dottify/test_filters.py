@@ -0,0 +1,101 @@
+from datetime import date
+from decimal import Decimal
+from itertools import combinations
+from types import SimpleNamespace
+
+from django.test import TestCase
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from dottify.filters import (
+    ALBUM_FILTERS,
+    ALBUM_ORDERINGS,
+    SONG_FILTERS,
+    SONG_ORDERINGS,
+    CatalogueFilterBackend,
+)
+from dottify.models import Album, Artist, Song
+
+EQUALITY = {'album_format', 'artist', 'album'}
+SAMPLE_VALUES = {
+    'album_format': 'LIVE', 'year_min': '1990', 'year_max': '1999', 'price_min': '1', 'price_max': '9',
+    'artist': '1', 'length_min': '100', 'length_max': '300', 'album': '1',
+}
+
+
+class CatalogueFilterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.live90 = Album.objects.create(title="B Live", artist_name="X", format="LIVE",
+                                          release_date=date(1994, 3, 1), retail_price=Decimal("9.99"))
+        cls.live00 = Album.objects.create(title="A Live", artist_name="Y", format="LIVE",
+                                          release_date=date(2003, 1, 1), retail_price=Decimal("4.00"))
+        cls.single = Album.objects.create(title="C Single", artist_name="X", format="SNGL",
+                                          release_date=date(1999, 12, 31), retail_price=Decimal("1.50"))
+        cls.undated = Album.objects.create(title="D Undated", artist_name="Y")
+        cls.short = Song.objects.create(title="Short", album=cls.live90, length=90)
+        cls.long = Song.objects.create(title="Long", album=cls.live90, length=400)
+        cls.other = Song.objects.create(title="Other", album=cls.single, length=200)
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def ids(self, path, **params):
+        response = self.client.get(path, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return [row["id"] for row in response.json()]
+
+    def test_album_filters(self):
+        self.assertEqual(self.ids("/api/albums/", album_format="LIVE"), [self.live90.id, self.live00.id])
+        self.assertEqual(self.ids("/api/albums/", album_format="LIVE,SNGL", year_max="1999"),
+                         [self.live90.id, self.single.id])
+        self.assertEqual(self.ids("/api/albums/", year_min="1995", year_max="2005"), [self.live00.id, self.single.id])
+        self.assertEqual(self.ids("/api/albums/", price_min="2", price_max="9.99"), [self.live90.id, self.live00.id])
+        artist = Artist.objects.get(name="X")
+        self.assertEqual(self.ids("/api/albums/", artist=artist.id), [self.live90.id, self.single.id])
+
+    def test_song_filters(self):
+        self.assertEqual(self.ids("/api/songs/", length_min="100"), [self.long.id, self.other.id])
+        self.assertEqual(self.ids("/api/songs/", album=self.live90.id, length_max="100"), [self.short.id])
+
+    def test_orderings(self):
+        self.assertEqual(self.ids("/api/albums/", ordering="title"),
+                         [self.live00.id, self.live90.id, self.single.id, self.undated.id])
+        self.assertEqual(self.ids("/api/albums/", ordering="-retail_price", price_min="0"),
+                         [self.live90.id, self.live00.id, self.single.id])
+        self.assertEqual(self.ids("/api/albums/", ordering="-release_date", year_min="1990"),
+                         [self.live00.id, self.single.id, self.live90.id])
+        self.assertEqual(self.ids("/api/songs/", ordering="-length"), [self.long.id, self.other.id, self.short.id])
+
+    def test_invalid_parameters(self):
+        for params in ({"album_format": "LP"}, {"year_min": "199x"}, {"price_max": "-1"},
+                       {"artist": "0"}, {"ordering": "artist_name"}):
+            self.assertEqual(self.client.get("/api/albums/", params).status_code, 400, params)
+        self.assertEqual(self.client.get("/api/songs/", {"length_min": "long"}).status_code, 400)
+
+    def test_facets_ignore_their_own_filter(self):
+        facets = self.client.get("/api/albums/facets/", {"album_format": "LIVE", "year_max": "1999"}).json()
+        self.assertEqual(facets["format"], [{"value": "LIVE", "count": 1}, {"value": "SNGL", "count": 1}])
+        self.assertEqual(facets["decade"], [{"value": 1990, "count": 1}, {"value": 2000, "count": 1}])
+        everything = self.client.get("/api/albums/facets/").json()
+        self.assertEqual(everything["decade"][-1], {"value": None, "count": 1})
+        self.assertEqual(everything["format"][-1], {"value": None, "count": 1})
+
+    def test_every_combination_uses_an_index(self):
+        """
+        No filter and sort combination scans the table, and single-value
+        equality filters read their index in sort order.
+        """
+        for model, filters, orderings in [(Album, ALBUM_FILTERS, ALBUM_ORDERINGS),
+                                          (Song, SONG_FILTERS, SONG_ORDERINGS)]:
+            view = SimpleNamespace(catalogue_filters=filters, catalogue_orderings=orderings)
+            for size in range(1, len(filters) + 1):
+                for names in combinations(filters, size):
+                    for ordering in orderings:
+                        params = {**{name: SAMPLE_VALUES[name] for name in names}, 'ordering': ordering}
+                        request = Request(APIRequestFactory().get('/', params))
+                        queryset = CatalogueFilterBackend().filter_queryset(request, model.objects.all(), view)
+                        plan = queryset.explain()
+                        self.assertNotIn("SCAN", plan, params)
+                        if EQUALITY.issuperset(names):
+                            self.assertNotIn("TEMP B-TREE", plan, params)
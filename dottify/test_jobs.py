@@ -0,0 +1,145 @@
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+
+from django.contrib.auth.models import Group, User
+from django.core import mail
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+
+from dottify.jobs import JOBS, enqueue, job, requeue_stale, run_pending
+from dottify.models import Album, Job
+from dottify.tasks import COVER_MAX_SIZE
+
+CALLS = []
+
+
+@job(name='test_record_call')
+def record_call(value):
+    CALLS.append(value)
+
+
+@job(name='test_always_fails', max_attempts=2)
+def always_fails():
+    raise RuntimeError("boom")
+
+
+def image_upload(size, name='cover.png'):
+    buffer = BytesIO()
+    Image.new('RGB', size, 'red').save(buffer, format='PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def test_enqueue_and_run(self):
+        record_call.delay(7)
+        self.assertEqual(Job.objects.get().status, Job.QUEUED)
+        self.assertEqual(CALLS, [])
+        self.assertEqual(run_pending(), {Job.DONE: 1})
+        self.assertEqual(CALLS, [7])
+        self.assertEqual(run_pending(), {})
+
+    def test_unknown_job_is_rejected(self):
+        self.assertNotIn('missing', JOBS)
+        with self.assertRaises(KeyError):
+            enqueue('missing')
+
+    def test_failures_are_retried_with_backoff_then_failed(self):
+        always_fails.delay()
+        run_pending()
+        failed = Job.objects.get()
+        self.assertEqual((failed.status, failed.attempts), (Job.QUEUED, 1))
+        self.assertGreater(failed.run_after, timezone.now())
+        self.assertIn("RuntimeError: boom", failed.last_error)
+        # Not due yet.
+        self.assertEqual(run_pending(), {})
+
+        Job.objects.update(run_after=timezone.now())
+        self.assertEqual(run_pending(), {Job.FAILED: 1})
+        self.assertEqual(Job.objects.get().attempts, 2)
+
+    def test_requeue_stale_running_jobs(self):
+        stale = record_call.delay(1)
+        Job.objects.filter(pk=stale.pk).update(status=Job.RUNNING)
+        self.assertEqual(requeue_stale(), 0)
+        Job.objects.filter(pk=stale.pk).update(updated_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(requeue_stale(), 1)
+        self.assertEqual(run_pending(), {Job.DONE: 1})
+
+
+class ViewJobTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="artist", password="pw123", email="artist@example.com")
+        cls.user.groups.add(Group.objects.get_or_create(name="Artist")[0])
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        self.client.login(username="artist", password="pw123")
+
+    def test_help_form_mails_from_worker(self):
+        resp = self.client.post("/help/", {
+            "email": "fan@example.com", "subject": "Hi", "message": "Help me",
+        })
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(Job.objects.get().name, 'send_support_email')
+        run_pending()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].reply_to, ["fan@example.com"])
+        self.assertIn("Hi", mail.outbox[0].subject)
+
+    def shared_cache(self):
+        return override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': tempfile.mkdtemp(dir=self.media),
+        }})
+
+    def test_album_create_resizes_cover_in_background(self):
+        with override_settings(MEDIA_ROOT=self.media), self.shared_cache():
+            resp = self.client.post("/albums/new/", {
+                "title": "Big Cover", "artist_name": "Artist", "format": "SNGL",
+                "cover_image": image_upload((COVER_MAX_SIZE * 2, COVER_MAX_SIZE)),
+            })
+            self.assertEqual(resp.status_code, 302)
+            album = Album.objects.get(title="Big Cover")
+            self.assertEqual(album.cover_image.width, COVER_MAX_SIZE * 2)
+            self.assertEqual(list(Job.objects.values_list('name', flat=True)), ['process_cover'])
+
+            self.assertEqual(run_pending(), {Job.DONE: 2})
+            original = album.cover_image.name
+            album.refresh_from_db()
+            self.assertEqual((album.cover_image.width, album.cover_image.height),
+                             (COVER_MAX_SIZE, COVER_MAX_SIZE // 2))
+            self.assertNotEqual(album.cover_image.name, original)
+            self.assertFalse(album.cover_image.storage.exists(original))
+            self.assertEqual(Job.objects.filter(name='warm_album_pages').count(), 1)
+
+    def test_album_create_without_cover_only_warms(self):
+        with self.shared_cache():
+            self.client.post("/albums/new/", {"title": "No Cover", "artist_name": "Artist", "format": "SNGL"})
+            self.assertEqual(list(Job.objects.values_list('name', flat=True)), ['warm_album_pages'])
+            self.assertEqual(run_pending(), {Job.DONE: 1})
+
+    def test_no_warming_without_a_shared_cache(self):
+        # The default per-process LocMemCache would only warm the worker.
+        self.client.post("/albums/new/", {"title": "No Cover", "artist_name": "Artist", "format": "SNGL"})
+        self.assertFalse(Job.objects.exists())
+
+
+class WorkerPoolTests(TransactionTestCase):
+    def test_run_jobs_command_uses_thread_pool(self):
+        CALLS.clear()
+        for i in range(5):
+            record_call.delay(i)
+        call_command('run_jobs', '--once', '--workers', '3', stdout=StringIO())
+        self.assertEqual(sorted(CALLS), list(range(5)))
+        self.assertEqual(Job.objects.filter(status=Job.DONE).count(), 5)
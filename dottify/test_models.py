@@ -36,3 +36,34 @@ class DottifyModelTests(TestCase):
 
     def test_album_allows_null_price(self):
         self.assertIsNone(self.album.retail_price)
+
+
+class ArtistTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('artist', password='pw')
+        self.duser = DottifyUser.objects.create(user=self.user, display_name='The Band')
+
+    def test_album_save_links_artist_owned_by_matching_profile(self):
+        album = Album.objects.create(title='First', artist_name='The Band')
+        self.assertEqual(album.artist.name, 'The Band')
+        self.assertEqual(album.artist.user, self.duser)
+        second = Album.objects.create(title='Second', artist_name='The Band')
+        self.assertEqual(second.artist_id, album.artist_id)
+
+    def test_changing_artist_name_moves_album(self):
+        album = Album.objects.create(title='First', artist_name='The Band')
+        album.artist_name = 'Someone Else'
+        album.save(update_fields=['artist_name'])
+        album.refresh_from_db()
+        self.assertEqual(album.artist.name, 'Someone Else')
+        self.assertIsNone(album.artist.user)
+
+    def test_new_profile_claims_unowned_artist(self):
+        album = Album.objects.create(title='Demo', artist_name='Newcomer')
+        self.assertIsNone(album.artist.user)
+        duser = DottifyUser.objects.create(
+            user=User.objects.create_user('newcomer', password='pw'),
+            display_name='Newcomer',
+        )
+        album.artist.refresh_from_db()
+        self.assertEqual(album.artist.user, duser)
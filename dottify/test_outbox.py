@@ -0,0 +1,121 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+
+from dottify.models import (
+    Album,
+    AlbumNeighbour,
+    AlbumStats,
+    ChangeEvent,
+    ConsumerCheckpoint,
+    DottifyUser,
+    Playlist,
+    Rating,
+    Song,
+    SongNeighbour,
+)
+from dottify.outbox import apply_events, consume, prune
+from dottify.recommendations import build_similarity
+
+
+class OutboxTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username="listener", password="pw123")
+        cls.owner = DottifyUser.objects.create(user=user, display_name="Listener")
+        cls.albums = [Album.objects.create(title=f"Album {i}", artist_name="Artist") for i in range(3)]
+        cls.songs = [Song.objects.create(title=f"Song {i}", album=a, length=100) for i, a in enumerate(cls.albums)]
+
+    def events(self):
+        return list(ChangeEvent.objects.values_list('model', 'action', 'payload'))
+
+    def test_signals_record_events(self):
+        ChangeEvent.objects.all().delete()
+        a, b, c = self.songs
+        playlist = Playlist.objects.create(name="Mix", owner=self.owner)
+        playlist.songs.add(a, b)
+        c.playlists.add(playlist)
+        playlist.songs.remove(a)
+        playlist.songs.clear()
+        Rating.objects.create(album=self.albums[0], value=4)
+        playlist_id = playlist.id
+        playlist.songs.add(a)
+        playlist.delete()
+        self.assertEqual(self.events(), [
+            ('playlist', 'create', {}),
+            ('playlist', 'songs', {'songs': [a.id, b.id]}),
+            ('playlist', 'songs', {'songs': [c.id]}),
+            ('playlist', 'songs', {'songs': [a.id]}),
+            ('playlist', 'songs', {'songs': [b.id, c.id]}),
+            ('rating', 'create', {'album': self.albums[0].id, 'song': None}),
+            ('playlist', 'songs', {'songs': [a.id]}),
+            ('playlist', 'delete', {'songs': [a.id]}),
+        ])
+        self.assertTrue(all(e.object_id == playlist_id for e in ChangeEvent.objects.filter(model='playlist')))
+
+    def test_consume_matches_full_rebuild(self):
+        a, b, c = self.songs
+        for songs in ([a, b], [a, b, c], [b, c]):
+            Playlist.objects.create(name="p", owner=self.owner).songs.set(songs)
+        Rating.objects.create(album=self.albums[1], value=3)
+        Rating.objects.create(album=self.albums[1], value=5)
+
+        self.assertEqual(consume(), ChangeEvent.objects.count())
+        incremental = list(AlbumNeighbour.objects.values_list('album', 'neighbour', 'rank', 'score'))
+        song_rows = list(SongNeighbour.objects.values_list('song', 'neighbour', 'rank', 'score'))
+        build_similarity()
+        self.assertEqual(incremental, list(AlbumNeighbour.objects.values_list('album', 'neighbour', 'rank', 'score')))
+        self.assertEqual(song_rows, list(SongNeighbour.objects.values_list('song', 'neighbour', 'rank', 'score')))
+
+        stats = AlbumStats.objects.get(album=self.albums[1])
+        self.assertEqual((stats.rating_count, stats.rating_total, stats.playlist_count), (2, 8, 3))
+        self.assertEqual(stats.rating_average, 4)
+
+    def test_moves_refresh_the_old_album_too(self):
+        a, b, _ = self.songs
+        Playlist.objects.create(name="p", owner=self.owner).songs.set([a, b])
+        rating = Rating.objects.create(album=self.albums[1], value=5)
+        consume()
+        self.assertTrue(AlbumNeighbour.objects.filter(album=self.albums[1]).exists())
+
+        ChangeEvent.objects.all().delete()
+        b.album = rating.album = self.albums[2]
+        b.save()
+        rating.save()
+        b.title = "Renamed"
+        b.save()
+        self.assertEqual([payload for _, _, payload in self.events()], [
+            {'album': self.albums[2].id, 'previous_album': self.albums[1].id},
+            {'album': self.albums[2].id, 'previous_album': self.albums[1].id, 'song': None},
+            {'album': self.albums[2].id},
+        ])
+        consume()
+        self.assertFalse(AlbumNeighbour.objects.filter(album=self.albums[1]).exists())
+        self.assertEqual(AlbumStats.objects.get(album=self.albums[1]).rating_count, 0)
+        self.assertEqual(AlbumStats.objects.get(album=self.albums[2]).rating_count, 1)
+
+    def test_consume_is_checkpointed_and_idempotent(self):
+        a, b, _ = self.songs
+        playlist = Playlist.objects.create(name="p", owner=self.owner)
+        playlist.songs.set([a, b])
+        consume(batch_size=1)
+        last = ChangeEvent.objects.latest('id').id
+        self.assertEqual(ConsumerCheckpoint.objects.get(name='derived').last_event_id, last)
+        self.assertEqual(consume(), 0)
+
+        before = list(SongNeighbour.objects.values_list('song', 'neighbour', 'score'))
+        # A crash after applying but before checkpointing replays the batch.
+        apply_events(ChangeEvent.objects.all())
+        self.assertEqual(before, list(SongNeighbour.objects.values_list('song', 'neighbour', 'score')))
+
+        playlist.songs.remove(b)
+        consume()
+        self.assertFalse(SongNeighbour.objects.exists())
+
+    def test_command_and_prune(self):
+        Playlist.objects.create(name="p", owner=self.owner).songs.set(self.songs[:2])
+        call_command('consume_changes', '--prune', stdout=StringIO())
+        self.assertFalse(ChangeEvent.objects.exists())
+        self.assertEqual(prune(), 0)
@@ -0,0 +1,81 @@
+from datetime import date
+from decimal import Decimal
+
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from dottify.models import Album, Song
+from dottify.packing import from_columns, packb, to_columns, unpackb
+from dottify.renderers import MSGPACK
+
+
+class PackingTests(SimpleTestCase):
+    def test_matches_reference_encoding(self):
+        # The example from msgpack.org.
+        self.assertEqual(packb({"compact": True, "schema": 0}), b"\x82\xa7compact\xc3\xa6schema\x00")
+
+    def test_round_trip_at_type_boundaries(self):
+        values = [
+            None, True, False, 0, 127, 128, 255, 256, 65535, 65536, 2 ** 32, 2 ** 64 - 1,
+            -1, -32, -33, -128, -129, -32768, -32769, -2 ** 63, 1.5, -0.0,
+            "", "x" * 31, "x" * 32, "é" * 200, "x" * 70000, b"\x00\xff",
+            list(range(16)), {str(i): i for i in range(16)}, [[], {}],
+        ]
+        for value in values:
+            self.assertEqual(unpackb(packb(value)), value, repr(value)[:40])
+
+    def test_non_plain_values_are_converted_like_json(self):
+        self.assertEqual(unpackb(packb([date(2020, 1, 2), Decimal("1.50")])), ["2020-01-02", 1.5])
+
+    def test_malformed_input_is_rejected(self):
+        for data in (b"", b"\x92\x01", b"\xa5ab", b"\x01\x02", b"\xc1", b"\xd4\x00\x00"):
+            with self.assertRaises(ValueError, msg=data):
+                unpackb(data)
+
+    def test_columns_round_trip(self):
+        rows = [
+            {"id": 1, "title": "a", "song_set": [{"id": 10, "length": 5}]},
+            {"id": 2, "title": "b", "song_set": []},
+        ]
+        columns = to_columns(rows)
+        self.assertEqual(columns["id"], [1, 2])
+        self.assertEqual(columns["song_set"], [{"id": [10], "length": [5]}, {}])
+        self.assertEqual(from_columns(columns), rows)
+
+
+class MessagePackAPITests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.album = Album.objects.create(title="Packed", artist_name="Packer", retail_price=Decimal("3.00"))
+        for i in range(3):
+            Song.objects.create(title=f"Packed {i}", album=cls.album, length=100 + i)
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_lists_carry_the_same_data_as_json(self):
+        for path in ("/api/albums/", "/api/songs/", "/api/playlists/", f"/api/albums/{self.album.id}/"):
+            expected = self.client.get(path).json()
+            response = self.client.get(path, HTTP_ACCEPT=MSGPACK)
+            self.assertEqual(response["Content-Type"], MSGPACK)
+            self.assertEqual(unpackb(response.content), expected, path)
+
+    def test_columns_layout(self):
+        response = self.client.get("/api/songs/", HTTP_ACCEPT=f"{MSGPACK}; layout=columns")
+        columns = unpackb(response.content)
+        self.assertEqual(list(columns), ["id", "title", "length", "album"])
+        self.assertEqual(columns["length"], [100, 101, 102])
+        self.assertEqual(from_columns(columns), self.client.get("/api/songs/").json())
+
+    def test_etag_differs_per_media_type(self):
+        tags = {self.client.get("/api/songs/", HTTP_ACCEPT=accept)["ETag"]
+                for accept in ("application/json", MSGPACK, f"{MSGPACK}; layout=columns")}
+        self.assertEqual(len(tags), 3)
+
+    def test_upload(self):
+        body = packb({"title": "Uploaded", "length": 42, "album": self.album.id})
+        response = self.client.post("/api/songs/", body, content_type=MSGPACK, HTTP_ACCEPT=MSGPACK)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(unpackb(response.content)["title"], "Uploaded")
+        bad = self.client.post("/api/songs/", b"\x92\x01", content_type=MSGPACK)
+        self.assertEqual(bad.status_code, 400)
@@ -0,0 +1,128 @@
+import shutil
+import tempfile
+from datetime import date, datetime, timezone as dt_timezone
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+
+from dottify import plays
+from dottify.models import Album, AlbumDailyPlays, PlayRollup, Song, SongDailyPlays
+from dottify.packing import packb
+from dottify.renderers import MSGPACK
+
+NOW = datetime(2026, 10, 19, 12, 0, tzinfo=dt_timezone.utc)
+TODAY = date(2026, 10, 19)
+
+
+class PlayTestCase(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings = override_settings(DOTTIFY_PLAYS_DIR=directory)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+
+class ParseEventsTests(PlayTestCase):
+    def test_events_are_packed_per_day(self):
+        count, by_day = plays.parse_events([
+            {"user": 3, "song": 7, "timestamp": "2026-10-19T11:00:00Z", "duration": 180.5},
+            {"user": None, "song": 8, "timestamp": "2026-10-18T23:59:59.5", "duration": 1},
+            {"song": 9, "timestamp": NOW.timestamp() - 60},
+        ], now=NOW)
+        self.assertEqual(count, 3)
+        records = {plays.day_of(day * plays.DAY_MICROS): list(plays.RECORD.iter_unpack(data))
+                   for day, data in by_day.items()}
+        self.assertEqual([(user, song, duration) for user, song, _, duration in records[TODAY]],
+                         [(3, 7, 180500), (0, 9, 0)])
+        self.assertEqual(records[date(2026, 10, 18)][0][1], 8)
+
+    def test_bad_events_reject_the_batch(self):
+        good = {"user": 1, "song": 1, "timestamp": "2026-10-19T11:00:00Z"}
+        for bad in ({"song": 1}, {**good, "song": "1"}, {**good, "song": 0}, {**good, "user": -1},
+                    {**good, "timestamp": "yesterday"}, {**good, "timestamp": "2026-09-01T00:00:00Z"},
+                    {**good, "timestamp": "2026-10-19T13:00:00Z"}, {**good, "duration": -1},
+                    {**good, "duration": True}, {**good, "song": 1 << 63}, {**good, "user": 1 << 63},
+                    "play"):
+            with self.assertRaises(ValidationError, msg=bad):
+                plays.parse_events([good, bad], now=NOW)
+        with self.assertRaises(ValidationError):
+            plays.parse_events({"events": []}, now=NOW)
+        with self.assertRaises(ValidationError):
+            plays.parse_events([good] * (plays.PLAY_BATCH_LIMIT + 1), now=NOW)
+
+
+class PlayWriterTests(PlayTestCase):
+    def test_segments_rotate_and_torn_records_are_ignored(self):
+        writer = plays.PlayWriter(flush_interval=0, segment_bytes=plays.RECORD.size * 2)
+        events = [{"song": i, "timestamp": NOW.timestamp()} for i in range(1, 6)]
+        writer.append(plays.parse_events(events, now=NOW)[1])
+        self.assertEqual(plays.stored_events(TODAY), 0)
+        self.assertEqual(writer.flush(), 5)
+        writer.append(plays.parse_events(events[:1], now=NOW)[1])
+        writer.flush()
+
+        paths = plays.segment_paths(TODAY)
+        self.assertEqual(len(paths), 2)
+        with open(paths[-1], 'ab') as f:
+            f.write(b'\x01\x02\x03')
+        self.assertEqual([song for _, song, _, _ in plays.read_events(TODAY)], [1, 2, 3, 4, 5, 1])
+        self.assertEqual(plays.stored_events(TODAY), 6)
+
+    def test_flushes_once_buffer_is_full(self):
+        writer = plays.PlayWriter(flush_bytes=plays.RECORD.size * 3, flush_interval=0)
+        for i in range(1, 4):
+            writer.append(plays.parse_events([{"song": i, "timestamp": NOW.timestamp()}], now=NOW)[1])
+        self.assertEqual(plays.stored_events(TODAY), 3)
+
+
+class PlayIngestionTests(PlayTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.album = Album.objects.create(title="Played", artist_name="Artist")
+        cls.first = Song.objects.create(title="First", album=cls.album, length=200)
+        cls.second = Song.objects.create(title="Second", album=cls.album, length=200)
+
+    def post(self, events, **kwargs):
+        return APIClient().post("/api/plays/", {"events": events}, format="json", **kwargs)
+
+    def test_api_and_roll_up(self):
+        now = datetime.now(dt_timezone.utc)
+        events = [
+            {"user": 1, "song": self.first.id, "timestamp": now.isoformat(), "duration": 100},
+            {"user": 2, "song": self.first.id, "timestamp": now.isoformat(), "duration": 50.5},
+            {"user": 1, "song": self.second.id, "timestamp": now.isoformat(), "duration": 10},
+            {"user": 1, "song": 999999, "timestamp": now.isoformat(), "duration": 10},
+        ]
+        response = self.post(events)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json(), {"accepted": 4})
+        packed = APIClient().post("/api/plays/", packb({"events": events[:1]}), content_type=MSGPACK)
+        self.assertEqual(packed.status_code, 202)
+        self.assertEqual(self.post([{"song": self.first.id}]).status_code, 400)
+        self.assertEqual(self.post([{**events[0], "song": 1 << 63}]).status_code, 400)
+        plays.writer.flush()
+
+        day = now.date()
+        self.assertEqual(plays.pending_days(), [day])
+        call_command("roll_up_plays", stdout=StringIO())
+        self.assertEqual(plays.pending_days(), [])
+        self.assertEqual(PlayRollup.objects.get(day=day).events, 5)
+        self.assertEqual(
+            set(SongDailyPlays.objects.values_list("song", "day", "plays", "seconds")),
+            {(self.first.id, day, 3, 250), (self.second.id, day, 1, 10)},
+        )
+        self.assertEqual(
+            list(AlbumDailyPlays.objects.values_list("album", "plays", "seconds")),
+            [(self.album.id, 4, 260)],
+        )
+
+        self.post(events[2:3])
+        plays.writer.flush()
+        self.assertEqual(plays.pending_days(), [day])
+        plays.roll_up(day)
+        self.assertEqual(SongDailyPlays.objects.get(song=self.second).plays, 2)
+        self.assertEqual(SongDailyPlays.objects.count(), 2)
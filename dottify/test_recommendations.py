@@ -0,0 +1,86 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from dottify.models import Album, AlbumNeighbour, DottifyUser, Playlist, Song, SongNeighbour
+from dottify.recommendations import build_similarity
+
+
+class ScoringTests(TestCase):
+    def build(self, *playlists, **options):
+        user = User.objects.create_user(username="scorer")
+        owner = DottifyUser.objects.create(user=user, display_name="Scorer")
+        album = Album.objects.create(title="Scored", artist_name="Artist")
+        songs = {n: Song.objects.create(title=f"S{n}", album=album) for n in sorted(set().union(*playlists))}
+        for i, numbers in enumerate(playlists):
+            Playlist.objects.create(name=f"p{i}", owner=owner).songs.set([songs[n] for n in numbers])
+        build_similarity(**options)
+        ids = {song.id: n for n, song in songs.items()}
+        top = {}
+        for song, neighbour, score in SongNeighbour.objects.order_by('song', 'rank').values_list(
+                'song', 'neighbour', 'score'):
+            top.setdefault(ids[song], []).append((ids[neighbour], score))
+        return top
+
+    def test_cosine_scores_and_top_k(self):
+        top = self.build({1, 2, 3}, {1, 2}, {1, 4}, top_k=2, chunk_size=1)
+        # 1 and 2 share two playlists; n(1)=3, n(2)=2.
+        self.assertEqual(top[1][0][0], 2)
+        self.assertAlmostEqual(top[1][0][1], 2 / (3 * 2) ** 0.5)
+        self.assertEqual(len(top[1]), 2)
+        self.assertEqual([n for n, _ in top[3]], [2, 1])
+        self.assertEqual(top[4], [(1, 1 / 3 ** 0.5)])
+
+    def test_ties_keep_lower_ids(self):
+        self.assertEqual(self.build({7, 5, 6}, top_k=1)[5], [(6, 1.0)])
+
+    def test_min_support(self):
+        self.assertEqual(self.build({1, 2, 3}, {1, 2}, min_support=2), {1: [(2, 1.0)], 2: [(1, 1.0)]})
+
+
+class SimilarAlbumsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username="curator", password="pw123")
+        owner = DottifyUser.objects.create(user=user, display_name="Curator")
+        cls.albums = [Album.objects.create(title=f"Album {i}", artist_name="Artist") for i in range(4)]
+        cls.songs = [Song.objects.create(title=f"Song {i}", album=a, length=100) for i, a in enumerate(cls.albums)]
+        a, b, c, d = cls.songs
+        for name, songs in [("p1", [a, b]), ("p2", [a, b, c]), ("p3", [a, c]), ("long", [a, b, c, d])]:
+            playlist = Playlist.objects.create(name=name, owner=owner)
+            playlist.songs.set(songs)
+
+    def test_build_skips_long_playlists_and_chunks(self):
+        stats = build_similarity(top_k=5, chunk_size=1, max_items=3)
+        self.assertEqual(stats['playlists'], 4)
+        self.assertEqual(stats['skipped'], 1)
+        first = self.albums[0]
+        ranked = list(AlbumNeighbour.objects.filter(album=first).values_list('neighbour_id', flat=True))
+        self.assertEqual(ranked, [self.albums[1].id, self.albums[2].id])
+        # The fourth album only appears in the skipped playlist.
+        self.assertFalse(AlbumNeighbour.objects.filter(album=self.albums[3]).exists())
+        self.assertTrue(SongNeighbour.objects.filter(song=self.songs[0]).exists())
+
+    def test_rebuild_replaces_previous_rows(self):
+        build_similarity()
+        count = AlbumNeighbour.objects.count()
+        build_similarity()
+        self.assertEqual(AlbumNeighbour.objects.count(), count)
+
+    def test_similar_endpoint_is_one_query(self):
+        build_similarity(max_items=3)
+        client = APIClient()
+        with self.assertNumQueries(1):
+            resp = client.get(f"/api/albums/{self.albums[0].id}/similar/")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual([row['id'] for row in resp.data], [self.albums[1].id, self.albums[2].id])
+        self.assertEqual(resp.data[0]['rank'], 1)
+        self.assertEqual(resp.data[0]['title'], "Album 1")
+
+    def test_similar_endpoint_empty_and_missing(self):
+        client = APIClient()
+        resp = client.get(f"/api/albums/{self.albums[3].id}/similar/")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data, [])
+        self.assertEqual(client.get("/api/albums/999999/similar/").status_code, 404)
+        self.assertEqual(client.get("/api/albums/abc/similar/").status_code, 404)
@@ -0,0 +1,40 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+
+from dottify.models import Album, DottifyUser, Playlist, Song
+from dottify.rows import AlbumRow, PlaylistRow, project
+
+
+class RowRecordTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.album = Album.objects.create(title="Projected", artist_name="Rows", retail_price=Decimal("9.50"))
+        Song.objects.create(title="Row Song", album=cls.album, length=100)
+        for i in range(5):
+            owner = DottifyUser.objects.create(user=User.objects.create_user(f"owner{i}"), display_name=f"Owner {i}")
+            Playlist.objects.create(name=f"Public {i}", owner=owner, visibility=2)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_project_reads_only_the_record_columns(self):
+        [row] = project(Album.objects.all(), AlbumRow)
+        self.assertEqual((row.pk, row.title, row.retail_price), (self.album.id, "Projected", Decimal("9.50")))
+        self.assertFalse(hasattr(row, "__dict__"))
+        self.assertEqual(row.updated_at, Album.objects.get().updated_at)
+        names = {row.owner_name for row in project(Playlist.objects.all(), PlaylistRow)}
+        self.assertEqual(names, {f"Owner {i}" for i in range(5)})
+
+    def test_list_pages_render_records(self):
+        html = self.client.get("/albums/").content.decode()
+        self.assertIn(f'<a href="/albums/{self.album.id}/">Projected</a> – Rows', html)
+        self.assertIn("(£9.50)", html)
+        self.assertIn("Total results found: 1", self.client.get("/songs/").content.decode())
+        # Owners are joined in rather than fetched per playlist.
+        with self.assertNumQueries(1):
+            html = self.client.get("/playlists/").content.decode()
+        self.assertIn("(owner: Owner 4,", html)
+        self.assertIn("Public 4 by Owner 4", self.client.get("/").content.decode())
@@ -0,0 +1,48 @@
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from dottify import search
+from dottify.models import Album, SearchTrigram, Song
+
+
+class TrigramTests(SimpleTestCase):
+    def test_trigrams(self):
+        self.assertEqual(search.trigrams("Mac!"), {"  m", " ma", "mac", "ac "})
+        self.assertEqual(search.trigrams("  "), set())
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.rumours = Album.objects.create(title="Rumours", artist_name="Fleetwood Mac")
+        cls.moon = Album.objects.create(title="The Dark Side of the Moon", artist_name="Pink Floyd")
+        cls.song = Song.objects.create(title="Brain Damage", album=cls.moon, length=228)
+        User.objects.create_user(username="searcher", password="pw123")
+
+    def test_misspellings_match(self):
+        self.assertEqual(search.search_albums("Flettwood Mac"), [self.rumours])
+        self.assertEqual(search.search_albums("Dark Side of Moon"), [self.moon])
+        self.assertEqual(search.search_albums("Zappa"), [])
+        [match] = search.search("brain damsge")
+        self.assertEqual((match.field, match.object_id), (SearchTrigram.SONG_TITLE, self.song.id))
+
+    def test_postings_follow_saves_and_deletes(self):
+        self.moon.title = "Wish You Were Here"
+        self.moon.save()
+        self.assertEqual(search.search_albums("wish you were her"), [self.moon])
+        self.assertEqual(search.search_albums("dark side"), [])
+        self.moon.delete()
+        self.assertFalse(SearchTrigram.objects.filter(field=SearchTrigram.ALBUM_TITLE, object_id=self.moon.id).exists())
+        self.assertFalse(SearchTrigram.objects.filter(field=SearchTrigram.SONG_TITLE, object_id=self.song.id).exists())
+
+    def test_rebuild_matches_incremental_index(self):
+        postings = set(SearchTrigram.objects.values_list('trigram', 'field', 'object_id'))
+        self.assertEqual(search.rebuild(), len(postings))
+        self.assertEqual(set(SearchTrigram.objects.values_list('trigram', 'field', 'object_id')), postings)
+
+    def test_endpoints(self):
+        self.client.login(username="searcher", password="pw123")
+        self.assertEqual(self.client.get("/albums/search/", {"q": "rumors"}).content.decode(), "Rumours")
+        data = APIClient().get("/api/search/", {"q": "pink floid"}).json()
+        self.assertEqual(data, [{"field": "album_artist", "id": self.moon.id, "text": "Pink Floyd", "score": 0.727}])
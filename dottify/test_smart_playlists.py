@@ -0,0 +1,132 @@
+from datetime import date, timedelta
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+
+from dottify.jobs import run_pending
+from dottify.models import Album, DottifyUser, Job, Playlist, Rating, Song
+from dottify.smart_playlists import matching_songs, parse_rules
+
+LIVE_CLASSICS = {"album_format": "LIVE", "year_max": 1979, "length_max": 299}
+TOP_RATED = {"rated_within_days": 7, "min_rating": 4}
+
+
+class SmartPlaylistTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username="curator", password="pw123")
+        cls.owner = DottifyUser.objects.create(user=user, display_name="Curator")
+        cls.live_70s = Album.objects.create(title="Live 1975", artist_name="A", format="LIVE",
+                                            release_date=date(1975, 5, 1))
+        cls.live_80s = Album.objects.create(title="Live 1985", artist_name="A", format="LIVE",
+                                            release_date=date(1985, 5, 1))
+        cls.studio = Album.objects.create(title="Studio", artist_name="B", format="SNGL",
+                                          release_date=date(1970, 1, 1))
+        cls.short = Song.objects.create(title="Short", album=cls.live_70s, length=200)
+        cls.long = Song.objects.create(title="Long", album=cls.live_70s, length=400)
+        cls.later = Song.objects.create(title="Later", album=cls.live_80s, length=200)
+        cls.single = Song.objects.create(title="Single", album=cls.studio, length=180)
+
+    def smart(self, rules):
+        playlist = Playlist.objects.create(name="Smart", owner=self.owner, rules=rules)
+        run_pending()
+        return playlist
+
+    def members(self, playlist):
+        return set(playlist.songs.values_list('title', flat=True))
+
+    def assertMaterialized(self, playlist):
+        playlist.refresh_from_db()
+        self.assertEqual(set(playlist.songs.all()), set(matching_songs(playlist.rules)))
+
+    def test_rules_are_materialized_on_save(self):
+        self.assertEqual(self.members(self.smart(LIVE_CLASSICS)), {"Short"})
+
+    def test_only_changed_rules_are_materialized(self):
+        playlist = self.smart(LIVE_CLASSICS)
+        playlist.name = "Renamed"
+        playlist.save()
+        Playlist.objects.get(pk=playlist.pk).save()
+        self.assertFalse(Job.objects.filter(status=Job.QUEUED).exists())
+
+        playlist.rules = {"length_min": 300}
+        playlist.save()
+        self.assertEqual(self.members(playlist), {"Short"})
+        self.assertEqual(run_pending(), {Job.DONE: 1})
+        self.assertEqual(self.members(playlist), {"Long"})
+
+    def test_song_and_album_changes_update_membership(self):
+        playlist = self.smart(LIVE_CLASSICS)
+        self.long.length = 250
+        self.long.save()
+        self.assertEqual(self.members(playlist), {"Short", "Long"})
+
+        self.live_80s.release_date = date(1979, 12, 31)
+        self.live_80s.save()
+        self.assertEqual(self.members(playlist), {"Short", "Long", "Later"})
+
+        self.live_70s.format = "DLUX"
+        self.live_70s.save()
+        self.assertEqual(self.members(playlist), {"Later"})
+
+        Song.objects.create(title="New", album=self.live_80s, length=100)
+        self.single.album = self.live_80s
+        self.single.save()
+        self.assertEqual(self.members(playlist), {"Later", "New", "Single"})
+        self.assertMaterialized(playlist)
+
+    def test_rating_window(self):
+        playlist = self.smart(TOP_RATED)
+        self.assertEqual(self.members(playlist), set())
+        Rating.objects.create(album=self.studio, value=5)
+        self.assertEqual(self.members(playlist), {"Single"})
+        low = Rating.objects.create(album=self.studio, value=2)
+        self.assertEqual(self.members(playlist), set())
+        low.delete()
+        self.assertEqual(self.members(playlist), {"Single"})
+
+        # Ratings age out without any row changing; the daily refresh
+        # catches them.
+        Rating.objects.update(created_at=timezone.now() - timedelta(days=8))
+        self.assertEqual(self.members(playlist), {"Single"})
+        call_command("refresh_smart_playlists", stdout=StringIO())
+        self.assertEqual(self.members(playlist), set())
+
+    def test_unrelated_playlists_are_untouched(self):
+        manual = Playlist.objects.create(name="Manual", owner=self.owner)
+        manual.songs.add(self.long)
+        playlist = self.smart(LIVE_CLASSICS)
+        self.long.length = 100
+        self.long.save()
+        self.assertEqual(self.members(manual), {"Long"})
+        self.assertEqual(self.members(playlist), {"Short", "Long"})
+
+    def test_parse_rules(self):
+        self.assertEqual(parse_rules({"album_format": ["LIVE", "COMP"], "length_min": 60}),
+                         {"album__format__in": ["LIVE", "COMP"], "length__gte": 60})
+        for bad in ([], {"colour": "red"}, {"length_max": -1}, {"min_rating": 4},
+                    {"rated_within_days": 7, "min_rating": "high"}):
+            with self.assertRaises(ValidationError, msg=bad):
+                parse_rules(bad)
+
+    def test_api(self):
+        client = APIClient()
+        response = client.post("/api/playlists/", {"name": "Smart", "owner": self.owner.id,
+                                                   "rules": LIVE_CLASSICS}, format="json")
+        self.assertEqual(response.status_code, 201)
+        path = f"/api/playlists/{response.json()['id']}/"
+        run_pending()
+        self.assertEqual(client.get(path).json()["songs"], [self.short.id])
+
+        rejected = client.patch(path, {"songs": [self.long.id]}, format="json")
+        self.assertEqual(rejected.status_code, 400)
+        invalid = client.patch(path, {"rules": {"length_max": "long"}}, format="json")
+        self.assertEqual(invalid.status_code, 400)
+        client.patch(path, {"rules": {"length_min": 300}}, format="json")
+        run_pending()
+        self.assertEqual(client.get(path).json()["songs"], [self.long.id])
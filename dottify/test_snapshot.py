@@ -0,0 +1,86 @@
+import os
+import shutil
+import tempfile
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from dottify.models import Album, DottifyUser, Playlist, Rating, Song
+from dottify.snapshot import Snapshot, SnapshotError, write_snapshot
+
+
+class CatalogueSnapshotTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        owner = DottifyUser.objects.create(
+            user=User.objects.create_user(username="snap", password="pw123"),
+            display_name="Snap",
+        )
+        cls.first = Album.objects.create(
+            title="Café Sessions", artist_name="Ünïcode Band", format="LIVE",
+            release_date=date(1999, 12, 31), retail_price=Decimal("12.50"),
+            cover_image="covers/cafe.jpg",
+        )
+        cls.second = Album.objects.create(title="Bare", artist_name="Ünïcode Band")
+        cls.empty = Album.objects.create(title="No Songs", artist_name="Other", retail_price=Decimal("0.05"))
+        cls.songs = [
+            Song.objects.create(title=f"Track {i}", album=album, length=100 + i)
+            for i, album in enumerate([cls.second, cls.first, cls.second, cls.first])
+        ]
+        playlist = Playlist.objects.create(name="Mix", owner=owner)
+        playlist.songs.set(cls.songs[:2])
+        Rating.objects.create(user=owner, album=cls.first, value=4)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "snapshot")
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_columns_round_trip(self):
+        counts = write_snapshot(self.path, chunk_size=2)
+        self.assertEqual(counts, {'album': 3, 'song': 4, 'playlist': 1, 'playlist_song': 2, 'rating': 1})
+        snapshot = Snapshot(self.path)
+        albums = snapshot['album']
+        self.assertEqual(list(albums['id'].values), [self.first.id, self.second.id, self.empty.id])
+        self.assertEqual(albums['title'][0], "Café Sessions")
+        self.assertEqual([albums['artist_name'][i] for i in range(3)], ["Ünïcode Band", "Ünïcode Band", "Other"])
+        self.assertEqual(albums['format'][1], None)
+        self.assertEqual(albums['retail_price_cents'][0], 1250)
+        self.assertIsNone(albums['retail_price_cents'][1])
+        start, stop = snapshot.row_range('song', 'album_id', self.first.id)
+        self.assertEqual([snapshot['song']['title'][i] for i in range(start, stop)], ["Track 1", "Track 3"])
+        self.assertEqual(snapshot['rating']['value'][0], 4)
+        self.assertEqual(sorted(snapshot['playlist_song']['song_id'].values),
+                         sorted(s.id for s in self.songs[:2]))
+
+    def test_rewrite_replaces_snapshot(self):
+        write_snapshot(self.path)
+        Album.objects.create(title="Later", artist_name="Other")
+        call_command("snapshot_catalogue", self.path, stdout=StringIO())
+        self.assertEqual(len(Snapshot(self.path)['album']), 4)
+        self.assertEqual(os.listdir(self.directory), ["snapshot"])
+
+    def test_missing_snapshot_is_an_error(self):
+        with self.assertRaises(SnapshotError):
+            Snapshot(self.path)
+
+    def test_api_served_from_snapshot_matches_database(self):
+        client = APIClient()
+        expected_list = client.get("/api/albums/").json()
+        expected_detail = client.get(f"/api/albums/{self.first.id}/").json()
+        write_snapshot(self.path)
+        Album.objects.all().delete()
+
+        with override_settings(DOTTIFY_SNAPSHOT=self.path):
+            with self.assertNumQueries(0):
+                self.assertEqual(client.get("/api/albums/").json(), expected_list)
+                self.assertEqual(client.get(f"/api/albums/{self.first.id}/").json(), expected_detail)
+                self.assertEqual(client.get("/api/albums/999999/").status_code, 404)
+                resp = client.post("/api/albums/", {"title": "New", "artist_name": "X"}, format="json")
+                self.assertEqual(resp.status_code, 503)
+                self.assertEqual(client.get("/api/albums/", {"ordering": "title"}).status_code, 503)
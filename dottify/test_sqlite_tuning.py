@@ -0,0 +1,59 @@
+from django.db import OperationalError, connection, transaction
+from django.test import TransactionTestCase
+
+from dottify.sqlite_tuning import production_options, retry_on_locked
+
+
+class RetryOnLockedTests(TransactionTestCase):
+    def test_retries_lock_errors_then_succeeds(self):
+        calls = []
+
+        @retry_on_locked(base_delay=0)
+        def flaky():
+            calls.append(1)
+            if len(calls) < 3:
+                raise OperationalError("database is locked")
+            return "ok"
+
+        self.assertEqual(flaky(), "ok")
+        self.assertEqual(len(calls), 3)
+
+    def test_gives_up_after_attempts(self):
+        @retry_on_locked(attempts=2, base_delay=0)
+        def always_locked():
+            raise OperationalError("database is locked")
+
+        with self.assertRaises(OperationalError):
+            always_locked()
+
+    def test_other_errors_are_not_retried(self):
+        calls = []
+
+        @retry_on_locked(base_delay=0)
+        def broken():
+            calls.append(1)
+            raise OperationalError("no such table: nope")
+
+        with self.assertRaises(OperationalError):
+            broken()
+        self.assertEqual(len(calls), 1)
+
+    def test_no_retry_inside_outer_transaction(self):
+        calls = []
+
+        @retry_on_locked(base_delay=0)
+        def locked():
+            calls.append(1)
+            raise OperationalError("database is locked")
+
+        with self.assertRaises(OperationalError):
+            with transaction.atomic():
+                locked()
+        self.assertEqual(len(calls), 1)
+
+    def test_production_options_applied_to_connection(self):
+        options = production_options()
+        self.assertEqual(options["transaction_mode"], "IMMEDIATE")
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA synchronous")
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
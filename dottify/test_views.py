@@ -1,6 +1,9 @@
 from django.test import TestCase
+from django.core.cache import cache
 from django.contrib.auth.models import User, Group
-from dottify.models import Album, Song, Playlist, DottifyUser, Rating
+from dottify.models import Album, Artist, Song, Playlist, DottifyUser, Rating, Comment
+from dottify.homepage import HOME_SECTION_SIZE
+from dottify.views import PROFILE_PLAYLIST_PAGE_SIZE, PROFILE_RECENT_ACTIVITY
 from django.utils import timezone
 from datetime import timedelta
 
@@ -113,6 +116,16 @@ class DottifyViewTests(TestCase):
         expected_path = f"/users/{self.duser.id}/{self.duser.display_name.lower()}/"
         self.assertIn(expected_path, resp["Location"])
 
+    def test_profile_links_work_for_unsluggable_names(self):
+        user = User.objects.create_user(username="bangs", password="pw123")
+        owner = DottifyUser.objects.create(user=user, display_name="!!!")
+        self.assertEqual(owner.slug, "user")
+        playlist = Playlist.objects.create(name="Bang Mix", owner=owner, visibility=2)
+        resp = self.client.get(f"/playlists/{playlist.id}/")
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn(f'href="/users/{owner.id}/user/"', resp.content.decode())
+        self.assertEqual(self.client.get(f"/users/{owner.id}/user/").status_code, 200)
+
     def test_user_detail_id_only_redirects_to_slug(self):
         resp = self.client.get(f"/users/{self.duser.id}/")
         self.assertEqual(resp.status_code, 302)
@@ -178,6 +191,20 @@ class DottifyViewTests(TestCase):
         self.assertEqual(resp_post.status_code, 302)
         self.assertFalse(Album.objects.filter(pk=self.other_artist_album.id).exists())
 
+    def test_ownership_survives_display_name_change(self):
+        self.artist_duser.display_name = "Artist Formerly Known As One"
+        self.artist_duser.save()
+        impostor = User.objects.create_user(username="impostor", password="pw123")
+        impostor.groups.add(self.artist_group)
+        DottifyUser.objects.create(user=impostor, display_name="Artist One")
+
+        self.client.login(username="artist1", password="pw123")
+        resp = self.client.get(f"/albums/{self.artist_album.id}/delete/")
+        self.assertEqual(resp.status_code, 200)
+        self.client.login(username="impostor", password="pw123")
+        resp = self.client.get(f"/albums/{self.artist_album.id}/delete/")
+        self.assertEqual(resp.status_code, 403)
+
     def test_song_create_forbidden_for_non_artist_or_admin(self):
         self.client.login(username="alice", password="pw123")
         resp_get = self.client.get("/songs/new/")
@@ -274,6 +301,18 @@ class DottifyViewTests(TestCase):
             Song.objects.filter(pk=self.other_artist_song.id, title="Admin Edited Song").exists()
         )
 
+    def test_album_edit_cannot_move_album_to_another_artist(self):
+        self.client.login(username="artist1", password="pw123")
+        resp = self.client.post(f"/albums/{self.artist_album.id}/edit/", {
+            "title": "Artist One Album",
+            "format": "",
+            "artist_name": "Other Artist",
+        })
+        self.assertEqual(resp.status_code, 403)
+        self.artist_album.refresh_from_db()
+        self.assertEqual(self.artist_album.artist_name, "Artist One")
+        self.assertEqual(self.artist_album.artist.name, "Artist One")
+
     def test_song_delete_redirects_anonymous_to_login(self):
         resp = self.client.get(f"/songs/{self.artist_song.id}/delete/")
         self.assertEqual(resp.status_code, 302)
@@ -365,4 +404,190 @@ class DottifyViewTests(TestCase):
         avg_all = resp.context["avg_all"]
         avg_recent = resp.context["avg_recent"]
         self.assertAlmostEqual(avg_all, (4 + 2) / 2)
-        self.assertAlmostEqual(avg_recent, 2.0)
\ No newline at end of file
+        self.assertAlmostEqual(avg_recent, 2.0)
+
+class UserProfileTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.page_size = PROFILE_PLAYLIST_PAGE_SIZE
+        cls.recent = PROFILE_RECENT_ACTIVITY
+        cls.user = User.objects.create_user(username="prof", password="pw123")
+        cls.duser = DottifyUser.objects.create(user=cls.user, display_name="Profile Owner")
+        album = Album.objects.create(title="Profile Album", artist_name="Someone")
+        songs = [Song.objects.create(title=f"Track {i}", album=album, length=60) for i in range(3)]
+        for i in range(PROFILE_PLAYLIST_PAGE_SIZE + 3):
+            pl = Playlist.objects.create(name=f"Mix {i:02d}", owner=cls.duser, visibility=2)
+            pl.songs.add(*songs)
+        cls.private = Playlist.objects.create(name="Hidden Mix", owner=cls.duser, visibility=0)
+        Comment.objects.create(user=cls.duser, playlist=cls.private, text="private remark")
+        for i in range(PROFILE_RECENT_ACTIVITY + 2):
+            Rating.objects.create(user=cls.duser, album=album, value=i % 5)
+        cls.url = f"/users/{cls.duser.id}/profile-owner/"
+
+    def test_slug_is_cached_and_follows_display_name(self):
+        self.assertEqual(self.duser.slug, "profile-owner")
+        self.duser.display_name = "Renamed Owner"
+        self.duser.save(update_fields=["display_name"])
+        self.duser.refresh_from_db()
+        self.assertEqual(self.duser.slug, "renamed-owner")
+        self.assertEqual(self.duser.get_absolute_url(), f"/users/{self.duser.id}/renamed-owner/")
+
+    def test_id_only_redirect_is_single_query(self):
+        with self.assertNumQueries(1):
+            resp = self.client.get(f"/users/{self.duser.id}/")
+        self.assertRedirects(resp, self.url, fetch_redirect_response=False)
+
+    def test_id_only_redirect_unknown_user_is_404(self):
+        self.assertEqual(self.client.get("/users/999999/").status_code, 404)
+
+    def test_playlists_are_paginated(self):
+        resp = self.client.get(self.url)
+        self.assertEqual(len(resp.context["playlists"]), self.page_size)
+        resp2 = self.client.get(self.url + "?page=2")
+        self.assertEqual(len(resp2.context["playlists"]), 3)
+
+    def test_recent_activity_is_bounded(self):
+        resp = self.client.get(self.url)
+        self.assertEqual(len(resp.context["recent_ratings"]), self.recent)
+
+    def test_private_comments_hidden_from_others(self):
+        resp = self.client.get(self.url)
+        self.assertNotIn("private remark", resp.content.decode())
+        self.client.login(username="prof", password="pw123")
+        resp = self.client.get(self.url)
+        self.assertIn("private remark", resp.content.decode())
+        self.assertIn("Hidden Mix", resp.content.decode())
+
+    def test_anonymous_query_count_is_fixed(self):
+        # profile, page count, playlists, song preview, ratings, comments
+        with self.assertNumQueries(6):
+            self.client.get(self.url)
+
+    def test_owner_query_count_is_fixed(self):
+        self.client.login(username="prof", password="pw123")
+        # session + auth user on top of the anonymous queries
+        with self.assertNumQueries(8):
+            self.client.get(self.url)
+
+
+class RowFragmentCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.album = Album.objects.create(title="Cached Title", artist_name="Cache Artist")
+        Song.objects.create(title="Cached Song", album=self.album, length=90)
+
+    def test_album_row_refreshes_after_save(self):
+        self.assertIn("Cached Title", self.client.get("/albums/").content.decode())
+        self.album.title = "Fresh Title"
+        self.album.save()
+        html = self.client.get("/albums/").content.decode()
+        self.assertIn("Fresh Title", html)
+        self.assertNotIn("Cached Title", html)
+
+    def test_warm_render_matches_cold_render(self):
+        cold = self.client.get("/").content
+        warm = self.client.get("/").content
+        self.assertEqual(cold, warm)
+
+    def test_song_rows_on_album_detail(self):
+        url = f"/albums/{self.album.id}/"
+        self.assertIn("Cached Song", self.client.get(url).content.decode())
+        song = self.album.song_set.get()
+        song.title = "Renamed Song"
+        song.save()
+        self.assertIn("Renamed Song", self.client.get(url).content.decode())
+
+
+class HomepageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.listener = User.objects.create_user(username="listener", password="pw123")
+        cls.listener_duser = DottifyUser.objects.create(user=cls.listener, display_name="Listener")
+        cls.artist = User.objects.create_user(username="homeartist", password="pw123")
+        cls.artist.groups.add(Group.objects.get_or_create(name="Artist")[0])
+        DottifyUser.objects.create(user=cls.artist, display_name="Home Artist")
+        cls.admin = User.objects.create_user(username="homeadmin", password="pw123")
+        cls.admin.groups.add(Group.objects.get_or_create(name="DottifyAdmin")[0])
+
+    def setUp(self):
+        cache.clear()
+
+    def add_catalogue(self, n):
+        start = Album.objects.count()
+        artist = Artist.for_name("Home Artist")
+        albums = Album.objects.bulk_create(
+            Album(title=f"Bulk Album {start + i}", artist_name="Home Artist", artist=artist)
+            for i in range(n)
+        )
+        Song.objects.bulk_create(Song(title=f"Bulk Song {a.id}", album=a) for a in albums)
+        Playlist.objects.bulk_create(
+            Playlist(name=f"Bulk Playlist {start + i}", owner=self.listener_duser) for i in range(n)
+        )
+
+    def assert_fixed_queries(self, cold, warm, login=None):
+        if login:
+            self.client.login(username=login, password="pw123")
+        for size in (5, 50):
+            self.add_catalogue(size)
+            cache.clear()
+            with self.assertNumQueries(cold):
+                self.client.get("/")
+            with self.assertNumQueries(warm):
+                resp = self.client.get("/")
+        return resp
+
+    def test_anonymous_queries_do_not_grow(self):
+        # versions, then albums + public playlists when cold
+        resp = self.assert_fixed_queries(cold=3, warm=1)
+        self.assertEqual(resp.context["role"], "anonymous")
+
+    def test_admin_queries_do_not_grow(self):
+        # session + user + role, then albums, playlists and songs when cold
+        resp = self.assert_fixed_queries(cold=6, warm=3, login="homeadmin")
+        self.assertEqual(resp.context["role"], "admin")
+        self.assertEqual(resp.content.decode().count("Bulk Song"), HOME_SECTION_SIZE)
+
+    def test_artist_and_listener_queries_do_not_grow(self):
+        resp = self.assert_fixed_queries(cold=4, warm=3, login="homeartist")
+        self.assertEqual(resp.context["role"], "artist")
+        self.client.logout()
+        resp = self.assert_fixed_queries(cold=4, warm=3, login="listener")
+        self.assertEqual(resp.context["role"], "listener")
+
+    def test_sections_are_bounded_to_the_latest(self):
+        self.add_catalogue(HOME_SECTION_SIZE + 5)
+        html = self.client.get("/").content.decode()
+        self.assertEqual(html.count("Bulk Album"), HOME_SECTION_SIZE)
+        self.assertIn(f"Bulk Album {HOME_SECTION_SIZE + 4}<", html)
+        self.assertNotIn("Bulk Album 0<", html)
+
+    def test_artist_sees_own_albums(self):
+        self.add_catalogue(3)
+        Album.objects.create(title="Someone Else's Album", artist_name="Someone Else")
+        self.client.login(username="homeartist", password="pw123")
+        html = self.client.get("/").content.decode()
+        self.assertEqual(html.count("Bulk Album"), 3)
+        self.assertNotIn("Someone Else", html)
+
+    def test_personal_variants_are_not_shared(self):
+        other = User.objects.create_user(username="other", password="pw123")
+        other_duser = DottifyUser.objects.create(user=other, display_name="Other")
+        Playlist.objects.create(name="Listener Only", owner=self.listener_duser, visibility=0)
+        Playlist.objects.create(name="Other Only", owner=other_duser, visibility=0)
+        self.client.login(username="listener", password="pw123")
+        self.assertNotIn("Other Only", self.client.get("/").content.decode())
+        self.client.login(username="other", password="pw123")
+        html = self.client.get("/").content.decode()
+        self.assertIn("Other Only", html)
+        self.assertNotIn("Listener Only", html)
+
+    def test_changes_invalidate_the_cached_shell(self):
+        Playlist.objects.create(name="Old Name", owner=self.listener_duser)
+        self.assertIn("Old Name", self.client.get("/").content.decode())
+        playlist = Playlist.objects.get(name="Old Name")
+        playlist.name = "New Name"
+        playlist.save()
+        self.assertIn("New Name", self.client.get("/").content.decode())
+        self.listener_duser.display_name = "Renamed Listener"
+        self.listener_duser.save()
+        self.assertIn("by Renamed Listener", self.client.get("/").content.decode())
@@ -0,0 +1,107 @@
+import tempfile
+from io import StringIO
+
+from django.contrib.auth.models import Group, User
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import Client, LiveServerTestCase, TestCase, TransactionTestCase, override_settings
+
+from dottify.models import Album, AlbumStats, DottifyUser
+from dottify.warming import (
+    ANONYMOUS,
+    http_fetcher,
+    popular_album_paths,
+    role_sessions,
+    role_users,
+    top_paths_from_log,
+    warm,
+)
+
+
+def make_role_users():
+    admin = User.objects.create_user(username="admin", password="pw123")
+    admin.groups.add(Group.objects.get_or_create(name="DottifyAdmin")[0])
+    artist = User.objects.create_user(username="artist", password="pw123")
+    artist.groups.add(Group.objects.get_or_create(name="Artist")[0])
+    listener = User.objects.create_user(username="listener", password="pw123")
+    DottifyUser.objects.create(user=listener, display_name="Listener")
+    return {'admin': admin, 'artist': artist, 'listener': listener}
+
+
+class WarmingHelperTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = make_role_users()
+        cls.albums = [Album.objects.create(title=f"Hit {i}", artist_name="A") for i in range(3)]
+        AlbumStats.objects.create(album=cls.albums[2], playlist_count=9)
+        AlbumStats.objects.create(album=cls.albums[0], playlist_count=4)
+
+    def test_role_users_and_sessions(self):
+        self.assertEqual(role_users(), self.users)
+        with role_sessions() as sessions:
+            self.assertIsNone(sessions[ANONYMOUS])
+            self.assertEqual(Session.objects.count(), 3)
+            results = warm(['/'], sessions, workers=0)
+        self.assertEqual(Session.objects.count(), 0)
+        self.assertEqual({r.role for r in results}, {'anonymous', 'listener', 'artist', 'admin'})
+        self.assertTrue(all(r.status == 200 for r in results))
+
+    def test_sessions_log_the_role_in(self):
+        with role_sessions(['listener']) as sessions:
+            client = Client()
+            client.cookies['sessionid'] = sessions['listener']
+            resp = client.get('/')
+        self.assertEqual(resp.wsgi_request.user, self.users['listener'])
+
+    def test_top_paths_from_log(self):
+        lines = [
+            '127.0.0.1 - - [19/Oct/2026:10:00:00 +0000] "GET /albums/ HTTP/1.1" 200 512',
+            '127.0.0.1 - - [19/Oct/2026:10:00:01 +0000] "GET /albums/ HTTP/1.1" 200 512',
+            '[19/Oct/2026 10:00:02] "GET /songs/ HTTP/1.1" 200 100',
+            '[19/Oct/2026 10:00:03] "GET /missing/ HTTP/1.1" 404 100',
+            '[19/Oct/2026 10:00:04] "POST /help/ HTTP/1.1" 200 100',
+        ]
+        self.assertEqual(top_paths_from_log(lines, 5), ['/albums/', '/songs/'])
+        self.assertEqual(top_paths_from_log(lines, 1), ['/albums/'])
+
+    def test_popular_album_paths(self):
+        paths = popular_album_paths(2)
+        self.assertEqual(paths, [
+            f"/albums/{self.albums[2].id}/hit-2/",
+            f"/albums/{self.albums[0].id}/hit-0/",
+        ])
+
+
+class WarmCacheCommandTests(TransactionTestCase):
+    def test_command_warms_every_role_in_a_pool(self):
+        make_role_users()
+        Album.objects.create(title="Warm", artist_name="A")
+        out = StringIO()
+        with tempfile.TemporaryDirectory() as directory, override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory,
+        }}):
+            call_command('warm_cache', '--workers', '4', '--route', '/albums/', '--route', '/', stdout=out)
+        output = out.getvalue()
+        self.assertIn("Warmed 3 paths x 4 roles = 12 requests", output)
+        self.assertNotIn("error", output)
+        self.assertFalse(Session.objects.exists())
+
+    def test_refuses_to_warm_a_process_local_cache_or_remote_http(self):
+        with self.assertRaisesMessage(CommandError, "local to each process"):
+            call_command('warm_cache', stdout=StringIO())
+        with self.assertRaisesMessage(CommandError, "https://"):
+            call_command('warm_cache', '--base-url', 'http://example.com', stdout=StringIO())
+        self.assertFalse(Session.objects.exists())
+
+
+class WarmOverHttpTests(LiveServerTestCase):
+    def test_http_fetcher(self):
+        make_role_users()
+        fetch = http_fetcher(self.live_server_url)
+        with role_sessions([ANONYMOUS, 'listener']) as sessions:
+            results = warm(['/', '/albums/', '/nope/'], sessions, fetch, workers=2)
+        statuses = {(r.role, r.path): r.status for r in results}
+        self.assertEqual(statuses[(ANONYMOUS, '/albums/')], 200)
+        self.assertEqual(statuses[('listener', '/')], 200)
+        self.assertEqual(statuses[(ANONYMOUS, '/nope/')], 404)
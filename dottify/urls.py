@@ -1,21 +1,26 @@
-from django.urls import path, include
-from rest_framework.routers import DefaultRouter
+from django.urls import path
+from django.urls.resolvers import RoutePattern, URLResolver
 from django.views.static import serve
 from django.conf import settings
 
-from .api_views import AlbumViewSet, SongViewSet, PlaylistViewSet, statistics_view
 from . import views
 
-# Single router for all REST API endpoints within this sub-app.
-router = DefaultRouter()
-router.register(r'albums', AlbumViewSet, basename='album')
-router.register(r'songs', SongViewSet, basename='song')
-router.register(r'playlists', PlaylistViewSet, basename='playlist')
+
+def lazy_include(route, urlconf_name):
+    """
+    Equivalent of path(route, include(urlconf_name)), except that the
+    URLconf module is imported on first use instead of immediately.
+
+    URLResolver only imports a dotted-path urlconf when its patterns are
+    first needed, i.e. when a URL under `route` is resolved or any URL
+    is reversed; include() would import it straight away.
+    """
+    return URLResolver(RoutePattern(route, is_endpoint=False), urlconf_name)
+
 
 urlpatterns = [
-    # --- API routes ---
-    path('api/', include(router.urls)),
-    path('api/statistics/', statistics_view, name='api-statistics'),
+    # --- API routes (router, viewsets and serialisers load lazily) ---
+    lazy_include('api/', 'dottify.api_urls'),
 
     # --- HTML views ---
     path('', views.index, name='index'),
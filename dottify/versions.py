@@ -0,0 +1,69 @@
+"""
+Per-model data versions for cache keys.
+
+Signal handlers bump a DataVersion row after every save/delete of the
+tracked models (and after Playlist.songs changes), so a cache key built
+from the versions a page depends on changes whenever its data might
+have. Keeping the counters in the database rather than in the cache
+means they survive cache flushes, are shared by every worker, and roll
+back with the transaction in tests.
+
+QuerySet.update() and bulk_create() send no signals; code that uses them
+on a tracked model must call bump() itself.
+"""
+from django.db.models import F, Subquery
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+from .models import Album, Artist, DataVersion, DottifyUser, Playlist, Rating, Song
+
+TRACKED = {
+    Album: 'album',
+    Song: 'song',
+    Playlist: 'playlist',
+    DottifyUser: 'dottifyuser',
+    Rating: 'rating',
+    Artist: 'artist',
+}
+
+
+def bump(name):
+    if not DataVersion.objects.filter(name=name).update(version=F('version') + 1):
+        _, created = DataVersion.objects.get_or_create(name=name, defaults={'version': 1})
+        if not created:
+            DataVersion.objects.filter(name=name).update(version=F('version') + 1)
+
+
+def current(*names):
+    """
+    {name: version} for `names`; models never changed are at version 0.
+    """
+    found = dict(DataVersion.objects.filter(name__in=names).values_list('name', 'version'))
+    return {name: found.get(name, 0) for name in names}
+
+
+def version_subquery(name):
+    """
+    The version of `name` as an expression, for folding the version
+    lookup into another query with annotate().
+    """
+    return Subquery(DataVersion.objects.filter(name=name).values('version')[:1])
+
+
+def _changed(sender, **kwargs):
+    bump(TRACKED[sender])
+
+
+def _playlist_songs_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump('playlist')
+
+
+def connect_signals():
+    """
+    Called from DottifyConfig.ready().
+    """
+    for model, name in TRACKED.items():
+        post_save.connect(_changed, sender=model, dispatch_uid=f'version_{name}_saved')
+        post_delete.connect(_changed, sender=model, dispatch_uid=f'version_{name}_deleted')
+    m2m_changed.connect(_playlist_songs_changed, sender=Playlist.songs.through,
+                        dispatch_uid='version_playlist_songs')
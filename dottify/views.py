@@ -1,13 +1,25 @@
 from datetime import timedelta
 from django.utils import timezone
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import HttpResponse, HttpResponseRedirect, HttpResponseForbidden
-from django.template.defaultfilters import slugify
+from django.http import Http404, HttpResponse, HttpResponseRedirect, HttpResponseForbidden
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q
+from django.core.paginator import Paginator
+from django.db.models import Count, Prefetch, Q
 from django import forms
 from .models import Album, Song, Playlist, DottifyUser, Comment, Rating
 from .forms import AlbumForm, SongForm
+from .comments import comment_threads, paginate_comments
+from .db_router import read_from_replica
+from .homepage import home_shell, home_viewer
+from .rows import AlbumRow, PlaylistRow, SongRow, project
+from . import audience, search
+from .tasks import process_cover, queue_album_warming, send_support_email
+
+# Profile page limits: playlists per page, songs previewed per playlist
+# and entries in the recent ratings / comments panels.
+PROFILE_PLAYLIST_PAGE_SIZE = 10
+PROFILE_SONG_PREVIEW = 10
+PROFILE_RECENT_ACTIVITY = 5
 
 
 def get_dottify_user_or_none(user):
@@ -20,69 +32,63 @@ def get_dottify_user_or_none(user):
     """
     if not user.is_authenticated:
         return None
-    return DottifyUser.objects.filter(user=user).first()
+    return DottifyUser.objects.select_related('artist').filter(user=user).first()
+
+
+def owns_album(duser, album):
+    """
+    True if `duser` is the artist `album` is credited to.
+
+    Compares ids only: the profile's artist comes with
+    get_dottify_user_or_none(), and album.artist_id is a column of album.
+    """
+    artist = getattr(duser, 'artist', None) if duser else None
+    return artist is not None and album.artist_id == artist.id
 
 
 def index(request):
     """
     Homepage route with role-based content.
 
-    - Anonymous users: show all albums and public playlists only.
-    - Logged-in normal users: show only their own playlists.
-    - Artist users (in the 'Artist' group): show only their own albums.
+    - Anonymous users: the latest albums and public playlists.
+    - Logged-in normal users: their own latest playlists.
+    - Artist users (in the 'Artist' group): their own latest albums.
     - DottifyAdmin users (in the 'DottifyAdmin' group or superuser):
-      show all albums, songs, and playlists.
+      the latest albums, songs, and playlists.
+
+    Each section is bounded to HOME_SECTION_SIZE items. The role lookup
+    is a single query and the sections are cached per role variant; see
+    dottify/homepage.py.
     """
-    user = request.user
-    duser = get_dottify_user_or_none(user)
-    if not user.is_authenticated:
-        albums = Album.objects.all()
-        playlists = Playlist.objects.filter(visibility=2)
-        return render(
-            request,
-            'dottify/index.html',
-            {'albums': albums, 'playlists': playlists},
-        )
-    is_dottify_admin = user.is_superuser or user.groups.filter(name="DottifyAdmin").exists()
-    is_artist = user.groups.filter(name="Artist").exists()
-    if is_dottify_admin:
-        albums = Album.objects.all()
-        playlists = Playlist.objects.all()
-        songs = Song.objects.all()
-        return render(
-            request,
-            'dottify/index.html',
-            {'albums': albums, 'playlists': playlists, 'songs': songs},
-        )
-    if is_artist:
-        if duser:
-            albums = Album.objects.filter(artist_name=duser.display_name)
-        else:
-            albums = Album.objects.none()
-        return render(
-            request,
-            'dottify/index.html',
-            {'albums': albums},
-        )
-
-    if duser:
-        playlists = duser.playlist_set.all()
-    else:
-        playlists = Playlist.objects.none()
+    viewer = home_viewer(request.user)
     return render(
         request,
         'dottify/index.html',
-        {'playlists': playlists},
+        {'role': viewer.role, 'sections': home_shell(viewer)},
     )
 
+@read_from_replica
 def album_list(request):
     """
     List view for albums (used by Sheet C and Sheet D requirements).
+    Rows are AlbumRow records (dottify/rows.py), not model instances.
     """
-    albums = Album.objects.all()
+    albums = project(Album.objects.all(), AlbumRow)
     return render(request, 'dottify/album_list.html', {'albums': albums})
 
 
+def _queue_album_jobs(request, album):
+    """
+    Hand the slow follow-up work of an album save to the job worker:
+    resizing a newly uploaded cover (which then re-warms the pages), or
+    just re-warming the album pages when the cache is shared.
+    """
+    if 'cover_image' in request.FILES:
+        process_cover.delay(album.id)
+    else:
+        queue_album_warming(album.id)
+
+
 @login_required
 def album_create(request):
     """
@@ -102,6 +108,7 @@ def album_create(request):
         form = AlbumForm(request.POST, request.FILES)
         if form.is_valid():
             album = form.save()
+            _queue_album_jobs(request, album)
             return redirect('album-detail-id', album_id=album.id)
     else:
         form = AlbumForm()
@@ -114,19 +121,21 @@ def album_search(request):
     - Requires authentication (401 if not logged in).
     - Returns a comma-separated list of matching album titles as plain text.
     This matches the behaviour expected by the provided tests.
+    - Matches titles and artists with typos allowed (dottify/search.py),
+      best match first.
     """
     if not request.user.is_authenticated:
         return HttpResponse(status=401)
 
     q = request.GET.get('q', '')
-    albums = Album.objects.filter(title__icontains=q)
+    albums = search.search_albums(q)
     titles = ", ".join(a.title for a in albums)
     return HttpResponse(titles or "No results")
 
 def _build_album_detail_context(album):
     """
-    Internal helper to build album detail context, including songs and ratings.
-    Used by both /albums/<id>/ and /albums/<id>/<slug>/ routes.
+    Internal helper to build album detail context, including songs, ratings
+    and approximate unique listeners and raters. Used by both /albums/<id>/ and /albums/<id>/<slug>/ routes.
     """
     songs = album.song_set.all()
     ratings = Rating.objects.filter(album=album, value__isnull=False)
@@ -142,8 +151,10 @@ def _build_album_detail_context(album):
         'songs': songs,
         'avg_all': avg_all,
         'avg_recent': avg_recent,
+        'audience': audience.album_audience(album.id),
     }
 
+@read_from_replica
 def album_detail_by_id(request, album_id):
     """
     Detail page for a single album.
@@ -158,6 +169,7 @@ def album_detail_by_id(request, album_id):
     context = _build_album_detail_context(album)
     return render(request, 'dottify/album_detail.html', context)
 
+@read_from_replica
 def album_detail_with_slug(request, album_id, slug):
     """
     Detail page for a single album using an optional slug in the URL.
@@ -177,8 +189,7 @@ def album_edit(request, album_id):
     - User must be logged in (enforced by @login_required).
     - User must be in the Artist or DottifyAdmin group.
     - If user is in Artist group, the album must belong to them:
-      we treat an album as belonging to an artist if
-      album.artist_name == DottifyUser.display_name.
+      the album's Artist must be the user's Artist (see owns_album()).
     - Ownership is checked on both GET (when showing the form)
       and POST (when saving changes).
     - If the user is not allowed, return 403 and do NOT save.
@@ -190,14 +201,18 @@ def album_edit(request, album_id):
     is_dottify_admin = user.is_superuser or user.groups.filter(name="DottifyAdmin").exists()
     if not (is_artist or is_dottify_admin):
         return HttpResponse("Forbidden", status=403)
-    if is_artist and (not duser or album.artist_name != duser.display_name):
+    if is_artist and not owns_album(duser, album):
         return HttpResponse("Forbidden", status=403)
     if request.method == "POST":
         form = AlbumForm(request.POST, request.FILES, instance=album)
         if form.is_valid():
-            if is_artist and (not duser or album.artist_name != duser.display_name):
+            # Album.save() re-links the album to the Artist named by
+            # artist_name, so an artist may not rename it away from
+            # themselves (and onto someone else).
+            if is_artist and form.cleaned_data['artist_name'] != duser.artist.name:
                 return HttpResponse("Forbidden", status=403)
             form.save()
+            _queue_album_jobs(request, album)
             return redirect('album-detail-id', album_id=album.id)
     else:
         form = AlbumForm(instance=album)
@@ -209,9 +224,8 @@ def album_delete(request, album_id):
     Delete an existing album.
     Rules (Sheet D):
     - User must be logged in.
-    - User must be in the DottifyAdmin group OR be the artist who owns the album.
-      An album is considered to belong to an artist if:
-        album.artist_name == DottifyUser.display_name
+    - User must be in the DottifyAdmin group OR be the artist who owns the album
+      (see owns_album()).
     - Permission is checked on both GET (show confirmation)
       and POST (perform delete).
     - If user is not allowed, return 403 and do NOT delete.
@@ -221,8 +235,7 @@ def album_delete(request, album_id):
     duser = get_dottify_user_or_none(user)
     is_artist = user.groups.filter(name="Artist").exists()
     is_dottify_admin = user.is_superuser or user.groups.filter(name="DottifyAdmin").exists()
-    owns_album = (duser and album.artist_name == duser.display_name)
-    allowed = is_dottify_admin or (is_artist and owns_album)
+    allowed = is_dottify_admin or (is_artist and owns_album(duser, album))
     if not allowed:
         return HttpResponse("Forbidden", status=403)
     if request.method == "POST":
@@ -238,8 +251,8 @@ def song_new(request):
     - User must be logged in.
     - User must be in the Artist or DottifyAdmin group.
     - If user is in Artist group, the chosen album must belong to them
-      (album.artist_name == DottifyUser.display_name). This is checked
-      on submit (POST). If it does not match, return 403 and do not save.
+      (see owns_album()). This is checked on submit (POST). If it does
+      not match, return 403 and do not save.
     """
     user = request.user
     duser = get_dottify_user_or_none(user)
@@ -252,31 +265,41 @@ def song_new(request):
         if form.is_valid():
             song = form.save(commit=False)
             album = song.album
-            if is_artist:
-                if not duser or album.artist_name != duser.display_name:
-                    return HttpResponse("Forbidden", status=403)
+            if is_artist and not owns_album(duser, album):
+                return HttpResponse("Forbidden", status=403)
             song.save()
             return redirect('song-detail', song_id=song.id)
     else:
         form = SongForm()
     return render(request, 'dottify/song_form.html', {'form': form})
 
+@read_from_replica
 def song_detail(request, song_id):
     """
     Simple song detail page.
+
+    Shows one page of the song's comment threads; older comments are
+    reached through the ?cursor= link rendered under the list.
     """
-    song = get_object_or_404(Song, pk=song_id)
-    return render(request, 'dottify/song_detail.html', {'song': song})
+    song = get_object_or_404(Song.objects.select_related('album'), pk=song_id)
+    comments, paginator = paginate_comments(request, comment_threads(song=song))
+    return render(
+        request,
+        'dottify/song_detail.html',
+        {'song': song, 'comments': comments, 'comments_paginator': paginator},
+    )
 
 
+@read_from_replica
 def song_list(request):
     """
     List all songs.
     Sheet D requires a 'Total results found: N' counter somewhere a
     song list is displayed; the template uses `count` for this.
+    Rows are SongRow records (dottify/rows.py), not model instances.
     """
-    songs = Song.objects.all()
-    count = songs.count()
+    songs = project(Song.objects.all(), SongRow)
+    count = len(songs)
     return render(request, 'dottify/song_list.html', {'songs': songs, 'count': count})
 
 
@@ -288,8 +311,7 @@ def song_edit(request, song_id):
     duser = get_dottify_user_or_none(user)
     is_artist = user.groups.filter(name="Artist").exists()
     is_dottify_admin = user.is_superuser or user.groups.filter(name="DottifyAdmin").exists()
-    owns_album = duser and album.artist_name == duser.display_name
-    allowed = is_dottify_admin or (is_artist and owns_album)
+    allowed = is_dottify_admin or (is_artist and owns_album(duser, album))
     if not allowed:
         return HttpResponse("Forbidden", status=403)
     if request.method == "POST":
@@ -309,8 +331,7 @@ def song_delete(request, song_id):
     duser = get_dottify_user_or_none(user)
     is_artist = user.groups.filter(name="Artist").exists()
     is_dottify_admin = user.is_superuser or user.groups.filter(name="DottifyAdmin").exists()
-    owns_album = duser and album.artist_name == duser.display_name
-    allowed = is_dottify_admin or (is_artist and owns_album)
+    allowed = is_dottify_admin or (is_artist and owns_album(duser, album))
     if not allowed:
         return HttpResponse("Forbidden", status=403)
     if request.method == "POST":
@@ -318,6 +339,7 @@ def song_delete(request, song_id):
         return redirect("/songs/")
     return render(request, "dottify/song_confirm_delete.html", {"song": song})
 
+@read_from_replica
 def playlist_list(request):
     """
     List playlists according to visibility and user roles.
@@ -325,6 +347,9 @@ def playlist_list(request):
     - Anonymous users: see public playlists only (visibility = 2).
     - Logged-in users (Normal/Artist): see public playlists and playlists they own.
     - DottifyAdmin users: see all playlists regardless of visibility or ownership.
+
+    Rows are PlaylistRow records (dottify/rows.py) with the owner's
+    display name joined in.
     """
     playlists = Playlist.objects.all()
     user = request.user
@@ -344,27 +369,29 @@ def playlist_list(request):
                 )
             else:
                 playlists = playlists.filter(visibility=2)
-    return render(request, "dottify/playlist_list.html", {"playlists": playlists})
+    return render(request, "dottify/playlist_list.html", {"playlists": project(playlists, PlaylistRow)})
 
+@read_from_replica
 def playlist_detail(request, playlist_id):
     """
     Detail view for a single playlist.
 
     Private playlists are only visible to their owner (403 otherwise).
-    Comments are displayed with their authors' display names.
+    Comments are displayed with their authors' display names, one
+    cursor page at a time so long discussions do not slow the page down.
     """
-    playlist = get_object_or_404(Playlist, pk=playlist_id)
+    playlist = get_object_or_404(Playlist.objects.select_related('owner'), pk=playlist_id)
     duser = get_dottify_user_or_none(request.user)
 
     if playlist.visibility == 0:
         if not duser or playlist.owner_id != duser.id:
             return HttpResponse("Forbidden", status=403)
 
-    comments = Comment.objects.filter(playlist=playlist).select_related('user')
+    comments, paginator = paginate_comments(request, comment_threads(playlist=playlist))
     return render(
         request,
         'dottify/playlist_detail.html',
-        {'playlist': playlist, 'comments': comments},
+        {'playlist': playlist, 'comments': comments, 'comments_paginator': paginator},
     )
 
 
@@ -373,11 +400,14 @@ def user_detail_redirect(request, user_id):
     Redirect helper that always sends users to the lowercase slug URL.
 
     This keeps the 'users/<id>/<slug>/' route canonical while still
-    accepting the shorter 'users/<id>/' form.
+    accepting the shorter 'users/<id>/' form. The slug is cached on
+    DottifyUser, so this is a single-column lookup; pages link straight
+    to DottifyUser.get_absolute_url() and never need the extra hop.
     """
-    duser = get_object_or_404(DottifyUser, pk=user_id)
-    target_slug = slugify(duser.display_name)
-    return redirect('user-detail-slug', user_id=user_id, slug=target_slug)
+    slug = DottifyUser.objects.filter(pk=user_id).values_list('slug', flat=True).first()
+    if slug is None:
+        raise Http404("No such user")
+    return redirect('user-detail-slug', user_id=user_id, slug=slug)
 
 
 def user_detail_slug(request, user_id, slug):
@@ -389,28 +419,59 @@ def user_detail_slug(request, user_id, slug):
     Playlist visibility rules on this page:
     - If the logged-in user *owns* this profile, they see ALL their playlists.
     - Anyone else (including anonymous users) only sees PUBLIC playlists.
+
+    Playlists are paginated (?page=N) with a bounded song preview each,
+    and the recent ratings/comments panels are capped, so the number of
+    queries does not grow with the size of the profile.
     """
     duser = get_object_or_404(DottifyUser, pk=user_id)
-    correct_slug = slugify(duser.display_name)
-    if slug != correct_slug:
-        return redirect('user-detail-slug', user_id=user_id, slug=correct_slug)
-    viewer = get_dottify_user_or_none(request.user)
-    if viewer and viewer.id == duser.id:
-        playlists = duser.playlist_set.all()
-    else:
-        playlists = duser.playlist_set.filter(visibility=2)
+    if slug != duser.slug:
+        return redirect(duser)
+    # The viewer's profile is the one being shown iff the auth users match,
+    # so there is no need to load the viewer's DottifyUser separately.
+    is_owner = request.user.is_authenticated and request.user.pk == duser.user_id
+    playlists = duser.playlist_set.all()
+    comments = Comment.objects.filter(user=duser)
+    if not is_owner:
+        playlists = playlists.filter(visibility=2)
+        comments = comments.filter(Q(playlist__isnull=True) | Q(playlist__visibility=2))
+    preview = (
+        Song.objects.select_related('album')
+        .order_by('id')[:PROFILE_SONG_PREVIEW]
+    )
+    playlists = (
+        playlists.annotate(song_count=Count('songs'))
+        .prefetch_related(Prefetch('songs', queryset=preview, to_attr='song_preview'))
+        .order_by('-created_at', '-id')
+    )
+    page = Paginator(playlists, PROFILE_PLAYLIST_PAGE_SIZE).get_page(request.GET.get('page'))
+    recent_ratings = (
+        Rating.objects.filter(user=duser, value__isnull=False)
+        .select_related('album', 'song')
+        .order_by('-created_at', '-id')[:PROFILE_RECENT_ACTIVITY]
+    )
+    recent_comments = (
+        comments.select_related('playlist', 'song')
+        .order_by('-created_at', '-id')[:PROFILE_RECENT_ACTIVITY]
+    )
     return render(
         request,
         'dottify/user_detail.html',
-        {'duser': duser, 'playlists': playlists},
+        {
+            'duser': duser,
+            'playlists': page.object_list,
+            'page_obj': page,
+            'recent_ratings': recent_ratings,
+            'recent_comments': recent_comments,
+        },
     )
 
 class HelpForm(forms.Form):
     """
     Simple contact form used by the /help route.
 
-    We do not send real email (per the lab sheet); we just validate
-    input and return a success message.
+    The request is validated here and mailed to support by the
+    send_support_email background job.
     """
     email = forms.EmailField()
     subject = forms.CharField(max_length=100)
@@ -431,7 +492,12 @@ def help_view(request):
     if request.method == 'POST':
         form = HelpForm(request.POST, initial=initial)
         if form.is_valid():
-            # In a real app we would send mail; here we just acknowledge.
+            # Mail is sent by the job worker, not on the request thread.
+            send_support_email.delay(
+                form.cleaned_data['email'],
+                form.cleaned_data['subject'],
+                form.cleaned_data['message'],
+            )
             return HttpResponse("Support request submitted")
     else:
         form = HelpForm(initial=initial)
@@ -0,0 +1,205 @@
+"""
+Cache warming for hot pages and API responses.
+
+warm() requests a list of paths once per visibility role (anonymous,
+listener, artist, admin) so that every variant of a role-dependent page
+is rendered: the cached template loader, the row fragment cache and the
+database page cache are all filled before real visitors arrive.
+
+Pages can be fetched in process, through django.test.Client, which
+fills whatever CACHES backend this process is configured with. That only
+helps the web workers when the backend is shared (see shared_cache()),
+and it is also what the warm_album_pages job uses. They can also be
+fetched over HTTP from a running server (--base-url), which warms that
+server's own per-process caches. Either way, a role is represented by a
+real session for one of its users, created for the run and deleted
+afterwards.
+"""
+import re
+import time
+import urllib.error
+import urllib.request
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from importlib import import_module
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connections
+from django.db.models import Q
+from django.test import Client
+from django.urls import reverse
+from django.utils.text import slugify
+
+from .models import Album
+
+DEFAULT_ROUTES = ['/', '/albums/', '/songs/', '/playlists/', '/api/albums/']
+
+ANONYMOUS = 'anonymous'
+ROLES = [ANONYMOUS, 'listener', 'artist', 'admin']
+
+WarmResult = namedtuple('WarmResult', 'role path status ms')
+
+# "GET /albums/ HTTP/1.1" 200 in common/combined log format, and Django's
+# runserver log.
+ACCESS_LOG_LINE = re.compile(r'"GET (?P<path>/\S*) HTTP/[\d.]+" (?P<status>\d{3})')
+
+
+def shared_cache(alias='default'):
+    """
+    Whether the `alias` cache is shared with other processes, i.e. whether
+    warming it in this process helps the web workers at all.
+    """
+    return not isinstance(caches[alias], (LocMemCache, DummyCache))
+
+
+def role_users():
+    """
+    One active user per logged-in role, for the roles that have any.
+    """
+    users = User.objects.filter(is_active=True).order_by('id')
+    admins = Q(is_superuser=True) | Q(groups__name='DottifyAdmin')
+    candidates = {
+        'admin': users.filter(admins),
+        'artist': users.filter(groups__name='Artist').exclude(admins),
+        'listener': users.filter(groups__isnull=True, is_superuser=False),
+    }
+    found = {}
+    for role, queryset in candidates.items():
+        user = queryset.first()
+        if user is not None:
+            found[role] = user
+    return found
+
+
+@contextmanager
+def role_sessions(roles=ROLES):
+    """
+    Yield {role: session key}, with None for anonymous, creating a login
+    session for each role's user and deleting them all on exit.
+    """
+    engine = import_module(settings.SESSION_ENGINE)
+    users = role_users()
+    stores = {}
+    try:
+        sessions = {}
+        for role in roles:
+            if role == ANONYMOUS:
+                sessions[role] = None
+            elif role in users:
+                user = users[role]
+                store = engine.SessionStore()
+                store[SESSION_KEY] = user._meta.pk.value_to_string(user)
+                store[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+                store[HASH_SESSION_KEY] = user.get_session_auth_hash()
+                store.create()
+                stores[role] = store
+                sessions[role] = store.session_key
+        yield sessions
+    finally:
+        for store in stores.values():
+            store.delete()
+
+
+def top_paths_from_log(lines, n):
+    """
+    The `n` most requested paths among successful GETs in an access log.
+    """
+    counts = Counter()
+    for line in lines:
+        match = ACCESS_LOG_LINE.search(line)
+        if match and match.group('status') == '200':
+            counts[match.group('path')] += 1
+    return [path for path, _ in counts.most_common(n)]
+
+
+def popular_album_paths(n):
+    """
+    Detail pages of the `n` albums found in the most playlists (see
+    AlbumStats, maintained by consume_changes).
+    """
+    albums = Album.objects.order_by('-stats__playlist_count', 'id').values_list('id', 'title')[:n]
+    paths = []
+    for album_id, title in albums:
+        slug = slugify(title)
+        if slug:
+            paths.append(reverse('album-detail-slug', kwargs={'album_id': album_id, 'slug': slug}))
+        else:
+            paths.append(reverse('album-detail-id', kwargs={'album_id': album_id}))
+    return paths
+
+
+def _client_host():
+    # Client defaults to "testserver", which ALLOWED_HOSTS rejects outside tests.
+    host = next((h for h in settings.ALLOWED_HOSTS if h != '*'), 'localhost')
+    return host.lstrip('.')
+
+
+def fetch_in_process(path, session_key):
+    client = Client(HTTP_HOST=_client_host())
+    if session_key:
+        client.cookies[settings.SESSION_COOKIE_NAME] = session_key
+    return client.get(path).status_code
+
+
+# Hosts that plain http:// base URLs may name: the role sessions (an
+# admin's included) must not cross the network unencrypted.
+LOCAL_HOSTS = {'localhost', '127.0.0.1', '::1'}
+
+
+def http_fetcher(base_url, timeout=30):
+    """
+    Return a fetch(path, session_key) that requests `path` from a running
+    server at `base_url`, which must be https:// or on this machine.
+    """
+    parts = urlsplit(base_url)
+    if not (parts.scheme == 'https' or (parts.scheme == 'http' and parts.hostname in LOCAL_HOSTS)):
+        raise ValueError(f"{base_url!r} must be an https:// URL or http:// on localhost.")
+    base_url = base_url.rstrip('/')
+
+    def fetch(path, session_key):
+        request = urllib.request.Request(base_url + path)
+        if session_key:
+            request.add_header('Cookie', f"{settings.SESSION_COOKIE_NAME}={session_key}")
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as exc:
+            return exc.code
+    return fetch
+
+
+def _timed(fetch, role, path, session_key):
+    started = time.perf_counter()
+    try:
+        status = fetch(path, session_key)
+    except Exception as exc:
+        status = f"error: {exc.__class__.__name__}"
+    return WarmResult(role, path, status, (time.perf_counter() - started) * 1000)
+
+
+def _timed_in_thread(fetch, role, path, session_key):
+    try:
+        return _timed(fetch, role, path, session_key)
+    finally:
+        # Pool threads each open their own database connections.
+        connections.close_all()
+
+
+def warm(paths, sessions, fetch=fetch_in_process, workers=8):
+    """
+    Fetch every path once per role in `sessions` and return a WarmResult
+    per request. workers=0 fetches serially in the calling thread.
+    """
+    jobs = [(role, path, key) for role, key in sessions.items() for path in paths]
+    if not workers:
+        return [_timed(fetch, role, path, key) for role, path, key in jobs]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(lambda job: _timed_in_thread(fetch, *job), jobs))